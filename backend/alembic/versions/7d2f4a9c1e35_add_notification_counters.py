@@ -0,0 +1,44 @@
+"""Add notification counters and keyset index
+
+Revision ID: 7d2f4a9c1e35
+Revises: 48e8bddd610e
+Create Date: 2026-10-19 09:12:31.418220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f4a9c1e35'
+down_revision: Union[str, Sequence[str], None] = '48e8bddd610e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_notifications_user_created', 'notifications', ['user_id', 'created_at'], unique=False)
+
+    # Backfill counters from existing unread notifications
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread_count, version) "
+        "SELECT user_id, COUNT(*), 1 FROM notifications "
+        "WHERE is_read = false AND user_id IS NOT NULL GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notifications_user_created', table_name='notifications')
+    op.drop_table('notification_counters')
@@ -0,0 +1,28 @@
+"""Add saved content keyset index
+
+Revision ID: b3e81f5d0a62
+Revises: 7d2f4a9c1e35
+Create Date: 2026-10-19 10:02:47.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e81f5d0a62'
+down_revision: Union[str, Sequence[str], None] = '7d2f4a9c1e35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_user_saved_content_user_created', 'user_saved_content', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_saved_content_user_created', table_name='user_saved_content')
@@ -0,0 +1,32 @@
+"""Add article like count
+
+Revision ID: c3e8a1d5f729
+Revises: b6d1f3a9e427
+Create Date: 2026-10-19 16:02:17.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1d5f729'
+down_revision: Union[str, Sequence[str], None] = 'b6d1f3a9e427'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE articles SET like_count = "
+        "(SELECT COUNT(*) FROM article_likes l WHERE l.article_id = articles.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'like_count')
@@ -0,0 +1,38 @@
+"""Add featured content
+
+Revision ID: c91a7e2b4d18
+Revises: b3e81f5d0a62
+Create Date: 2026-10-19 10:48:05.112937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91a7e2b4d18'
+down_revision: Union[str, Sequence[str], None] = 'b3e81f5d0a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('featured_content',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=True),
+    sa.Column('period', sa.Date(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('content_id', sa.String(), nullable=True),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'period', name='uq_featured_content_kind_period')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('featured_content')
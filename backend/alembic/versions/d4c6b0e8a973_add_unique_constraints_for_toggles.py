@@ -0,0 +1,52 @@
+"""Add unique constraints for helpful marks, likes and saved content
+
+Revision ID: d4c6b0e8a973
+Revises: c91a7e2b4d18
+Create Date: 2026-10-19 11:30:52.774105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4c6b0e8a973'
+down_revision: Union[str, Sequence[str], None] = 'c91a7e2b4d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _dedupe(table: str, partition: str) -> None:
+    # Keep the earliest row of each duplicate group
+    op.execute(
+        f"DELETE FROM {table} WHERE id IN ("
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+        f"(PARTITION BY {partition} ORDER BY created_at, id) AS rn FROM {table}) d "
+        f"WHERE d.rn > 1)"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _dedupe('answer_helpful', 'answer_id, user_id')
+    _dedupe('article_likes', 'article_id, user_id')
+    _dedupe('user_saved_content', 'user_id, content_type, content_id')
+
+    # Repair counters inflated by earlier double-counting
+    op.execute(
+        "UPDATE answers SET helpful_count = "
+        "(SELECT COUNT(*) FROM answer_helpful h WHERE h.answer_id = answers.id)"
+    )
+
+    op.create_unique_constraint('uq_answer_helpful_answer_user', 'answer_helpful', ['answer_id', 'user_id'])
+    op.create_unique_constraint('uq_article_likes_article_user', 'article_likes', ['article_id', 'user_id'])
+    op.create_unique_constraint('uq_user_saved_content_item', 'user_saved_content', ['user_id', 'content_type', 'content_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_user_saved_content_item', 'user_saved_content', type_='unique')
+    op.drop_constraint('uq_article_likes_article_user', 'article_likes', type_='unique')
+    op.drop_constraint('uq_answer_helpful_answer_user', 'answer_helpful', type_='unique')
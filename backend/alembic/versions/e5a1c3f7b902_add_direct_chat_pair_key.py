@@ -0,0 +1,61 @@
+"""Add canonical pair key to direct chats and unique blocked user pairs
+
+Revision ID: e5a1c3f7b902
+Revises: d4c6b0e8a973
+Create Date: 2026-10-19 13:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c3f7b902'
+down_revision: Union[str, Sequence[str], None] = 'd4c6b0e8a973'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chats', sa.Column('user_low_id', sa.String(), nullable=True))
+    op.add_column('chats', sa.Column('user_high_id', sa.String(), nullable=True))
+    op.create_foreign_key('chats_user_low_id_fkey', 'chats', 'users', ['user_low_id'], ['id'])
+    op.create_foreign_key('chats_user_high_id_fkey', 'chats', 'users', ['user_high_id'], ['id'])
+
+    # Backfill live direct chats that have exactly two participants
+    op.execute(
+        "UPDATE chats SET "
+        "user_low_id = (SELECT MIN(p.user_id) FROM chat_participants p WHERE p.chat_id = chats.id), "
+        "user_high_id = (SELECT MAX(p.user_id) FROM chat_participants p WHERE p.chat_id = chats.id) "
+        "WHERE type = 'direct' "
+        "AND (SELECT COUNT(DISTINCT p.user_id) FROM chat_participants p WHERE p.chat_id = chats.id) = 2"
+    )
+    # Existing duplicates: only the most recent chat of a pair keeps the key
+    op.execute(
+        "UPDATE chats SET user_low_id = NULL, user_high_id = NULL WHERE id IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+        "(PARTITION BY user_low_id, user_high_id ORDER BY updated_at DESC NULLS LAST, created_at DESC, id DESC) AS rn "
+        "FROM chats WHERE user_low_id IS NOT NULL) d WHERE d.rn > 1)"
+    )
+    op.create_unique_constraint('uq_chats_direct_pair', 'chats', ['user_low_id', 'user_high_id'])
+
+    op.execute(
+        "DELETE FROM blocked_users WHERE id IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+        "(PARTITION BY blocker_id, blocked_id ORDER BY created_at, id) AS rn FROM blocked_users) d "
+        "WHERE d.rn > 1)"
+    )
+    op.create_unique_constraint('uq_blocked_users_pair', 'blocked_users', ['blocker_id', 'blocked_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_blocked_users_pair', 'blocked_users', type_='unique')
+    op.drop_constraint('uq_chats_direct_pair', 'chats', type_='unique')
+    op.drop_constraint('chats_user_high_id_fkey', 'chats', type_='foreignkey')
+    op.drop_constraint('chats_user_low_id_fkey', 'chats', type_='foreignkey')
+    op.drop_column('chats', 'user_high_id')
+    op.drop_column('chats', 'user_low_id')
@@ -0,0 +1,38 @@
+"""Add chat read watermarks
+
+Revision ID: f2b7d9e4c160
+Revises: e5a1c3f7b902
+Create Date: 2026-10-19 13:41:08.273519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d9e4c160'
+down_revision: Union[str, Sequence[str], None] = 'e5a1c3f7b902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_participants', sa.Column('last_read_message_id', sa.String(), nullable=True))
+    op.add_column('chat_participants', sa.Column('last_read_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_messages_chat_created', 'messages', ['chat_id', 'created_at'], unique=False)
+
+    # Existing history counts as read
+    op.execute(
+        "UPDATE chat_participants SET last_read_at = "
+        "(SELECT MAX(m.created_at) FROM messages m WHERE m.chat_id = chat_participants.chat_id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_chat_created', table_name='messages')
+    op.drop_column('chat_participants', 'last_read_at')
+    op.drop_column('chat_participants', 'last_read_message_id')
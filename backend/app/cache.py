@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+# Small in-process caches.
+# Each worker process has its own copy, so anything cached here must either be
+# safe to serve slightly stale (bounded by ttl) or be invalidated explicitly by
+# the code paths that change it.
+
+_MISSING = object()
+
+# Every cache registers itself so hit rates can be reported in one place
+_registry: List["TTLCache"] = []
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: Optional[float] = None, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    # LRU: most recently used entries live at the end
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def all_caches() -> List[TTLCache]:
+    return list(_registry)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        c.name: {"size": len(c), "hits": c.hits, "misses": c.misses, "hit_rate": round(c.hit_rate, 4)}
+        for c in _registry
+    }
@@ -1,8 +1,14 @@
+import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import orm
+from sqlalchemy import orm, and_, case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from typing import Optional
-from . import models, schemas, auth
+from . import models, schemas, auth, pagination, serialization
+from .database import dialect_insert
+from .services import block_graph, featured, membership, xp_buffer
+
+logger = logging.getLogger(__name__)
 
 def get_user(db: Session, user_id: str):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -32,58 +38,14 @@ def create_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 def update_user_stats(db: Session, user: models.User, xp_gain: int = 0):
+    # XP, level and streak are written by xp_buffer: batched per user while
+    # the accumulator runs, otherwise as one UPDATE in the caller's transaction
     try:
-        import datetime
-        from datetime import date
-        
-        # Re-fetch user in the current session context to avoid cross-session issues
-        db_user = db.query(models.User).filter(models.User.id == user.id).first()
-        if not db_user:
-            print(f"ERROR: User {user.id} not found for stats update")
-            return user
-            
-        print(f"DEBUG: Updating stats for user {db_user.id}. Current XP: {db_user.xp}")
-
-        # 1. Update XP
-        if xp_gain > 0:
-            db_user.xp = (db_user.xp or 0) + xp_gain
-            
-            # Level Logic
-            xp = db_user.xp
-            if xp < 100: db_user.current_level = "Beginner"
-            elif xp < 500: db_user.current_level = "A1 Elementary"
-            elif xp < 1000: db_user.current_level = "A2 Pre-Intermediate"
-            elif xp < 2000: db_user.current_level = "B1 Intermediate"
-            elif xp < 4000: db_user.current_level = "B2 Upper-Intermediate"
-            else: db_user.current_level = "C1 Advanced"
-
-        # 2. Update Streak
-        today = date.today()
-        last_date = db_user.last_activity_date
-        
-        if last_date != today:
-            # Check if consecutive day
-            is_consecutive = last_date == today - datetime.timedelta(days=1)
-            
-            if is_consecutive:
-                db_user.streak_days = (db_user.streak_days or 0) + 1
-            else:
-                # If last_date is None OR last_date is older than yesterday
-                # Safe check: if it's not today and not yesterday, it's a broken streak (or new)
-                # We already checked != today
-                db_user.streak_days = 1
-                     
-            db_user.last_activity_date = today
-
-        db.add(db_user)
-        # db.commit()  <- Let caller handle commit if part of larger transaction
-        # db.refresh(db_user)
-        return db_user
-    except Exception as e:
-        print(f"ERROR in update_user_stats: {e}")
-        import traceback
-        traceback.print_exc()
-        return user
+        logger.debug("Updating user stats", extra={"user_id": user.id, "xp_gain": xp_gain})
+        xp_buffer.record(db, user.id, xp=max(xp_gain, 0))
+    except Exception:
+        logger.exception("update_user_stats failed", extra={"user_id": user.id})
+    return user
 
 def update_user_streak(db: Session, user: models.User):
     # Deprecated in favor of update_user_stats but kept for compatibility
@@ -114,173 +76,364 @@ def increment_daily_counter(db: Session, user_id: str, counter_type: str):
     db.add(daily_limit)
     return daily_limit
 
-# --- Feature CRUD ---
+# --- Notifications ---
 
-def toggle_save_content(db: Session, user_id: str, content_type: str, content_id: str):
-    existing = db.query(models.UserSavedContent).filter(
-        models.UserSavedContent.user_id == user_id,
-        models.UserSavedContent.content_type == content_type,
-        models.UserSavedContent.content_id == content_id
+def _write_unread_counter(db: Session, user_id: str, delta: int = 0, reset: bool = False):
+    # Single upsert: creates the counter row on first use, otherwise adjusts it in place.
+    counter = models.NotificationCounter
+    if reset:
+        new_count = 0
+    else:
+        new_count = case((counter.unread_count + delta < 0, 0), else_=counter.unread_count + delta)
+    stmt = dialect_insert(db, counter).values(user_id=user_id, unread_count=max(delta, 0) if not reset else 0, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[counter.user_id],
+        set_={
+            "unread_count": new_count,
+            "version": counter.version + 1,
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+def create_notification(db: Session, user_id: str, title: str, message: str):
+    # Caller commits, so the notification and the counter bump land together
+    notification = models.Notification(user_id=user_id, title=title, message=message)
+    db.add(notification)
+    _write_unread_counter(db, user_id, delta=1)
+    return notification
+
+def mark_notification_read(db: Session, user_id: str, notification_id: str):
+    changed = db.query(models.Notification).filter(
+        models.Notification.id == notification_id,
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).update({models.Notification.is_read: True}, synchronize_session=False)
+
+    if changed:
+        _write_unread_counter(db, user_id, delta=-1)
+    db.commit()
+
+    return db.query(models.Notification).filter(
+        models.Notification.id == notification_id,
+        models.Notification.user_id == user_id
     ).first()
-    
-    if existing:
-        db.delete(existing)
-        db.commit()
-        return False # Removed
+
+def mark_all_notifications_read(db: Session, user_id: str):
+    changed = db.query(models.Notification).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).update({models.Notification.is_read: True}, synchronize_session=False)
+
+    if changed:
+        _write_unread_counter(db, user_id, reset=True)
+    db.commit()
+    return changed
+
+def get_unread_notification_count(db: Session, user_id: str):
+    # Primary-key lookup; users without a row have never had a notification.
+    row = db.query(
+        models.NotificationCounter.unread_count,
+        models.NotificationCounter.version
+    ).filter(models.NotificationCounter.user_id == user_id).first()
+
+    if not row:
+        return 0, 0
+    return row.unread_count, row.version
+
+def get_notifications(db: Session, user_id: str, limit: int = 20, skip: int = 0,
+                      unread_only: bool = False, cursor: Optional[str] = None):
+    # Column projection: rows go straight to serialization.notification_dicts
+    query = db.query(*serialization.NOTIFICATION_COLUMNS).filter(models.Notification.user_id == user_id)
+
+    if unread_only:
+        query = query.filter(models.Notification.is_read == False)
+
+    query = query.order_by(models.Notification.created_at.desc(), models.Notification.id.desc())
+
+    if cursor:
+        # Keyset on (created_at, id) rides the (user_id, created_at) index
+        created_at, notification_id = pagination.decode_cursor(cursor)
+        query = query.filter(pagination.keyset_after(
+            [models.Notification.created_at, models.Notification.id],
+            [created_at, notification_id],
+            dialect=db.get_bind().dialect.name
+        ))
     else:
-        new_save = models.UserSavedContent(
-            user_id=user_id,
-            content_type=content_type,
-            content_id=content_id
+        query = query.offset(skip)
+
+    return query.limit(limit).all()
+
+# --- Feature CRUD ---
+
+def _insert_if_absent(db: Session, model, index_elements, **values) -> bool:
+    # INSERT ... ON CONFLICT DO NOTHING; True if this call created the row
+    stmt = dialect_insert(db, model).values(id=models.generate_uuid(), **values)
+    stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return db.execute(stmt).rowcount == 1
+
+def toggle_save_content(db: Session, user_id: str, content_type: str, content_id: str):
+    # Delete-or-insert against the (user_id, content_type, content_id) unique
+    # constraint, so retries and double clicks can never create duplicates.
+    saved = models.UserSavedContent
+    removed = db.execute(delete(saved).where(
+        saved.user_id == user_id,
+        saved.content_type == content_type,
+        saved.content_id == content_id
+    )).rowcount
+
+    if not removed:
+        _insert_if_absent(
+            db, saved, [saved.user_id, saved.content_type, saved.content_id],
+            user_id=user_id, content_type=content_type, content_id=content_id
         )
-        db.add(new_save)
-        db.commit()
-        return True # Saved
+    db.commit()
+    return not removed # True = Saved, False = Removed
+
+def toggle_article_like(db: Session, user_id: str, article_id: str):
+    # Returns (is_liked, newly_liked, like_count), or None for an unknown article.
+    # newly_liked is False when a concurrent request already created the like,
+    # so side effects run once. like_count is the maintained Article.like_count,
+    # moved in SQL and returned by the same UPDATE, so no COUNT(*) is needed.
+    like = models.ArticleLike
+    removed = db.execute(delete(like).where(
+        like.user_id == user_id,
+        like.article_id == article_id
+    )).rowcount
+
+    newly_liked = False
+    if not removed:
+        try:
+            newly_liked = _insert_if_absent(
+                db, like, [like.article_id, like.user_id],
+                user_id=user_id, article_id=article_id
+            )
+        except IntegrityError:
+            # FK violation: unknown article
+            db.rollback()
+            return None
+
+    article = models.Article
+    delta = -removed if removed else int(newly_liked)
+    if delta:
+        like_count = db.execute(
+            update(article).where(article.id == article_id)
+            .values(like_count=case((article.like_count + delta < 0, 0), else_=article.like_count + delta))
+            .returning(article.like_count),
+            execution_options={"synchronize_session": False},
+        ).scalar()
+    else:
+        # Liked concurrently by another request: report the count as is
+        like_count = db.execute(select(article.like_count).where(article.id == article_id)).scalar()
+    if like_count is None:
+        # Unknown article (databases that do not enforce the FK)
+        db.rollback()
+        return None
+    return not removed, newly_liked, like_count
+
+def get_user_saved_content(db: Session, user_id: str, content_type: str = None,
+                           limit: Optional[int] = None, cursor: Optional[str] = None):
+    # Read model: one polymorphic query that LEFT JOINs each content table on
+    # (content_type, content_id) and projects only the columns the response needs.
+    saved = models.UserSavedContent
+    question_author = orm.aliased(models.User)
+    article_author = orm.aliased(models.User)
+
+    query = db.query(
+        saved.id, saved.content_type, saved.content_id, saved.created_at,
+        models.Question.id, models.Question.question_text, models.Question.description, question_author.username,
+        models.Article.id, models.Article.title, article_author.username,
+        models.Word.id, models.Word.word, models.Word.meaning, models.Word.level,
+    ).outerjoin(
+        models.Question, and_(saved.content_type == 'question', models.Question.id == saved.content_id)
+    ).outerjoin(
+        question_author, question_author.id == models.Question.user_id
+    ).outerjoin(
+        models.Article, and_(saved.content_type == 'article', models.Article.id == saved.content_id)
+    ).outerjoin(
+        article_author, article_author.id == models.Article.user_id
+    ).outerjoin(
+        models.Word, and_(saved.content_type == 'word', models.Word.id == saved.content_id)
+    ).filter(saved.user_id == user_id)
 
-def get_user_saved_content(db: Session, user_id: str, content_type: str = None):
-    query = db.query(models.UserSavedContent).filter(models.UserSavedContent.user_id == user_id)
     if content_type:
-        query = query.filter(models.UserSavedContent.content_type == content_type)
-    
-    saved_items = query.order_by(models.UserSavedContent.created_at.desc()).all()
-    
-    # Enrich with details
-    # This isn't the most efficient SQL (N+1 if we iterate), better to batch fetch.
-    
-    question_ids = [item.content_id for item in saved_items if item.content_type == 'question']
-    article_ids = [item.content_id for item in saved_items if item.content_type == 'article']
-    
-    questions = {}
-    if question_ids:
-        qs = db.query(models.Question).options(
-            orm.joinedload(models.Question.user)
-        ).filter(models.Question.id.in_(question_ids)).all()
-        questions = {q.id: q for q in qs}
-        
-    articles = {}
-    if article_ids:
-        arts = db.query(models.Article).options(
-            orm.joinedload(models.Article.user)
-        ).filter(models.Article.id.in_(article_ids)).all()
-        articles = {a.id: a for a in arts}
-        
+        query = query.filter(saved.content_type == content_type)
+    if cursor:
+        created_at, saved_id = pagination.decode_cursor(cursor)
+        query = query.filter(pagination.keyset_after(
+            [saved.created_at, saved.id], [created_at, saved_id],
+            dialect=db.get_bind().dialect.name
+        ))
+
+    query = query.order_by(saved.created_at.desc(), saved.id.desc())
+    if limit:
+        query = query.limit(limit)
+
     results = []
-    for item in saved_items:
+    for (item_id, item_type, content_id, created_at,
+         q_id, q_text, q_description, q_author,
+         a_id, a_title, a_author,
+         w_id, w_word, w_meaning, w_level) in query.all():
         details = {}
-        if item.content_type == 'question':
-             q = questions.get(item.content_id)
-             if q:
-                 details = {
-                     "text": q.question_text,
-                     "description": q.description,
-                     "author": q.user.username if q.user else "Unknown"
-                 }
-        elif item.content_type == 'article':
-             a = articles.get(item.content_id)
-             if a:
-                 details = {
-                     "title": a.title,
-                     "author": a.user.username if a.user else "Unknown"
-                 }
-                 
-        # Create Pydantic model manually or attach to ORM object if using standard approach
-        # Since we return ORM objects usually, we can attach a temporary attribute 'details'
-        item.details = details
-        results.append(item)
-        
+        if item_type == 'question' and q_id:
+            details = {"text": q_text, "description": q_description, "author": q_author or "Unknown"}
+        elif item_type == 'article' and a_id:
+            details = {"title": a_title, "author": a_author or "Unknown"}
+        elif item_type == 'word' and w_id:
+            details = {"word": w_word, "meaning": w_meaning, "level": w_level}
+
+        results.append(schemas.SavedContentOut(
+            id=item_id,
+            content_type=item_type,
+            content_id=content_id,
+            created_at=created_at,
+            details=details
+        ))
+
     return results
 
 def mark_answer_helpful(db: Session, user_id: str, answer_id: str):
-    # Check if already marked
-    existing = db.query(models.AnswerHelpful).filter(
-        models.AnswerHelpful.user_id == user_id,
-        models.AnswerHelpful.answer_id == answer_id
+    # Returns (marked, helpful_count); marked is False if the user had already
+    # marked it. helpful_count is None when the answer does not exist.
+    helpful = models.AnswerHelpful
+    try:
+        created = _insert_if_absent(
+            db, helpful, [helpful.answer_id, helpful.user_id],
+            user_id=user_id, answer_id=answer_id
+        )
+    except IntegrityError:
+        # FK violation: unknown answer
+        db.rollback()
+        return False, None
+
+    if not created:
+        count = db.query(models.Answer.helpful_count).filter(models.Answer.id == answer_id).scalar()
+        return False, count
+
+    # Increment in SQL so concurrent marks never lose an update
+    row = db.execute(
+        update(models.Answer)
+        .where(models.Answer.id == answer_id)
+        .values(helpful_count=func.coalesce(models.Answer.helpful_count, 0) + 1)
+        .returning(models.Answer.helpful_count, models.Answer.user_id)
     ).first()
-    
+    if not row:
+        db.rollback()
+        return False, None
+
+    # Award XP to answer owner (e.g., 5 XP)
+    if row.user_id and row.user_id != user_id: # Don't reward self-help
+        owner = get_user(db, row.user_id)
+        if owner:
+            update_user_stats(db, owner, xp_gain=5)
+
+    # Keep the precomputed daily sentence in step with today's marks
+    featured.record_helpful_mark(db, answer_id)
+
+    db.commit()
+    return True, row.helpful_count
+
+# --- Chats ---
+
+def direct_pair(user_id: str, other_id: str):
+    # Canonical (low, high) key of a direct chat
+    return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+def block_user(db: Session, blocker_id: str, blocked_id: str) -> bool:
+    # True if this call created the block
+    blocked = models.BlockedUser
+    created = _insert_if_absent(
+        db, blocked, [blocked.blocker_id, blocked.blocked_id],
+        blocker_id=blocker_id, blocked_id=blocked_id
+    )
+    db.commit()
+    block_graph.record_block(blocker_id, blocked_id)
+    return created
+
+def get_or_create_direct_chat(db: Session, user_id: str, other_id: str) -> str:
+    # One indexed lookup on the pair key; otherwise the chat and both
+    # participants are inserted in one transaction. A concurrent request for
+    # the same pair hits the unique constraint and re-reads the winner's chat.
+    chat = models.Chat
+    low, high = direct_pair(user_id, other_id)
+
+    def lookup():
+        return db.query(chat.id).filter(chat.user_low_id == low, chat.user_high_id == high).scalar()
+
+    existing = lookup()
     if existing:
-        return False # Already helpful
-        
-    # Add mark
-    new_mark = models.AnswerHelpful(user_id=user_id, answer_id=answer_id)
-    db.add(new_mark)
-    
-    # Increment count
-    answer = db.query(models.Answer).filter(models.Answer.id == answer_id).first()
-    if answer:
-        answer.helpful_count = (answer.helpful_count or 0) + 1
-        
-        # Award XP to answer owner (e.g., 5 XP)
-        if answer.user_id != user_id: # Don't reward self-help
-             update_user_stats(db, answer.user, xp_gain=5)
-             
+        return existing
+
+    chat_id = models.generate_uuid()
+    stmt = dialect_insert(db, chat).values(
+        id=chat_id, type="direct", user_low_id=low, user_high_id=high
+    ).on_conflict_do_nothing(index_elements=[chat.user_low_id, chat.user_high_id])
+    if db.execute(stmt).rowcount == 1:
+        db.add_all([
+            models.ChatParticipant(chat_id=chat_id, user_id=low),
+            models.ChatParticipant(chat_id=chat_id, user_id=high),
+        ])
+        db.commit()
+        membership.invalidate(chat_ids=[chat_id], user_ids=[low, high])
+        return chat_id
+
+    db.rollback()
+    return lookup()
+
+def insert_message(db: Session, chat_id: str, sender_id: Optional[str], content: str):
+    # One transaction: INSERT ... RETURNING the message row, then the chat's
+    # updated_at (inbox order) and the sender's read watermark are moved to it.
+    # Returns the serialization.MESSAGE_COLUMNS row.
+    message = db.execute(
+        insert(models.Message)
+        .values(id=models.generate_uuid(), chat_id=chat_id, sender_id=sender_id, content=content, is_read=False)
+        .returning(*serialization.MESSAGE_COLUMNS)
+    ).one()
+    db.execute(
+        update(models.Chat).where(models.Chat.id == chat_id).values(updated_at=message.created_at),
+        execution_options={"synchronize_session": False},
+    )
+    if sender_id is not None:
+        participant = models.ChatParticipant
+        db.execute(
+            update(participant)
+            .where(participant.chat_id == chat_id, participant.user_id == sender_id)
+            .values(last_read_message_id=message.id, last_read_at=message.created_at),
+            execution_options={"synchronize_session": False},
+        )
     db.commit()
-    return True
-
-def get_daily_sentence(db: Session):
-    # Logic: Get the "Best Answer" based on recent helpful marks.
-    # Priority 1: Answer with most helpful marks TODAY.
-    # Priority 2: Answer with most helpful marks YESTERDAY.
-    # Priority 3: Highest rated answer from the LAST 7 DAYS.
-    # Priority 4: Latest answer (Safety net).
-    
-    from sqlalchemy import desc, func
-    from datetime import datetime, timedelta, time
-    from sqlalchemy.orm import joinedload
-    
-    now = datetime.utcnow()
-    today_start = datetime.combine(now.date(), time.min)
-    yesterday_start = today_start - timedelta(days=1)
-    
-    # Helper to fetch full answer object with user
-    def get_full_answer(ans_id):
-        return db.query(models.Answer).options(
-            joinedload(models.Answer.user)
-        ).filter(models.Answer.id == ans_id).first()
-
-    # 1. Check Today's Activity
-    # Find answer_id with most entries in AnswerHelpful since today_start
-    todays_top = db.query(
-        models.AnswerHelpful.answer_id, 
-        func.count(models.AnswerHelpful.answer_id).label('count')
-    ).filter(
-        models.AnswerHelpful.created_at >= today_start
-    ).group_by(
-        models.AnswerHelpful.answer_id
-    ).order_by(desc('count')).first()
-    
-    if todays_top:
-        return get_full_answer(todays_top.answer_id)
-        
-    # 2. Check Yesterday's Activity
-    yesterdays_top = db.query(
-        models.AnswerHelpful.answer_id, 
-        func.count(models.AnswerHelpful.answer_id).label('count')
-    ).filter(
-        models.AnswerHelpful.created_at >= yesterday_start,
-        models.AnswerHelpful.created_at < today_start
-    ).group_by(
-        models.AnswerHelpful.answer_id
-    ).order_by(desc('count')).first()
-    
-    if yesterdays_top:
-         return get_full_answer(yesterdays_top.answer_id)
-
-    # 3. Fallback: Hightest Rated from Last 7 Days (Fresh content)
-    week_ago = now - timedelta(days=7)
-    weekly_best = db.query(models.Answer).options(
-        joinedload(models.Answer.user)
-    ).filter(
-        models.Answer.created_at >= week_ago,
-        models.Answer.helpful_count > 0
-    ).order_by(desc(models.Answer.helpful_count)).first()
-    
-    if weekly_best:
-        return weekly_best
-        
-    # 4. Final Fallback: Absolute Latest Answer
-    return db.query(models.Answer).options(
-        joinedload(models.Answer.user)
-    ).order_by(desc(models.Answer.created_at)).first()
+    return message
+
+def mark_chat_read(db: Session, chat_id: str, user_id: str, message=None) -> Optional[dict]:
+    # Moves the participant's read watermark up to message, an (id, created_at)
+    # row, or the chat's latest message. The watermark never moves backwards.
+    # Returns the resulting watermark, None if the user is not a participant.
+    participant = models.ChatParticipant
+    message_model = models.Message
+    if message is None:
+        message = db.execute(
+            select(message_model.id, message_model.created_at)
+            .where(message_model.chat_id == chat_id)
+            .order_by(message_model.created_at.desc(), message_model.id.desc())
+            .limit(1)
+        ).first()
+
+    columns = (participant.chat_id, participant.last_read_message_id, participant.last_read_at)
+    mine = (participant.chat_id == chat_id, participant.user_id == user_id)
+    row = None
+    if message is not None:
+        row = db.execute(
+            update(participant)
+            .where(*mine, or_(participant.last_read_at.is_(None), participant.last_read_at < message.created_at))
+            .values(last_read_message_id=message.id, last_read_at=message.created_at)
+            .returning(*columns),
+            execution_options={"synchronize_session": False},
+        ).first()
+        db.commit()
+    if row is None:
+        # Already read past it, nothing to read, or not a participant
+        row = db.execute(select(*columns).where(*mine)).first()
+    return row._asdict() if row is not None else None
 
 def get_weekly_champion(db: Session):
     # Logic: User with most accepted answers or XP in last 7 days
@@ -25,3 +25,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def dialect_insert(db, model):
+    # INSERT construct that supports ON CONFLICT for the bound dialect.
+    # Postgres and SQLite both expose on_conflict_do_nothing / _do_update.
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return insert(model)
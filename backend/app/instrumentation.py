@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+
+# Per-request database instrumentation.
+# Engine events count statements and their time into the QueryStats of the
+# current request (a context variable, so the threadpool that runs sync
+# endpoints and dependencies reports into the same object). The middleware
+# adds Server-Timing / X-DB-Queries headers and logs statement shapes that
+# repeat within one request - the usual signature of an N+1 loop.
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("QUERY_INSTRUMENTATION", "1") == "1"
+# Same statement (with different parameters) this many times in one request is reported
+REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0  # seconds
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD):
+        return [(sql, n) for sql, n in self.shapes.most_common() if n >= threshold]
+
+    def report(self) -> str:
+        return "\n".join(f"{n:>4} x {' '.join(sql.split())[:200]}" for sql, n in self.shapes.most_common())
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# Called with (scope, stats) when a request finishes; used by the test fixtures
+observers: List[Callable] = []
+
+
+@contextmanager
+def track():
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def install(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryCounterMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        with track() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", f"db;dur={stats.duration * 1000:.1f};desc=\"{stats.count} queries\"".encode()))
+                    headers.append((b"x-db-queries", str(stats.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                for statement, n in stats.repeated():
+                    logger.warning(
+                        "Possible N+1: %s %s ran the same statement %d times: %s",
+                        scope["method"], scope["path"], n, " ".join(statement.split())[:200],
+                    )
+                for observer in observers:
+                    observer(scope, stats)
@@ -1,20 +1,56 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, users, features, stats, admin, chat
+from . import instrumentation, logging_config, metrics
+from . import tasks  # noqa: F401  (registers the background jobs)
+from .database import engine
+from .services import jobs, message_buffer, presence, xp_buffer
 
-app = FastAPI(title="LanXpert API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Logging is configured once per process, not per request
+    logging_config.setup_logging()
+    # Write-behind chat messages (MESSAGE_WRITE_BEHIND=1): replay, then flush in the background
+    message_buffer.start()
+    # Expires random chat queue entries without heartbeats
+    presence.start()
+    # XP/streak updates merged per user and flushed in batches (XP_BUFFER=1)
+    xp_buffer.start()
+    # Deferred and scheduled jobs (app/tasks.py)
+    jobs.start()
+    yield
+    jobs.stop()
+    xp_buffer.stop()
+    presence.stop()
+    message_buffer.stop()
+    logging_config.shutdown_logging()
+
+app = FastAPI(title="LanXpert API", lifespan=lifespan)
 
 import os
 
 default_origins = "http://localhost:3000,http://127.0.0.1:3000"
 origins = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", default_origins).split(",") if o.strip()]
 
+# Query count/time per request (Server-Timing, X-DB-Queries, N+1 warnings)
+instrumentation.install(engine)
+app.add_middleware(instrumentation.QueryCounterMiddleware)
+
+# Latency/status/size per route template, scraped from /metrics
+metrics.register_engine(engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Request id on every log record and on the response (X-Request-ID)
+app.add_middleware(logging_config.RequestIdMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Server-Timing", "X-DB-Queries", "X-Request-ID"],
 )
 
 api_v1_prefix = "/api/v1"
@@ -34,3 +70,7 @@ app.include_router(admin.router, prefix=api_v1_prefix)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to LanXpert API"}
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
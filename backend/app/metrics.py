@@ -0,0 +1,265 @@
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import cache
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4).
+# Hot-path cost is kept to a couple of dict lookups and float additions:
+# labelled children are created once and re-used ("pre-bound"), and the
+# middleware keeps its per-route children in a dict keyed by route template.
+# All observations happen on the event loop thread.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _Value
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class CallbackMetric(_Metric):
+    # Read at scrape time: callback returns {label values tuple: value}
+    def __init__(self, name: str, description: str, labelnames: Sequence[str], callback: Callable[[], Dict],
+                 kind: str = "gauge"):
+        super().__init__(name, description, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        for values, value in self.callback().items():
+            yield self.name, _format_labels(self.labelnames, values), value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# --- HTTP ---
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+REQUEST_SIZE = Histogram("http_request_size_bytes", "HTTP request body size (Content-Length)", ("method", "route"), SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served").labels()
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class _RouteMetrics:
+    __slots__ = ("latency", "response_size", "request_size", "statuses", "method", "route")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.latency = LATENCY.labels(method, route)
+        self.response_size = RESPONSE_SIZE.labels(method, route)
+        self.request_size = REQUEST_SIZE.labels(method, route)
+        self.statuses: Dict[int, _Value] = {}
+
+    def status(self, code: int) -> _Value:
+        child = self.statuses.get(code)
+        if child is None:
+            child = self.statuses[code] = REQUESTS.labels(self.method, self.route, str(code))
+        return child
+
+
+_routes: Dict[tuple, _RouteMetrics] = {}
+
+
+def _route_metrics(scope) -> _RouteMetrics:
+    # The router stores the matched route in the scope. Its path may be
+    # relative to the include_router prefix, in which case the prefix segments
+    # are taken from the request path. Templates keep label cardinality bounded.
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    extra = scope["path"].count("/") - template.count("/") if template else 0
+    key = (scope["method"], id(route), extra)
+    bound = _routes.get(key)
+    if bound is None:
+        if template is None:
+            template = UNMATCHED_ROUTE
+        elif extra > 0:
+            template = "/".join(scope["path"].split("/")[:extra + 1]) + template
+        bound = _routes[key] = _RouteMetrics(scope["method"], template)
+    return bound
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            bound = _route_metrics(scope)
+            bound.latency.observe(elapsed)
+            bound.response_size.observe(sent)
+            bound.status(status).inc()
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    bound.request_size.observe(int(value))
+                    break
+
+
+# --- Database pool / caches (read at scrape time) ---
+
+def _pool_stats(engine) -> Dict[Tuple[str, ...], float]:
+    pool = engine.pool
+    stats = {}
+    for name in ("size", "checkedout", "overflow", "checkedin"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[(name,)] = method()
+    return stats
+
+
+def _cache_stats(field: str) -> Callable[[], Dict[Tuple[str, ...], float]]:
+    return lambda: {(name,): stats[field] for name, stats in cache.cache_stats().items()}
+
+
+_engines = set()
+
+
+def register_engine(engine):
+    if id(engine) in _engines:
+        return
+    _engines.add(id(engine))
+    CallbackMetric("db_pool_connections", "SQLAlchemy connection pool state", ("state",), lambda: _pool_stats(engine))
+
+
+CallbackMetric("cache_hits_total", "In-process cache hits", ("cache",), _cache_stats("hits"), kind="counter")
+CallbackMetric("cache_misses_total", "In-process cache misses", ("cache",), _cache_stats("misses"), kind="counter")
+CallbackMetric("cache_hit_ratio", "In-process cache hit ratio", ("cache",), _cache_stats("hit_rate"))
+CallbackMetric("cache_entries", "In-process cache size", ("cache",), _cache_stats("size"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Date, Enum, Numeric
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Date, Enum, Numeric, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -203,6 +203,11 @@ class UserSavedContent(Base):
     
     user = relationship("User", back_populates="saved_content")
 
+    __table_args__ = (
+        Index("ix_user_saved_content_user_created", "user_id", "created_at"),
+        UniqueConstraint("user_id", "content_type", "content_id", name="uq_user_saved_content_item"),
+    )
+
 class AnswerHelpful(Base):
     __tablename__ = "answer_helpful"
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -212,6 +217,10 @@ class AnswerHelpful(Base):
     
     answer = relationship("Answer", back_populates="helpful_marks")
 
+    __table_args__ = (
+        UniqueConstraint("answer_id", "user_id", name="uq_answer_helpful_answer_user"),
+    )
+
 class AnswerVote(Base):
     __tablename__ = "answer_votes"
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -243,6 +252,7 @@ class Article(Base):
     title = Column(String)
     content = Column(Text)
     is_published = Column(Boolean, default=True)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")  # maintained by crud.toggle_article_like, resynced by services.counters
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -259,6 +269,10 @@ class ArticleLike(Base):
     user = relationship("User")
     article = relationship("Article", back_populates="likes")
 
+    __table_args__ = (
+        UniqueConstraint("article_id", "user_id", name="uq_article_likes_article_user"),
+    )
+
 # --- Notifications ---
 
 class Notification(Base):
@@ -272,6 +286,20 @@ class Notification(Base):
     
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        # Keyset pagination over a user's history
+        Index("ix_notifications_user_created", "user_id", "created_at"),
+    )
+
+class NotificationCounter(Base):
+    # Maintained unread badge count, one row per user.
+    # version is bumped on every change and doubles as the ETag.
+    __tablename__ = "notification_counters"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class NotificationSetting(Base):
     __tablename__ = "notification_settings"
     user_id = Column(String, ForeignKey("users.id"), primary_key=True)
@@ -297,6 +325,21 @@ class SiteSetting(Base):
     value = Column(String)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class FeaturedContent(Base):
+    # Precomputed "featured" picks (e.g. the daily sentence), one row per kind and period
+    __tablename__ = "featured_content"
+    id = Column(String, primary_key=True, default=generate_uuid)
+    kind = Column(String) # daily_sentence
+    period = Column(Date)
+    content_type = Column(String) # answer
+    content_id = Column(String)
+    score = Column(Integer, default=0) # e.g. helpful marks received during the period
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("kind", "period", name="uq_featured_content_kind_period"),
+    )
+
 class ContentModeration(Base):
     __tablename__ = "content_moderation"
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -326,16 +369,31 @@ class Chat(Base):
     type = Column(String)  # 'direct', 'random'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Canonical pair key of a live direct chat (smaller user id first); NULL
+    # for other chat types and once a direct chat is terminated
+    user_low_id = Column(String, ForeignKey("users.id"), nullable=True)
+    user_high_id = Column(String, ForeignKey("users.id"), nullable=True)
+    # Messages moved to archived_chat_segments; they precede the rows in messages
+    archived_messages = Column(Integer, default=0, server_default="0")
 
     participants = relationship("ChatParticipant", back_populates="chat", cascade="all, delete-orphan")
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # At most one live direct chat per pair of users
+        UniqueConstraint("user_low_id", "user_high_id", name="uq_chats_direct_pair"),
+    )
+
 class ChatParticipant(Base):
     __tablename__ = "chat_participants"
     id = Column(String, primary_key=True, default=generate_uuid)
     chat_id = Column(String, ForeignKey("chats.id"))
     user_id = Column(String, ForeignKey("users.id"))
     joined_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Read watermark: messages created after last_read_at are unread for this
+    # participant. No FK, so purging messages never touches participants.
+    last_read_message_id = Column(String, nullable=True)
+    last_read_at = Column(DateTime(timezone=True), nullable=True)
     
     chat = relationship("Chat", back_populates="participants")
     user = relationship("User", back_populates="chat_participations")
@@ -346,12 +404,36 @@ class Message(Base):
     chat_id = Column(String, ForeignKey("chats.id"))
     sender_id = Column(String, ForeignKey("users.id"))
     content = Column(Text)
-    is_read = Column(Boolean, default=False)
+    is_read = Column(Boolean, default=False)  # Superseded by ChatParticipant.last_read_at
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     chat = relationship("Chat", back_populates="messages")
     sender = relationship("User")
 
+    __table_args__ = (
+        # Message history and unread counts (created_at after a watermark)
+        Index("ix_messages_chat_created", "chat_id", "created_at"),
+    )
+
+class ArchivedChatSegment(Base):
+    # Cold storage for the history of inactive chats: compressed JSONL of up
+    # to ARCHIVE_SEGMENT_SIZE messages, oldest first. seq orders a chat's segments.
+    __tablename__ = "archived_chat_segments"
+    id = Column(String, primary_key=True, default=generate_uuid)
+    chat_id = Column(String, ForeignKey("chats.id"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    first_message_at = Column(DateTime(timezone=True))
+    last_message_at = Column(DateTime(timezone=True))
+    codec = Column(String, nullable=False)  # zstd, zlib
+    raw_bytes = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("chat_id", "seq", name="uq_archived_chat_segments_chat_seq"),
+    )
+
 class BlockedUser(Base):
     __tablename__ = "blocked_users"
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -362,6 +444,10 @@ class BlockedUser(Base):
     blocker = relationship("User", foreign_keys=[blocker_id], back_populates="blocked_users")
     blocked = relationship("User", foreign_keys=[blocked_id])
 
+    __table_args__ = (
+        UniqueConstraint("blocker_id", "blocked_id", name="uq_blocked_users_pair"),
+    )
+
 class UserReport(Base):
     __tablename__ = "user_reports"
     id = Column(String, primary_key=True, default=generate_uuid)
@@ -374,3 +460,26 @@ class UserReport(Base):
     reporter = relationship("User", foreign_keys=[reporter_id], back_populates="reports_made")
     reported = relationship("User", foreign_keys=[reported_id])
 
+
+class Job(Base):
+    # Background job queue (app/services/jobs.py). dedupe_key makes scheduled
+    # runs unique per period across workers.
+    __tablename__ = "jobs"
+    id = Column(String, primary_key=True, default=generate_uuid)
+    name = Column(String, nullable=False)
+    payload = Column(Text)  # JSON keyword arguments
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    dedupe_key = Column(String, unique=True, nullable=True)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Workers poll for the oldest due queued job
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
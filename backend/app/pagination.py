@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+
+# Keyset (cursor) pagination helpers.
+# A cursor is an opaque, url-safe token holding the sort key of the last row
+# a client has seen. Lists return the next cursor in the X-Next-Cursor header
+# so existing response bodies stay unchanged.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list):
+            raise ValueError("cursor must encode a list")
+        return [_decode_value(v) for v in values]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _sqlite_comparable(value: Any):
+    # SQLite stores server_default timestamps as "YYYY-MM-DD HH:MM:SS" but binds
+    # Python datetimes with microseconds, so text comparison breaks ties.
+    # Normalise both sides to the same text form.
+    return func.strftime("%Y-%m-%d %H:%M:%f", value)
+
+
+def keyset_after(columns: List[Any], values: List[Any], descending: bool = True, dialect: Optional[str] = None):
+    # Builds "(c1, c2, ...) < (v1, v2, ...)" (or > for ascending) without
+    # relying on row-value support in the database.
+    if dialect == "sqlite":
+        columns = [_sqlite_comparable(c) if isinstance(v, datetime) else c for c, v in zip(columns, values)]
+        values = [_sqlite_comparable(v) if isinstance(v, datetime) else v for v in values]
+
+    clauses = []
+    for i, col in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        step = col < values[i] if descending else col > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def next_cursor(rows: List[Any], limit: int, key) -> Optional[str]:
+    # Only hand out a cursor when the page is full, i.e. there may be more rows.
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key(rows[-1]))
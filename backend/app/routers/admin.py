@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
-from .. import models, schemas, dependencies
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+from .. import models, schemas, dependencies, pagination
 from ..database import get_db
+from ..services import admin_batch, admin_query, block_graph, counters, deletion, export, jobs, levels, membership, table_stats
 
 router = APIRouter(
     prefix="/admin",
@@ -12,18 +15,38 @@ router = APIRouter(
 )
 
 @router.get("/dashboard-stats")
-def get_dashboard_stats(db: Session = Depends(get_db)):
-    user_count = db.query(models.User).count()
-    word_count = db.query(models.Word).count()
-    article_count = db.query(models.Article).count()
-    question_count = db.query(models.Question).count()
-    
-    return {
-        "users": user_count,
-        "words": word_count,
-        "articles": article_count,
-        "questions": question_count
-    }
+def get_dashboard_stats(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    # Cached exact counts (or planner estimates on first load); stale
+    # entries are recounted after the response is sent.
+    counts, as_of, stale = table_stats.counts_for(db, {
+        "users": models.User,
+        "words": models.Word,
+        "articles": models.Article,
+        "questions": models.Question,
+    })
+    if stale:
+        background_tasks.add_task(table_stats.refresh_counts, stale)
+
+    return {**counts, "counted_at": as_of}
+
+@router.get("/jobs", dependencies=[Depends(dependencies.get_current_super_admin)])
+def get_jobs(
+    status: Optional[Literal["queued", "running", "done", "failed"]] = None,
+    name: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    # Job counts per task and status, schedules, and the latest jobs
+    return jobs.status(db, state=status, name=name, limit=limit)
+
+@router.post("/jobs/{job_id}/retry", dependencies=[Depends(dependencies.get_current_super_admin)])
+def retry_job(job_id: str, db: Session = Depends(get_db)):
+    retried = jobs.retry(db, job_id)
+    if retried is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not retried:
+        raise HTTPException(status_code=400, detail="Only failed jobs can be retried")
+    return {"status": "queued"}
 
 @router.get("/users", response_model=List[schemas.UserOut], dependencies=[Depends(dependencies.get_current_super_admin)])
 def get_users(skip: int = 0, limit: int = 50, search: Optional[str] = None, db: Session = Depends(get_db)):
@@ -233,17 +256,13 @@ def bulk_create_words(words_data: List[schemas.WordCreate], db: Session = Depend
     return {"status": "success", "created": created_count, "errors": errors}
 
 @router.delete("/questions/{question_id}")
-def delete_question(question_id: str, db: Session = Depends(get_db)):
-    question = db.query(models.Question).filter(models.Question.id == question_id).first()
+def delete_question(question_id: str, background_tasks: BackgroundTasks, soft: bool = False, db: Session = Depends(get_db)):
+    question = db.query(models.Question.id).filter(models.Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
         
-    # Cascade delete should handle answers, but manual cleanup is safer if not configured
-    # Deleting answers first just in case
-    db.query(models.Answer).filter(models.Answer.question_id == question_id).delete()
-    db.delete(question)
-    db.commit()
-    return {"status": "deleted"}
+    # Answers, their votes/reports/helpful marks and saved/moderation references go too
+    return deletion.delete_content(db, models.Question, [question_id], background_tasks, soft=soft)
 
 @router.get("/articles", response_model=List[schemas.ArticleOut])
 def get_articles(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
@@ -262,16 +281,13 @@ def get_articles(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
     return articles
 
 @router.delete("/articles/{article_id}")
-def delete_article(article_id: str, db: Session = Depends(get_db)):
-    article = db.query(models.Article).filter(models.Article.id == article_id).first()
+def delete_article(article_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    article = db.query(models.Article.id).filter(models.Article.id == article_id).first()
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
         
-    # Delete likes first
-    db.query(models.ArticleLike).filter(models.ArticleLike.article_id == article_id).delete()
-    db.delete(article)
-    db.commit()
-    return {"status": "deleted"}
+    # Likes and saved/moderation references are removed with the article
+    return deletion.delete_content(db, models.Article, [article_id], background_tasks)
 
 @router.post("/users/{user_id}/reset-limits", dependencies=[Depends(dependencies.get_current_super_admin)])
 def reset_user_limits(user_id: str, limit_type: str = "all", db: Session = Depends(get_db)):
@@ -336,7 +352,7 @@ RESOURCE_MAP = {
 }
 
 from sqlalchemy.inspection import inspect
-from sqlalchemy import desc, text
+from sqlalchemy import desc, func, select, text
 
 @router.get("/generic/{resource}/schema")
 def get_resource_schema(resource: str, current_user: models.User = Depends(dependencies.get_current_super_admin)):
@@ -370,13 +386,29 @@ def get_resource_schema(resource: str, current_user: models.User = Depends(depen
         
     return {"columns": columns}
 
+def _resolve_sort(model, sort_by: Optional[str], order: Optional[str]):
+    sort_col = admin_query.sort_column(model, sort_by)
+    # Explicit sorts default to ascending; the created_at default is newest first
+    if sort_by:
+        return sort_col, order == "desc"
+    return sort_col, sort_col.key == "created_at"
+
 @router.get("/generic/{resource}")
 def get_generic_list(
     resource: str, 
+    background_tasks: BackgroundTasks,
     skip: int = 0, 
     limit: int = 50, 
     sort_by: Optional[str] = None,
     order: Optional[str] = "asc",
+    count: Literal["exact", "estimate", "none"] = Query("exact", description=(
+        "exact: unfiltered lists get the cached exact count (recounted in the background "
+        "once older than TABLE_COUNT_TTL), filtered lists a COUNT(*). estimate: planner "
+        "statistics; filtered lists cannot be estimated and get total=null. none: total=null."
+    )),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    filter: Optional[List[str]] = Query(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_super_admin)
 ):
@@ -384,25 +416,147 @@ def get_generic_list(
         raise HTTPException(status_code=404, detail="Resource not found")
         
     model = RESOURCE_MAP[resource]
-    query = db.query(model)
-    
-    # Sorting
-    if sort_by and hasattr(model, sort_by):
-        col = getattr(model, sort_by)
-        if order == "desc":
-            query = query.order_by(desc(col))
-        else:
-            query = query.order_by(col)
-    elif hasattr(model, "created_at"):
-        query = query.order_by(desc(model.created_at))
-    elif hasattr(model, "id"):
-         # Default sort by ID if created_at doesn't exist (unless uuid, then random, but consistent)
-        pass # No clean default for random UUIDs, let db decide or add index
-        
-    items = query.offset(skip).limit(limit).all()
-    total = db.query(model).count()
+    columns = admin_query.select_columns(model, fields)
+    criteria = admin_query.parse_filters(model, filter)
+    sort_col, descending = _resolve_sort(model, sort_by, order)
+
+    stmt, sort_key = admin_query.list_statement(
+        model, columns, sort_col, descending,
+        cursor=cursor, dialect=db.get_bind().dialect.name, criteria=criteria
+    )
+    if not cursor:
+        stmt = stmt.offset(skip)
+
+    # Keyset columns must be in the projection to build the next cursor
+    extra = [c for c in sort_key if c not in columns]
+    if extra:
+        stmt = stmt.add_columns(*extra)
+    rows = admin_query.rows_to_dicts(columns + extra, db.execute(stmt.limit(limit)))
+
+    next_cursor = pagination.next_cursor(rows, limit, key=lambda r: admin_query.cursor_for(sort_key, r))
+    items = [{k: r[k] for k in (c.key for c in columns)} for r in rows] if extra else rows
+
+    # count=exact serves the cached exact count like dashboard-stats (stale
+    # entries are recounted after the response), count=estimate the planner's
+    # figure, none skips it. Filtered lists can only be counted exactly: with
+    # count=estimate their total is null.
+    total, counted_at = None, None
+    if criteria:
+        if count == "exact":
+            total = db.execute(select(func.count()).select_from(model).where(*criteria)).scalar()
+    elif count == "exact":
+        counts, as_of, stale = table_stats.counts_for(db, {resource: model})
+        total, counted_at = counts[resource], as_of[resource]
+        if stale:
+            background_tasks.add_task(table_stats.refresh_counts, stale)
+    elif count == "estimate":
+        total = table_stats.estimate_count(db, model)
     
-    return {"items": items, "total": total}
+    return {"items": items, "total": total, "counted_at": counted_at, "next_cursor": next_cursor}
+
+@router.get("/generic/{resource}/export")
+def export_generic_resource(
+    resource: str,
+    format: Literal["csv", "jsonl", "parquet"] = "csv",
+    sort_by: Optional[str] = None,
+    order: Optional[str] = "asc",
+    fields: Optional[str] = None,
+    filter: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_super_admin)
+):
+    if resource not in RESOURCE_MAP:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow to be installed")
+
+    # Same projection / filter / sort rules as the list endpoint, without paging
+    model = RESOURCE_MAP[resource]
+    columns = admin_query.select_columns(model, fields)
+    criteria = admin_query.parse_filters(model, filter)
+    sort_col, descending = _resolve_sort(model, sort_by, order)
+    stmt, _ = admin_query.list_statement(model, columns, sort_col, descending, criteria=criteria)
+
+    return StreamingResponse(
+        export.STREAMERS[format](stmt, columns),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{resource}.{format}"'},
+    )
+
+# Column whose values tell _generic_write_done what a write touched
+WATCHED_COLUMNS = {
+    models.SiteSetting: "key",
+    models.ArticleLike: counters.key_column(models.ArticleLike.__tablename__),
+    models.Notification: counters.key_column(models.Notification.__tablename__),
+}
+
+def _watched(model, *items) -> set:
+    # Values of the watched column in ORM rows (before and after a change)
+    column = WATCHED_COLUMNS.get(model)
+    return {getattr(item, column) for item in items} if column else set()
+
+def _generic_write_done(db: Session, model, touched=()):
+    # Drop in-process caches derived from the table that was just changed.
+    # touched: values of WATCHED_COLUMNS[model] in the written rows.
+    table_stats.invalidate(model)
+    if model is models.BlockedUser:
+        block_graph.invalidate()
+    if model in (models.Chat, models.ChatParticipant):
+        membership.invalidate_all()
+    if counters.key_column(model.__tablename__) and touched:
+        # Counters these rows feed were not moved by the generic write
+        counters.resync(db, model.__tablename__, touched)
+        db.commit()
+    if model is models.SiteSetting and levels.SETTING_KEY in touched:
+        # The level curve changed: re-level users now, and again once
+        # every process has dropped its cached curve (until then their XP
+        # flushes can still write levels from the old one)
+        levels.invalidate()
+        jobs.enqueue(db, "recompute_levels")
+        jobs.enqueue(db, "recompute_levels", run_at=datetime.utcnow() + timedelta(seconds=levels.LEVEL_CURVE_TTL + 5))
+        db.commit()
+
+def _validate_setting(key, value):
+    # Settings with a structured value are checked before they are stored
+    if key == levels.SETTING_KEY:
+        try:
+            levels.parse(value)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {levels.SETTING_KEY}: {e}")
+
+def _validate_setting_batch(db: Session, request: schemas.AdminBatchRequest):
+    for op in request.ops:
+        if op.op in ("create", "update") and "value" in op.data:
+            _validate_setting(op.data.get("key", op.id), op.data["value"])
+    if request.filter and request.action == "update" and "value" in request.data:
+        criteria = admin_query.parse_filters(models.SiteSetting, request.filter)
+        touches_curve = db.execute(
+            select(func.count()).select_from(models.SiteSetting)
+            .where(*criteria, models.SiteSetting.key == levels.SETTING_KEY)
+        ).scalar()
+        if touches_curve:
+            _validate_setting(levels.SETTING_KEY, request.data["value"])
+
+@router.post("/generic/{resource}/batch")
+def batch_generic_items(
+    resource: str,
+    request: schemas.AdminBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_super_admin)
+):
+    if resource not in RESOURCE_MAP:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    model = RESOURCE_MAP[resource]
+    if model is models.SiteSetting:
+        _validate_setting_batch(db, request)
+    touched = set()
+    try:
+        return admin_batch.run_batch(
+            db, model, resource, request, current_user.id, watch=WATCHED_COLUMNS.get(model), touched=touched
+        )
+    finally:
+        # Chunks commit as they go, so a failed batch may have written some
+        _generic_write_done(db, model, touched)
 
 @router.get("/generic/{resource}/{id}")
 def get_generic_item(
@@ -438,6 +592,8 @@ def create_generic_item(
         raise HTTPException(status_code=404, detail="Resource not found")
         
     model = RESOURCE_MAP[resource]
+    if model is models.SiteSetting:
+        _validate_setting(data.get("key"), data.get("value"))
     try:
         # Filter data to only include valid columns to avoid errors
         valid_keys = {c.name for c in inspect(model).columns}
@@ -446,6 +602,7 @@ def create_generic_item(
         new_item = model(**clean_data)
         db.add(new_item)
         db.commit()
+        _generic_write_done(db, model, _watched(model, new_item))
         db.refresh(new_item)
         return new_item
     except Exception as e:
@@ -469,14 +626,18 @@ def update_generic_item(
     
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
+    if model is models.SiteSetting:
+        _validate_setting(data.get("key", item.key), data.get("value", item.value))
         
     try:
+        touched = _watched(model, item)
         valid_keys = {c.name for c in inspect(model).columns}
         for k, v in data.items():
             if k in valid_keys:
                 setattr(item, k, v)
         
         db.commit()
+        _generic_write_done(db, model, touched | _watched(model, item))
         db.refresh(item)
         return item
     except Exception as e:
@@ -501,8 +662,10 @@ def delete_generic_item(
         raise HTTPException(status_code=404, detail="Item not found")
         
     try:
+        touched = _watched(model, item)
         db.delete(item)
         db.commit()
+        _generic_write_done(db, model, touched)
         return {"status": "deleted"}
     except Exception as e:
         db.rollback()
@@ -1,9 +1,13 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-from .. import models, schemas, crud, dependencies
+from .. import models, schemas, crud, dependencies, serialization
+from ..services import block_graph, chat_archive, deletion, membership, message_buffer, presence
 from ..database import get_db
-from sqlalchemy import or_, and_, desc, func
+from sqlalchemy import or_, and_, delete, desc, func, select, update
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/chats",
@@ -19,177 +23,118 @@ def get_chats(
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
     # Retrieve chats where user in participant
-    # 1. Get Chat IDs for user
-    user_chat_ids = db.query(models.ChatParticipant.chat_id).filter(
+    # 1. Chat IDs for user, as a subquery: the membership cache only backs
+    # authorization, where a miss is re-checked, and may lag other workers
+    user_chat_ids = select(models.ChatParticipant.chat_id).where(
         models.ChatParticipant.user_id == current_user.id
-    ).subquery()
+    )
     
-    # 2. Get Chats with participants loaded
-    chats = db.query(models.Chat).filter(
-        models.Chat.id.in_(user_chat_ids),
-        # models.Chat.type != 'random_queue' # Show queues so user knows they are waiting
-    ).order_by(models.Chat.updated_at.desc()).offset(skip).limit(limit).options(
-        joinedload(models.Chat.participants).joinedload(models.ChatParticipant.user)
+    # 2. Page of chats, then participants/last messages/users batch-loaded for the page
+    chats = db.execute(
+        select(models.Chat.id, models.Chat.type, models.Chat.updated_at).where(
+            models.Chat.id.in_(user_chat_ids),
+            # models.Chat.type != 'random_queue' # Show queues so user knows they are waiting
+        ).order_by(models.Chat.updated_at.desc()).offset(skip).limit(limit)
     ).all()
-    
-    # 3. Enrich with last message (inefficient N+1 but safe for MVP with small limits)
-    results = []
+
+    # The inbox poll doubles as the random queue heartbeat
     for chat in chats:
-        try:
-            # Hide sensitive user info in random chats if needed, but schema filters usually.
-            # Random chat: Show only username. Direct: Show full?
-            # Re-mapping to schema manually to handle "Random" anonymity if desired.
-            
-            last_msg = db.query(models.Message).filter(
-                models.Message.chat_id == chat.id
-            ).order_by(models.Message.created_at.desc()).first()
-            
-            c_out = schemas.ChatOut.from_orm(chat)
-            if last_msg:
-                 c_out.last_message = schemas.MessageOut.from_orm(last_msg)
-                 # Populate sender manually if needed
-                 if last_msg.sender_id:
-                     sender = db.query(models.User).get(last_msg.sender_id)
-                     if sender:
-                         c_out.last_message.sender = schemas.UserOut.from_orm(sender)
-            
-            results.append(c_out)
-        except Exception as e:
-            print(f"Error serializing chat {chat.id}: {e}")
-            # Skip this chat to avoid breaking the whole list
-            continue
-        
-    return results
+        if chat.type == 'random_queue':
+            presence.touch(db, chat.id, current_user.id)
+    
+    return serialization.ORJSONResponse(serialization.chat_dicts(db, chats, current_user.id))
 
 @router.post("/random", response_model=schemas.ChatOut)
 def join_random_chat(
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    import logging
-    logging.basicConfig(filename='chat_debug.log', level=logging.INFO)
-    logger = logging.getLogger(__name__)
-
     try:
         # Check target language (Mandatory)
         if not current_user.target_language_id:
              raise HTTPException(status_code=400, detail="Please set your target language in settings first.")
             
+        # All my chats with their members (membership cache)
+        my_chats = membership.members_many(db, membership.user_chat_ids(db, current_user.id))
+
         # Check if already in a queue (Wait or return existing)
-        existing_queue_p = db.query(models.ChatParticipant).join(models.Chat).filter(
-            models.ChatParticipant.user_id == current_user.id,
-            models.Chat.type == 'random_queue'
-        ).first()
-        
-        if existing_queue_p:
-            chat_id = existing_queue_p.chat_id
-            logger.info(f"User {current_user.id} already in queue {chat_id}")
-            return fetch_chat_with_relations(db, chat_id)
+        for chat_id, members in my_chats.items():
+            if members.type == 'random_queue':
+                # Re-read: the queue may have been matched or expired elsewhere
+                members = membership.chat_members(db, chat_id, refresh=True)
+                if members is not None and members.type == 'random_queue':
+                    logger.debug("User already in random queue", extra={"user_id": current_user.id, "chat_id": chat_id})
+                    presence.touch(db, chat_id, current_user.id)
+                    return fetch_chat_with_relations(db, chat_id)
 
-        # 1. Fetch existing chat partners to avoid duplicates in random matching
-        # Get all chats where I am a participant
-        my_chat_ids = db.query(models.ChatParticipant.chat_id).filter(
-            models.ChatParticipant.user_id == current_user.id
-        ).all()
-        my_chat_ids = [c[0] for c in my_chat_ids]
-        
-        # Get all users in those chats
-        existing_partner_ids = set()
-        if my_chat_ids:
-            partners = db.query(models.ChatParticipant.user_id).filter(
-                models.ChatParticipant.chat_id.in_(my_chat_ids),
-                models.ChatParticipant.user_id != current_user.id
-            ).all()
-            existing_partner_ids = {p[0] for p in partners}
-            
-        logger.info(f"User {current_user.id} existing partners: {existing_partner_ids}")
+        # 1. Existing chat partners, to avoid duplicates in random matching
+        existing_partner_ids = {user_id for members in my_chats.values() for user_id in members.user_ids}
+        existing_partner_ids.discard(current_user.id)
 
-        # Find a match
-        potential_queues = db.query(models.Chat).filter(
-            models.Chat.type == 'random_queue'
-        ).all()
-        
-        best_match = None
-        fallback_match = None
-        
-        for pq in potential_queues:
-            parts = db.query(models.ChatParticipant).filter(models.ChatParticipant.chat_id == pq.id).all()
-            
-            if len(parts) != 1: continue
-            p_user_id = parts[0].user_id
-            
-            # Skip self
-            if p_user_id == current_user.id: continue 
+        # Never match users blocked in either direction
+        blocked_ids = block_graph.blocked_with(db, current_user.id)
             
-            # Skip if already have a chat with this user
-            if p_user_id in existing_partner_ids:
-                logger.info(f"Skipping match {p_user_id} - active chat exists")
-                continue
-            
-            p_user = db.query(models.User).get(p_user_id)
-            if not p_user: continue
-            
-            if p_user.native_language_id == current_user.target_language_id:
-                best_match = pq
-                break 
-            
-            if not fallback_match:
-                fallback_match = pq
-        
-        target_chat = best_match or fallback_match
+        logger.debug("Random match candidates", extra={"user_id": current_user.id, "existing_partners": len(existing_partner_ids)})
+
+        # Find a match among live waiters (recent heartbeat), in one query
+        candidates = [
+            q for q in presence.live_queues(db)
+            if q.user_id != current_user.id
+            and q.user_id not in blocked_ids
+            and q.user_id not in existing_partner_ids
+        ]
+        # Native speakers of my target language first, then the longest waiting
+        candidates.sort(key=lambda q: q.native_language_id != current_user.target_language_id)
+
+        target = None
+        for q in candidates:
+            # Guarded update: two requests can never take the same queue
+            if presence.claim(db, q.chat_id):
+                target = q
+                break
         
-        if target_chat:
-            target_chat.type = 'random'
-            target_chat.updated_at = func.now()
-            
-            new_p = models.ChatParticipant(chat_id=target_chat.id, user_id=current_user.id)
+        if target:
+            new_p = models.ChatParticipant(chat_id=target.chat_id, user_id=current_user.id)
             db.add(new_p)
             
             # System Msg
-            partner_p = db.query(models.ChatParticipant).filter(
-                models.ChatParticipant.chat_id == target_chat.id,
-                models.ChatParticipant.user_id != current_user.id
-            ).first()
-            
             partner_lang = "Unknown"
-            if partner_p:
-                u = db.query(models.User).get(partner_p.user_id)
-                if u and u.native_language_id:
-                    l = db.query(models.Language).get(u.native_language_id)
-                    if l: partner_lang = l.name
+            if target.native_language_id:
+                l = db.get(models.Language, target.native_language_id)
+                if l: partner_lang = l.name
 
             my_target = "Unknown"
             if current_user.target_language_id:
-                l = db.query(models.Language).get(current_user.target_language_id)
+                l = db.get(models.Language, current_user.target_language_id)
                 if l: my_target = l.name
             
             sys_msg = models.Message(
-                chat_id=target_chat.id,
+                chat_id=target.chat_id,
                 sender_id=None,
                 content=f"Connected! You requested {my_target}. Partner speaks {partner_lang}."
             )
             db.add(sys_msg)
             
             db.commit()
-            logger.info(f"User {current_user.id} joined chat {target_chat.id}")
-            return fetch_chat_with_relations(db, target_chat.id)
+            membership.invalidate(chat_ids=[target.chat_id], user_ids=[current_user.id])
+            logger.info("User joined random chat", extra={"user_id": current_user.id, "chat_id": target.chat_id})
+            return fetch_chat_with_relations(db, target.chat_id)
             
         else:
             new_chat = models.Chat(type='random_queue')
             db.add(new_chat)
+            db.flush()
+            db.add(models.ChatParticipant(chat_id=new_chat.id, user_id=current_user.id))
             db.commit()
+            membership.invalidate(chat_ids=[new_chat.id], user_ids=[current_user.id])
+            presence.register(new_chat.id, current_user.id)
             
-            p = models.ChatParticipant(chat_id=new_chat.id, user_id=current_user.id)
-            db.add(p)
-            db.commit()
-            
-            logger.info(f"User {current_user.id} created queue {new_chat.id}")
+            logger.info("User created random queue", extra={"user_id": current_user.id, "chat_id": new_chat.id})
             return fetch_chat_with_relations(db, new_chat.id)
 
     except Exception as e:
         db.rollback()
-        logger.error(f"Error in join_random_chat: {e}")
-        print(f"Error in join_random_chat: {e}")
+        logger.exception("join_random_chat failed", extra={"user_id": current_user.id})
         raise HTTPException(status_code=500, detail=f"Random chat failed: {str(e)}")
 
 def fetch_chat_with_relations(db: Session, chat_id: str):
@@ -225,47 +170,27 @@ def create_direct_chat(
         raise HTTPException(status_code=400, detail="Cannot chat with yourself.")
         
     # Check Block Status
-    is_blocked = db.query(models.BlockedUser).filter(
-        or_(
-            and_(models.BlockedUser.blocker_id == target_user_id, models.BlockedUser.blocked_id == current_user.id), # They blocked me
-            and_(models.BlockedUser.blocker_id == current_user.id, models.BlockedUser.blocked_id == target_user_id)  # I blocked them
-        )
-    ).first()
-    
-    if is_blocked:
+    if block_graph.is_blocked(db, current_user.id, target_user_id):
         raise HTTPException(status_code=403, detail="Cannot start chat with this user.")
 
-    # Check Existing Direct Chat
-    # Complex query: Find chat where both are participants and type='direct'
-    # Simplification: Fetch my direct chats, check if target is in them.
-    
-    my_chats = db.query(models.Chat).join(models.ChatParticipant).filter(
-        models.ChatParticipant.user_id == current_user.id,
-        models.Chat.type == 'direct'
-    ).all()
-    
-    for chat in my_chats:
-        # Check if target is participant
-        is_participant = db.query(models.ChatParticipant).filter(
-            models.ChatParticipant.chat_id == chat.id,
-            models.ChatParticipant.user_id == target_user_id
-        ).first()
-        if is_participant:
-            return chat
-            
-    # Create New Direct Chat
-    new_chat = models.Chat(type='direct')
-    db.add(new_chat)
-    db.commit()
-    db.refresh(new_chat)
-    
-    p1 = models.ChatParticipant(chat_id=new_chat.id, user_id=current_user.id)
-    p2 = models.ChatParticipant(chat_id=new_chat.id, user_id=target_user_id)
-    db.add(p1)
-    db.add(p2)
-    db.commit()
-    
-    return new_chat
+    # Existing live direct chat for the pair, or a new one (single transaction)
+    chat_id = crud.get_or_create_direct_chat(db, current_user.id, target_user_id)
+    return fetch_chat_with_relations(db, chat_id)
+
+@router.post("/random/heartbeat")
+def random_queue_heartbeat(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_active_user)
+):
+    # Explicit heartbeat for clients that do not poll the inbox while
+    # waiting (GET /chats/ and the message poll count as heartbeats too).
+    # Queue entries without one for RANDOM_QUEUE_TTL seconds are dropped.
+    my_chats = membership.members_many(db, membership.user_chat_ids(db, current_user.id))
+    for chat_id, members in my_chats.items():
+        if members.type == 'random_queue':
+            presence.touch(db, chat_id, current_user.id)
+            return {"status": "waiting", "chat_id": chat_id, "ttl": presence.QUEUE_TTL}
+    return {"status": "not_waiting"}
 
 @router.get("/{chat_id}/messages", response_model=List[schemas.MessageOut])
 def get_messages(
@@ -276,19 +201,41 @@ def get_messages(
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
     # Verify participant
-    is_participant = db.query(models.ChatParticipant).filter(
-        models.ChatParticipant.chat_id == chat_id,
-        models.ChatParticipant.user_id == current_user.id
-    ).first()
-    
-    if not is_participant:
+    members = membership.member_of(db, chat_id, current_user.id)
+    if members is None:
         raise HTTPException(status_code=403, detail="Not a participant")
-        
-    msgs = db.query(models.Message).filter(
-        models.Message.chat_id == chat_id
-    ).order_by(models.Message.created_at.asc()).offset(skip).limit(limit).all()
+    if members.type == 'random_queue':
+        # Polling an open queue chat keeps the waiter live
+        presence.touch(db, chat_id, current_user.id)
+
+    # How much of the history is archived (changes outside this process, not cached)
+    archived = db.execute(
+        select(func.coalesce(models.Chat.archived_messages, 0)).where(models.Chat.id == chat_id)
+    ).scalar() or 0
+
+    # Archived messages come first, then the hot table
+    msgs = chat_archive.read_archived(db, chat_id, skip, limit) if skip < archived else []
+    hot_skip = max(0, skip - archived)
+    if len(msgs) < limit:
+        msgs += db.execute(
+            select(*serialization.MESSAGE_COLUMNS).where(
+                models.Message.chat_id == chat_id
+            ).order_by(models.Message.created_at.asc()).offset(hot_skip).limit(limit - len(msgs))
+        ).all()
+
+    # Write-behind mode: messages not flushed yet are served from memory
+    buffer = message_buffer.active()
+    if buffer is not None and len(msgs) < limit and buffer.pending(chat_id):
+        if msgs:
+            # A short page ends the stored history
+            stored = skip + len(msgs)
+        else:
+            # The page starts past it: count the hot rows, at most hot_skip of them
+            hot = select(models.Message.id).where(models.Message.chat_id == chat_id).limit(hot_skip).subquery()
+            stored = archived + db.execute(select(func.count()).select_from(hot)).scalar()
+        msgs = buffer.merge_pending(chat_id, msgs, skip, limit, stored)
     
-    return msgs
+    return serialization.ORJSONResponse(serialization.message_dicts(db, msgs))
 
 @router.post("/{chat_id}/messages", response_model=schemas.MessageOut)
 def send_message(
@@ -297,35 +244,52 @@ def send_message(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    # Verify participant
-    chat = db.query(models.Chat).get(chat_id)
-    if not chat:
+    # Chat state and participants (membership cache; misses re-checked)
+    members = membership.chat_members(db, chat_id)
+    if members is None or current_user.id not in members.user_ids:
+        members = membership.chat_members(db, chat_id, refresh=True)
+    if members is None:
         raise HTTPException(404, "Chat not found")
-        
-    is_part = db.query(models.ChatParticipant).filter(
-        models.ChatParticipant.chat_id == chat_id,
-        models.ChatParticipant.user_id == current_user.id
-    ).first()
-    if not is_part:
+    if current_user.id not in members.user_ids:
         raise HTTPException(403, "Not a participant")
+    if members.type == 'terminated':
+        raise HTTPException(403, "This chat has ended.")
         
-    # Check if blocked
-    # ... logic here if needed per message, assuming creation check is enough for MVP
-    
-    new_msg = models.Message(
-        chat_id=chat_id,
-        sender_id=current_user.id,
-        content=msg.content
-    )
-    db.add(new_msg)
-    
-    # Update Chat Updated At
-    chat.updated_at = func.now()
-    
-    db.commit()
-    db.refresh(new_msg)
+    # Blocks made after the chat started apply to every message (cached, no query)
+    blocked_ids = block_graph.blocked_with(db, current_user.id)
+    if any(user_id in blocked_ids for user_id in members.user_ids):
+        raise HTTPException(403, "Cannot send messages to this user.")
     
-    return new_msg
+    buffer = message_buffer.active()
+    if buffer is not None:
+        message = buffer.append(chat_id, current_user.id, msg.content)
+    else:
+        message = crud.insert_message(db, chat_id, current_user.id, msg.content)
+    return serialization.ORJSONResponse(serialization.message_dicts(db, [message])[0])
+
+@router.post("/{chat_id}/read", response_model=schemas.ChatReadOut)
+def mark_chat_read(
+    chat_id: str,
+    body: Optional[schemas.ChatReadIn] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_active_user)
+):
+    # Moves the caller's read watermark; a single UPDATE whatever the chat size
+    message = None
+    if body and body.message_id:
+        message = db.execute(
+            select(models.Message.id, models.Message.created_at).where(
+                models.Message.id == body.message_id,
+                models.Message.chat_id == chat_id
+            )
+        ).first() or chat_archive.find_archived(db, chat_id, body.message_id)
+        if not message:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+    watermark = crud.mark_chat_read(db, chat_id, current_user.id, message)
+    if watermark is None:
+        raise HTTPException(status_code=403, detail="Not a participant")
+    return watermark
 
 @router.post("/block")
 def block_user(
@@ -336,16 +300,8 @@ def block_user(
     target_id = body.get("user_id")
     if not target_id: raise HTTPException(400)
     
-    exists = db.query(models.BlockedUser).filter(
-        models.BlockedUser.blocker_id == current_user.id,
-        models.BlockedUser.blocked_id == target_id
-    ).first()
-    
-    if exists: return {"status": "already_blocked"}
-    
-    block = models.BlockedUser(blocker_id=current_user.id, blocked_id=target_id)
-    db.add(block)
-    db.commit()
+    if not crud.block_user(db, current_user.id, target_id):
+        return {"status": "already_blocked"}
     return {"status": "blocked"}
 
 @router.post("/report")
@@ -374,29 +330,15 @@ def delete_chat(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    # Verify participant
-    is_part = db.query(models.ChatParticipant).filter(
-        models.ChatParticipant.chat_id == chat_id,
-        models.ChatParticipant.user_id == current_user.id
-    ).first()
-    
-    if not is_part:
+    # Verify participant (fresh: the outcome depends on who else is still in)
+    members = membership.chat_members(db, chat_id, refresh=True)
+    if members is None or current_user.id not in members.user_ids:
         raise HTTPException(status_code=403, detail="Not a participant of this chat")
         
-    chat = db.query(models.Chat).get(chat_id)
-    if not chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
-        
     # Check if other participants exist
-    other_participants_count = db.query(models.ChatParticipant).filter(
-        models.ChatParticipant.chat_id == chat_id,
-        models.ChatParticipant.user_id != current_user.id
-    ).count()
-
-    if other_participants_count == 0:
-        # Only me or empty -> Hard Delete
-        db.delete(chat)
-        db.commit()
+    if members.user_ids == {current_user.id}:
+        # Only me -> Hard Delete (history in both tiers)
+        deletion.purge(db, models.Chat, [chat_id])  # invalidates membership
         return {"status": "chat_deleted"}
     else:
         # Others present -> Leave Chat
@@ -407,11 +349,20 @@ def delete_chat(
         )
         db.add(msg)
         
-        # 2. Mark as terminated (so other user knows it's dead)
-        chat.type = 'terminated'
+        # 2. Mark as terminated (so other user knows it's dead); the pair key
+        # is released so the two users can start a new direct chat later
+        db.execute(
+            update(models.Chat).where(models.Chat.id == chat_id)
+            .values(type='terminated', user_low_id=None, user_high_id=None),
+            execution_options={"synchronize_session": False},
+        )
         
         # 3. Remove ME from participants so it disappears from my list
-        db.delete(is_part) # is_part is the ChatParticipant object for current_user
+        db.execute(delete(models.ChatParticipant).where(
+            models.ChatParticipant.chat_id == chat_id,
+            models.ChatParticipant.user_id == current_user.id
+        ))
         
         db.commit()
+        membership.invalidate(chat_ids=[chat_id], user_ids=[current_user.id])
         return {"status": "chat_left"}
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from typing import List, Optional
-from .. import models, schemas, dependencies, crud
+from .. import models, schemas, dependencies, crud, pagination, serialization
 from ..database import get_db
 from ..repository import Repository
+from ..services import deletion, featured, jobs
 from ..features.users.create_user import CreateUserCommand
 
+logger = logging.getLogger(__name__)
+
 # --- Words Router (Full CRUD + Filtering) ---
 router_words = APIRouter(prefix="/words", tags=["Words"])
 
@@ -112,9 +117,7 @@ def get_random_word(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"ERROR in get_random_word: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("get_random_word failed", extra={"user_id": current_user.id})
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 @router_words.get("/learned/today", response_model=List[schemas.WordOut])
@@ -154,51 +157,24 @@ def get_questions(
     unanswered: Optional[bool] = None,
     db: Session = Depends(get_db)
 ):
-    from sqlalchemy.orm import joinedload
-    repo = Repository(models.Question, db)
-    
-    # Custom query construction for complex filters
-    query = db.query(models.Question)
+    # Soft-deleted questions stay hidden
+    query = select(*serialization.QUESTION_COLUMNS).where(models.Question.is_active.isnot(False))
     
     if source_lang:
-        query = query.filter(models.Question.source_language_id == source_lang)
+        query = query.where(models.Question.source_language_id == source_lang)
     if target_lang:
-        query = query.filter(models.Question.target_language_id == target_lang)
+        query = query.where(models.Question.target_language_id == target_lang)
     if user_id:
-        query = query.filter(models.Question.user_id == user_id)
+        query = query.where(models.Question.user_id == user_id)
     if unanswered:
-        # Check if answers list is empty (this might need left outer join check)
-        # Using simple approach: questions with no answers
-        query = query.outerjoin(models.Answer).filter(models.Answer.id == None)
-        
-    # Apply joined loads
-    query = query.options(
-        joinedload(models.Question.user), 
-        joinedload(models.Question.answers).joinedload(models.Answer.user)
-    )
-    
-    # Ordering
-    query = query.order_by(models.Question.created_at.desc())
-    
-    # Pagination
-    total = query.count()
-    query = query.offset(skip).limit(limit)
-    
-    questions = query.all()
+        # Questions with no answers
+        query = query.where(~select(models.Answer.id).where(models.Answer.question_id == models.Question.id).exists())
     
-    # Check Saved Status
-    if user_id: # Or current_user if available via dependency injection in future refactor
-         # For now, let's just return as is, but ideally we inject current_user to check 'is_saved'
-         # If the endpoint doesn't require auth, we can't check 'is_saved' for a specific user easily
-         # unless we pass a token or ID.
-         # Let's assume frontend handles visual state or we add optional auth.
-         pass
-         
-    # To support is_saved in list view for authenticated users, we need current_user.
-    # Since this endpoint is open (no auth required in arguments), we skip is_saved logic here 
-    # OR we need to add optional auth dependency.
+    query = query.order_by(models.Question.created_at.desc()).offset(skip).limit(limit)
     
-    return questions
+    # is_saved needs the current user; this endpoint is public so it stays False here.
+    # Answers and users are batch-loaded and serialized without the ORM.
+    return serialization.ORJSONResponse(serialization.question_dicts(db, db.execute(query).all()))
 
 @router_questions.post("/")
 def create_question(question: schemas.QuestionCreate, db: Session = Depends(get_db), current_user: models.User = Depends(dependencies.get_current_active_user)):
@@ -243,13 +219,19 @@ def create_question(question: schemas.QuestionCreate, db: Session = Depends(get_
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error creating question: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("create_question failed", extra={"user_id": current_user.id})
         raise HTTPException(status_code=500, detail=f"Creation Error: {str(e)}")
 
 # ...
 
+def _notify(db: Session, user_id: str, title: str, message: str):
+    # Deferred to the job runner. A process without one (JOB_WORKERS=0)
+    # writes the notification with the request instead; the caller commits.
+    if jobs.runner_active():
+        jobs.enqueue(db, "notify", {"user_id": user_id, "title": title, "message": message})
+    else:
+        crud.create_notification(db, user_id, title, message)
+
 @router_answers.post("/", response_model=schemas.AnswerOut)
 def create_answer(answer: schemas.AnswerCreate, db: Session = Depends(get_db), current_user: models.User = Depends(dependencies.get_current_active_user)):
     repo = Repository(models.Answer, db)
@@ -260,13 +242,8 @@ def create_answer(answer: schemas.AnswerCreate, db: Session = Depends(get_db), c
     # Notification Logic
     question = db.query(models.Question).filter(models.Question.id == answer.question_id).first()
     if question and question.user_id != current_user.id:
-        notification = models.Notification(
-            user_id=question.user_id,
-            title="New Answer",
-            message=f"{current_user.username} answered your question: {question.question_text[:30]}..."
-        )
-        db.add(notification)
-        db.commit()
+        _notify(db, question.user_id, "New Answer",
+                f"{current_user.username} answered your question: {question.question_text[:30]}...")
 
     # Update Stats (+5 XP)
     crud.update_user_stats(db, current_user, xp_gain=5)
@@ -284,36 +261,19 @@ def get_articles(
     current_user_id: Optional[str] = Query(None, alias="current_user_id"), 
     db: Session = Depends(get_db)
 ):
-    from sqlalchemy.orm import joinedload
-    from sqlalchemy import func
-    
-    repo = Repository(models.Article, db)
-    
-    filters = {}
+    query = select(*serialization.ARTICLE_COLUMNS)
     if user_id:
-        filters['user_id'] = user_id
-        
-    articles = repo.get_all(
-        skip=skip, 
-        limit=limit, 
-        filters=filters,
-        setup_query=lambda q: q.options(joinedload(models.Article.user)), 
-        order_by="created_at"
-    )
+        query = query.where(models.Article.user_id == user_id)
+    articles = db.execute(
+        query.order_by(models.Article.created_at.desc()).offset(skip).limit(limit)
+    ).all()
 
     # Enhance with likes
     article_ids = [a.id for a in articles]
     
     if not article_ids:
-        return []
+        return serialization.ORJSONResponse([])
 
-    # Get Like Counts
-    like_counts = db.query(
-        models.ArticleLike.article_id, func.count(models.ArticleLike.id)
-    ).filter(models.ArticleLike.article_id.in_(article_ids)).group_by(models.ArticleLike.article_id).all()
-    
-    like_map = {lc[0]: lc[1] for lc in like_counts}
-    
     # Get User Likes
     liked_article_ids = set()
     if current_user_id:
@@ -333,16 +293,9 @@ def get_articles(
         ).all()
         saved_article_ids = {s[0] for s in saved}
 
-    results = []
-    for a in articles:
-        # Pydantic model conversion happens later, but we can attach attributes to ORM objects 
-        # because Pydantic from_attributes=True will look for them.
-        a.like_count = like_map.get(a.id, 0)
-        a.is_liked = a.id in liked_article_ids
-        a.is_saved = a.id in saved_article_ids
-        results.append(a)
-        
-    return results
+    return serialization.ORJSONResponse(
+        serialization.article_dicts(db, articles, liked_article_ids, saved_article_ids)
+    )
 
 @router_articles.post("/{article_id}/like")
 def toggle_article_like(
@@ -350,37 +303,22 @@ def toggle_article_like(
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    # Check if already liked
-    existing_like = db.query(models.ArticleLike).filter(
-        models.ArticleLike.user_id == current_user.id,
-        models.ArticleLike.article_id == article_id
-    ).first()
-    
-    if existing_like:
-        db.delete(existing_like)
-        db.commit()
-        return {"status": "unliked"}
-    else:
-        new_like = models.ArticleLike(user_id=current_user.id, article_id=article_id)
-        db.add(new_like)
-        
+    result = crud.toggle_article_like(db, current_user.id, article_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    is_liked, newly_liked, like_count = result
+
+    if newly_liked:
         # Notification Logic
-        article = db.query(models.Article).filter(models.Article.id == article_id).first()
+        article = db.query(models.Article.user_id, models.Article.title).filter(models.Article.id == article_id).first()
         if article and article.user_id != current_user.id:
-            notification = models.Notification(
-                user_id=article.user_id,
-                title="New Like",
-                message=f"{current_user.username} liked your article: {article.title}"
-            )
-            db.add(notification)
-            
-        db.commit()
-        
+            _notify(db, article.user_id, "New Like", f"{current_user.username} liked your article: {article.title}")
+
         # Update Stats (+1 XP)
         crud.update_user_stats(db, current_user, xp_gain=1)
-        db.commit()
-        
-        return {"status": "liked"}
+
+    db.commit()
+    return {"status": "liked" if is_liked else "unliked", "like_count": like_count}
 
 @router_articles.post("/", response_model=schemas.ArticleOut)
 def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db), current_user: models.User = Depends(dependencies.get_current_active_user)):
@@ -446,9 +384,7 @@ def create_article(article: schemas.ArticleCreate, db: Session = Depends(get_db)
         
         return new_article
     except Exception as e:
-        print(f"ERROR creating article: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("create_article failed", extra={"user_id": current_user.id})
         raise HTTPException(status_code=500, detail=f"Creation Error: {str(e)}")
 
 @router_articles.put("/{article_id}", response_model=schemas.ArticleOut)
@@ -463,7 +399,7 @@ def update_article(article_id: str, article: schemas.ArticleCreate, db: Session
     return repo.update(existing_article, article.dict())
 
 @router_articles.delete("/{article_id}")
-def delete_article(article_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(dependencies.get_current_active_user)):
+def delete_article(article_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(dependencies.get_current_active_user)):
     repo = Repository(models.Article, db)
     existing_article = repo.get(article_id)
     if not existing_article:
@@ -471,7 +407,7 @@ def delete_article(article_id: str, db: Session = Depends(get_db), current_user:
     if existing_article.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this article")
     
-    repo.delete(article_id)
+    deletion.delete_content(db, models.Article, [article_id], background_tasks)
     return {"message": "Article deleted"}
 
 @router_articles.post("/{article_id}/read")
@@ -503,15 +439,34 @@ def get_notifications(
     skip: int = 0, 
     limit: int = 20, 
     unread_only: bool = False,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    query = db.query(models.Notification).filter(models.Notification.user_id == current_user.id)
-    
-    if unread_only:
-        query = query.filter(models.Notification.is_read == False)
-        
-    return query.order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
+    # Prefer `cursor` (from X-Next-Cursor) over `skip` for deep pages
+    notifications = crud.get_notifications(
+        db, current_user.id, limit=limit, skip=skip, unread_only=unread_only, cursor=cursor
+    )
+
+    headers = {}
+    next_cursor = pagination.next_cursor(notifications, limit, key=lambda n: [n.created_at, n.id])
+    if next_cursor:
+        headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return serialization.ORJSONResponse(serialization.notification_dicts(notifications), headers=headers)
+
+@router_notifications.get("/unread-count")
+def get_unread_notification_count(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(dependencies.get_current_active_user)
+):
+    count, version = crud.get_unread_notification_count(db, current_user.id)
+    etag = f'W/"{version}-{count}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"unread_count": count}, headers=headers)
 
 @router_notifications.put("/{notification_id}/read", response_model=schemas.NotificationOut)
 def mark_notification_read(
@@ -519,17 +474,10 @@ def mark_notification_read(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    notification = db.query(models.Notification).filter(
-        models.Notification.id == notification_id,
-        models.Notification.user_id == current_user.id
-    ).first()
+    notification = crud.mark_notification_read(db, current_user.id, notification_id)
     
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
-        
-    notification.is_read = True
-    db.commit()
-    db.refresh(notification)
     return notification
 
 @router_notifications.post("/read-all")
@@ -537,13 +485,7 @@ def mark_all_notifications_read(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    db.query(models.Notification).filter(
-        models.Notification.user_id == current_user.id,
-        models.Notification.is_read == False
-    ).update({models.Notification.is_read: True}, synchronize_session=False)
-    
-    db.commit()
-    db.commit()
+    crud.mark_all_notifications_read(db, current_user.id)
     return {"message": "All notifications marked as read"}
 
 # --- New Feature Endpoints ---
@@ -565,11 +507,21 @@ def toggle_save_content(
 
 @router_features.get("/saved", response_model=List[schemas.SavedContentOut])
 def get_user_saved_content(
+    response: Response,
     content_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    return crud.get_user_saved_content(db, current_user.id, content_type)
+    # Without `limit` everything is returned, as before
+    items = crud.get_user_saved_content(db, current_user.id, content_type, limit=limit, cursor=cursor)
+
+    if limit:
+        next_cursor = pagination.next_cursor(items, limit, key=lambda i: [i.created_at, i.id])
+        if next_cursor:
+            response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 @router_features.post("/helpful/{answer_id}")
 def mark_answer_helpful(
@@ -577,14 +529,16 @@ def mark_answer_helpful(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
-    success = crud.mark_answer_helpful(db, current_user.id, answer_id)
+    success, helpful_count = crud.mark_answer_helpful(db, current_user.id, answer_id)
+    if helpful_count is None:
+        raise HTTPException(status_code=404, detail="Answer not found")
     if not success:
-         return {"status": "ignored", "message": "Already marked helpful"}
-    return {"status": "success", "message": "Marked as helpful"}
+         return {"status": "ignored", "message": "Already marked helpful", "helpful_count": helpful_count}
+    return {"status": "success", "message": "Marked as helpful", "helpful_count": helpful_count}
 
 @router_features.get("/daily-sentence", response_model=Optional[schemas.AnswerOut])
 def get_daily_content(db: Session = Depends(get_db)):
-    return crud.get_daily_sentence(db)
+    return featured.get_daily_sentence(db)
 
 @router_features.get("/weekly-champion", response_model=Optional[schemas.WeeklyChampion])
 def get_weekly_champion_stats(db: Session = Depends(get_db)):
@@ -5,6 +5,7 @@ from typing import List, Optional
 from datetime import date, timedelta
 from .. import models, schemas, dependencies
 from ..database import get_db
+from ..services import levels, xp_buffer
 
 router_stats = APIRouter(prefix="/stats", tags=["Stats"])
 
@@ -38,21 +39,16 @@ def get_overview_stats(
         models.Question.created_at >= week_ago
     ).count()
     
-    # 5. Streak & XP
-    streak = current_user.streak_days or 0
-    xp = current_user.xp or 0
-    level = current_user.current_level or "Beginner"
-    
-    # Next Level calculation
-    # If using simplified thresholds from features.py logic
-    next_level_xp = 500
-    if xp >= 25000: next_level_xp = 100000 # Max
-    elif xp >= 10000: next_level_xp = 25000
-    elif xp >= 5000: next_level_xp = 10000
-    elif xp >= 2000: next_level_xp = 5000
-    elif xp >= 500: next_level_xp = 2000
-    
-    progress_percentage = min(int((xp / next_level_xp) * 100), 100) if next_level_xp > 0 else 100
+    # 5. Streak & XP (including XP this worker has not flushed yet)
+    progress = xp_buffer.progress(db, current_user)
+    streak = progress.streak_days
+    xp = progress.xp
+    level = progress.level
+
+    # Next level from the same curve the stored level comes from
+    curve = levels.current(db)
+    next_level_xp = curve.next_threshold(xp) or xp
+    progress_percentage = curve.progress(xp)
 
     return {
         "total_vocabulary": total_vocab,
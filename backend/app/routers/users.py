@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.orm import Session
 from .. import crud, schemas, dependencies
@@ -5,6 +6,8 @@ from ..database import get_db
 from ..patterns.mediator import mediator
 from ..features.users.create_user import CreateUserCommand, CreateUserHandler
 
+logger = logging.getLogger(__name__)
+
 # Register Handler
 mediator.register(CreateUserCommand, CreateUserHandler)
 
@@ -83,9 +86,8 @@ async def send_verification_email(
     import os
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
     verification_link = f"{frontend_url}/verify-email/confirm?token={token}"
-    print(f"----- VERIFICATION EMAIL SENT TO {current_user.email} -----")
-    print(f"Link: {verification_link}")
-    print("-----------------------------------------------------------")
+    # The link carries the token, so only the user id is logged
+    logger.info("Verification email sent", extra={"user_id": current_user.id})
     
     return {"message": "Verification email sent", "dev_token": token, "link": verification_link}
 
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 import uuid
-from typing import Optional, List
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -251,10 +251,32 @@ class ChatOut(BaseModel):
     updated_at: Optional[datetime] = None
     participants: List[ChatParticipantOut] = []
     last_message: Optional[MessageOut] = None # Will need to compute or fetch separately often
+    unread_count: int = 0
     
     class Config:
         from_attributes = True
 
+class ChatReadIn(BaseModel):
+    message_id: Optional[str] = None # Defaults to the latest message
+
+class ChatReadOut(BaseModel):
+    chat_id: str
+    last_read_message_id: Optional[str] = None
+    last_read_at: Optional[datetime] = None
+
 class ChatCreate(BaseModel):
     type: str = "direct"
     target_user_id: Optional[str] = None # If direct
+
+class AdminBatchOp(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None # Required for update/delete
+    data: Dict[str, Any] = {}
+
+class AdminBatchRequest(BaseModel):
+    # Either explicit ops, or a filter ("column:op:value" like the list endpoint) plus an action
+    ops: List[AdminBatchOp] = []
+    filter: List[str] = []
+    action: Optional[Literal["update", "delete"]] = None
+    data: Dict[str, Any] = {}
+    chunk_size: int = Field(500, ge=1, le=5000)
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Fast path for hot list endpoints.
+# Instead of loading ORM graphs and validating them through the nested
+# response schemas row by row, rows are read with column-projected queries,
+# related users (with roles and plan) are batch-loaded once per response, and
+# the resulting dicts are encoded by orjson. The dicts mirror the schemas in
+# schemas.py field for field; tests/test_serialization.py keeps them in sync.
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # OPT_UTC_Z writes UTC offsets as "Z", matching Pydantic's output
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+# --- Users ---
+
+USER_COLUMNS = (
+    models.User.id, models.User.email, models.User.username, models.User.is_active,
+    models.User.created_at, models.User.plan_id, models.User.native_language_id,
+    models.User.target_language_id, models.User.email_verified,
+)
+PLAN_COLUMNS = (
+    models.Plan.id, models.Plan.name, models.Plan.price, models.Plan.daily_word_limit,
+    models.Plan.daily_question_limit, models.Plan.daily_answer_limit,
+    models.Plan.daily_article_limit, models.Plan.is_active,
+)
+
+
+def _plan_dict(row) -> dict:
+    plan = row._asdict()
+    plan["price"] = float(plan["price"]) if plan["price"] is not None else None
+    return plan
+
+
+def user_dicts(db: Session, user_ids: Iterable[Optional[str]]) -> Dict[str, dict]:
+    # UserOut payloads keyed by id: three queries whatever the number of users
+    ids = {uid for uid in user_ids if uid}
+    if not ids:
+        return {}
+
+    users = {row.id: row._asdict() for row in db.execute(select(*USER_COLUMNS).where(models.User.id.in_(ids)))}
+
+    roles = defaultdict(list)
+    role_rows = db.execute(
+        select(models.UserRole.user_id, models.Role.id, models.Role.name)
+        .join(models.Role, models.Role.id == models.UserRole.role_id)
+        .where(models.UserRole.user_id.in_(ids))
+    )
+    for user_id, role_id, name in role_rows:
+        roles[user_id].append({"role": {"name": name, "id": role_id}})
+
+    plan_ids = {u["plan_id"] for u in users.values() if u["plan_id"]}
+    plans = {}
+    if plan_ids:
+        plans = {row.id: _plan_dict(row) for row in db.execute(select(*PLAN_COLUMNS).where(models.Plan.id.in_(plan_ids)))}
+
+    for user_id, user in users.items():
+        user["roles"] = roles.get(user_id, [])
+        user["plan"] = plans.get(user["plan_id"])
+    return users
+
+
+# --- Questions / answers ---
+
+QUESTION_COLUMNS = (
+    models.Question.id, models.Question.question_text, models.Question.description,
+    models.Question.source_language_id, models.Question.target_language_id,
+    models.Question.user_id, models.Question.created_at,
+)
+ANSWER_COLUMNS = (
+    models.Answer.id, models.Answer.question_id, models.Answer.answer_text,
+    models.Answer.user_id, models.Answer.created_at, models.Answer.helpful_count,
+    models.Answer.context_tags,
+)
+
+
+def question_dicts(db: Session, rows: Sequence[Any]) -> List[dict]:
+    # rows: QUESTION_COLUMNS tuples, already filtered/ordered/paged
+    if not rows:
+        return []
+
+    answers = defaultdict(list)
+    answer_rows = db.execute(
+        select(*ANSWER_COLUMNS)
+        .where(models.Answer.question_id.in_([r.id for r in rows]))
+        .order_by(models.Answer.created_at, models.Answer.id)
+    ).all()
+    users = user_dicts(db, [r.user_id for r in rows] + [a.user_id for a in answer_rows])
+
+    for a in answer_rows:
+        answer = a._asdict()
+        answer["helpful_count"] = answer["helpful_count"] if answer["helpful_count"] is not None else 0
+        answer["user"] = users.get(a.user_id)
+        answer["is_helpful"] = False
+        answers[a.question_id].append(answer)
+
+    results = []
+    for r in rows:
+        question = r._asdict()
+        question["user"] = users.get(r.user_id)
+        question["answers"] = answers.get(r.id, [])
+        question["is_saved"] = False
+        results.append(question)
+    return results
+
+
+# --- Articles ---
+
+ARTICLE_COLUMNS = (
+    models.Article.id, models.Article.title, models.Article.content, models.Article.language_id,
+    models.Article.user_id, models.Article.created_at, models.Article.like_count,
+)
+
+
+def article_dicts(db: Session, rows: Sequence[Any],
+                  liked_ids: Iterable[str] = (), saved_ids: Iterable[str] = ()) -> List[dict]:
+    liked_ids, saved_ids = set(liked_ids), set(saved_ids)
+    users = user_dicts(db, [r.user_id for r in rows])
+    results = []
+    for r in rows:
+        article = r._asdict()
+        article["user"] = users.get(r.user_id)
+        article["is_liked"] = r.id in liked_ids
+        article["is_saved"] = r.id in saved_ids
+        results.append(article)
+    return results
+
+
+# --- Notifications ---
+
+NOTIFICATION_COLUMNS = (
+    models.Notification.id, models.Notification.title, models.Notification.message,
+    models.Notification.is_read, models.Notification.created_at,
+)
+
+
+def notification_dicts(rows: Sequence[Any]) -> List[dict]:
+    return [r._asdict() for r in rows]
+
+
+# --- Chats / messages ---
+
+MESSAGE_COLUMNS = (
+    models.Message.id, models.Message.chat_id, models.Message.sender_id, models.Message.content,
+    models.Message.is_read, models.Message.created_at,
+)
+
+
+def message_dicts(db: Session, rows: Sequence[Any], users: Optional[Dict[str, dict]] = None) -> List[dict]:
+    if users is None:
+        users = user_dicts(db, [r.sender_id for r in rows])
+    results = []
+    for r in rows:
+        message = r._asdict()
+        message["sender"] = users.get(r.sender_id)
+        results.append(message)
+    return results
+
+
+def unread_counts(db: Session, user_id: str, chat_ids: Sequence[str]) -> Dict[str, int]:
+    # Messages from others after the user's read watermark, for all chats in
+    # one grouped query over ix_messages_chat_created. Chats with nothing
+    # unread are absent.
+    participant = models.ChatParticipant
+    message = models.Message
+    rows = db.execute(
+        select(message.chat_id, func.count())
+        .join(participant, and_(participant.chat_id == message.chat_id, participant.user_id == user_id))
+        .where(
+            message.chat_id.in_(chat_ids),
+            or_(message.sender_id.is_(None), message.sender_id != user_id),
+            or_(participant.last_read_at.is_(None), message.created_at > participant.last_read_at),
+        )
+        .group_by(message.chat_id)
+    )
+    return dict(rows.all())
+
+
+def chat_dicts(db: Session, rows: Sequence[Any], user_id: Optional[str] = None) -> List[dict]:
+    # rows: (Chat.id, Chat.type, Chat.updated_at) tuples, already ordered/paged.
+    # unread_count is filled in for user_id when given.
+    if not rows:
+        return []
+    chat_ids = [r.id for r in rows]
+
+    participant_rows = db.execute(
+        select(models.ChatParticipant.chat_id, models.ChatParticipant.user_id, models.ChatParticipant.joined_at)
+        .where(models.ChatParticipant.chat_id.in_(chat_ids))
+    ).all()
+
+    # Latest message per chat in one query
+    ranked = select(
+        *MESSAGE_COLUMNS,
+        func.row_number().over(
+            partition_by=models.Message.chat_id,
+            order_by=(models.Message.created_at.desc(), models.Message.id.desc()),
+        ).label("rank"),
+    ).where(models.Message.chat_id.in_(chat_ids)).subquery()
+    last_rows = db.execute(
+        select(*(ranked.c[c.key] for c in MESSAGE_COLUMNS)).where(ranked.c.rank == 1)
+    ).all()
+
+    unread = unread_counts(db, user_id, chat_ids) if user_id else {}
+
+    users = user_dicts(db, [p.user_id for p in participant_rows] + [m.sender_id for m in last_rows])
+    last_messages = {m["chat_id"]: m for m in message_dicts(db, last_rows, users)}
+
+    participants = defaultdict(list)
+    for p in participant_rows:
+        user = users.get(p.user_id)
+        # ChatParticipantOut requires a user; dangling rows are skipped
+        if user is not None:
+            participants[p.chat_id].append({"user": user, "joined_at": p.joined_at})
+
+    return [
+        {
+            "id": r.id,
+            "type": r.type,
+            "updated_at": r.updated_at,
+            "participants": participants.get(r.id, []),
+            "last_message": last_messages.get(r.id),
+            "unread_count": unread.get(r.id, 0),
+        }
+        for r in rows
+    ]
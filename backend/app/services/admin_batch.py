@@ -0,0 +1,204 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import models, pagination, schemas
+from . import admin_query
+
+# Bulk mutations for the generic admin resource API.
+# Work is split into chunks; each chunk is a handful of set-based statements
+# (one INSERT ... RETURNING, one executemany UPDATE by primary key, one
+# DELETE ... WHERE pk IN) committed as one transaction. If a chunk fails it is
+# rolled back and replayed op by op inside savepoints so that only the
+# offending items are reported as errors.
+#
+# Rows are written with Core-level statements: ORM relationship cascades do
+# not run, exactly like a DELETE issued in SQL. Callers that keep derived
+# state (caches, counters) name a `watch` column and get back the values it
+# had before and after the batch in the rows that changed.
+
+MAX_BATCH_OPS = 10000
+
+
+def _values(columns: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    # Unknown keys are dropped, like the single-item endpoints do
+    values = {}
+    for key, value in data.items():
+        column = columns.get(key)
+        if column is None:
+            continue
+        if isinstance(value, str):
+            value = admin_query.coerce_value(column, value)
+        values[key] = value
+    return values
+
+
+def _apply(db, model, pk, columns, chunk: List[Tuple[int, schemas.AdminBatchOp]],
+           watch: Optional[str] = None, touched: Optional[Set[Any]] = None) -> Dict[int, dict]:
+    results = {}
+    creates = [(i, op) for i, op in chunk if op.op == "create"]
+    updates = [(i, op) for i, op in chunk if op.op == "update"]
+    deletes = [(i, op) for i, op in chunk if op.op == "delete"]
+
+    if creates:
+        rows = [_values(columns, op.data) for _, op in creates]
+        ids = db.execute(
+            insert(model).returning(pk, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        for (i, _), new_id in zip(creates, ids):
+            results[i] = {"status": "created", "id": new_id}
+        if watch:
+            touched.update(row.get(watch) for row in rows)
+
+    for kind, items in (("updated", updates), ("deleted", deletes)):
+        if not items:
+            continue
+        ids = {op.id for _, op in items}
+        if watch:
+            existing = dict(db.execute(select(pk, columns[watch]).where(pk.in_(ids))).all())
+        else:
+            existing = dict.fromkeys(db.execute(select(pk).where(pk.in_(ids))).scalars())
+        found = []
+        for i, op in items:
+            if op.id in existing:
+                found.append((i, op))
+                results[i] = {"status": kind, "id": op.id}
+                if watch:
+                    touched.add(existing[op.id])
+                    if kind == "updated" and watch in op.data:
+                        touched.add(_values(columns, op.data)[watch])
+            else:
+                results[i] = {"status": "not_found", "id": op.id}
+        if not found:
+            continue
+
+        if kind == "updated":
+            rows = [{**_values(columns, op.data), pk.key: op.id} for _, op in found]
+            db.execute(update(model), rows)
+        else:
+            db.execute(
+                delete(model).where(pk.in_({op.id for _, op in found})),
+                execution_options={"synchronize_session": False},
+            )
+    return results
+
+
+def run_ops(db, model, ops: List[schemas.AdminBatchOp], chunk_size: int,
+            watch: Optional[str] = None, touched: Optional[Set[Any]] = None) -> List[dict]:
+    pks = admin_query.primary_key(model)
+    pk = pks[0]
+    columns = admin_query.resource_columns(model)
+    for i, op in enumerate(ops):
+        if op.op != "create" and (op.id is None or len(pks) > 1):
+            raise HTTPException(status_code=400, detail=f"Op {i}: update/delete need an id on a single-key resource")
+        if op.op == "update" and not _values(columns, op.data):
+            raise HTTPException(status_code=400, detail=f"Op {i}: no valid fields to update")
+
+    results: List[Optional[dict]] = [None] * len(ops)
+    indexed = list(enumerate(ops))
+    for start in range(0, len(indexed), chunk_size):
+        chunk = indexed[start:start + chunk_size]
+        try:
+            chunk_touched = set()
+            chunk_results = _apply(db, model, pk, columns, chunk, watch, chunk_touched)
+            db.commit()
+        except (SQLAlchemyError, ValueError):
+            db.rollback()
+            chunk_results, chunk_touched = {}, set()
+            for item in chunk:
+                item_touched = set()
+                try:
+                    with db.begin_nested():
+                        chunk_results.update(_apply(db, model, pk, columns, [item], watch, item_touched))
+                    chunk_touched |= item_touched
+                except (SQLAlchemyError, ValueError) as e:
+                    detail = str(getattr(e, "orig", None) or e)
+                    chunk_results[item[0]] = {"status": "error", "id": item[1].id, "detail": detail}
+            db.commit()
+        if touched is not None:
+            touched |= chunk_touched
+
+        for i, result in chunk_results.items():
+            results[i] = {"index": i, "op": ops[i].op, **result}
+    return results
+
+
+def run_filter(db, model, criteria: List[Any], action: str, data: Dict[str, Any], chunk_size: int,
+               watch: Optional[str] = None, touched: Optional[Set[Any]] = None) -> Tuple[int, int]:
+    # Walks the matching rows in primary key order, one chunk per transaction.
+    # The keyset keeps the walk moving even when an update leaves rows matching.
+    pks = admin_query.primary_key(model)
+    key = tuple_(*pks) if len(pks) > 1 else pks[0]
+    columns = admin_query.resource_columns(model)
+    values = _values(columns, data)
+    if action == "update" and not values:
+        raise HTTPException(status_code=400, detail="No valid fields to update")
+
+    affected = chunks = 0
+    last = None
+    while True:
+        stmt = select(*pks, *([columns[watch]] if watch else [])).where(*criteria).order_by(*pks).limit(chunk_size)
+        if last is not None:
+            stmt = stmt.where(pagination.keyset_after(pks, last, descending=False))
+        rows = db.execute(stmt).all()
+        keys = [tuple(row[:len(pks)]) if len(pks) > 1 else row[0] for row in rows]
+        if not keys:
+            break
+        if watch:
+            touched.update(row[-1] for row in rows)
+            if action == "update" and watch in values:
+                touched.add(values[watch])
+
+        if action == "delete":
+            stmt = delete(model).where(key.in_(keys))
+        else:
+            stmt = update(model).where(key.in_(keys)).values(**values)
+        db.execute(stmt, execution_options={"synchronize_session": False})
+        db.commit()
+
+        affected += len(keys)
+        chunks += 1
+        last = list(keys[-1]) if len(pks) > 1 else [keys[-1]]
+        if len(keys) < chunk_size:
+            break
+    return affected, chunks
+
+
+def record(db, admin_id: str, resource: str, counts: Dict[str, int]) -> str:
+    # One audit row per batch, e.g. "batch delete=5000" or "batch create=2,update=3"
+    summary = ",".join(f"{kind}={n}" for kind, n in sorted(counts.items()))
+    action = models.AdminAction(admin_id=admin_id, action=f"batch {summary}", target_table=resource)
+    db.add(action)
+    db.commit()
+    return action.id
+
+
+def run_batch(db, model, resource: str, request: schemas.AdminBatchRequest, admin_id: str,
+              watch: Optional[str] = None, touched: Optional[Set[Any]] = None) -> dict:
+    if bool(request.ops) == bool(request.filter):
+        raise HTTPException(status_code=400, detail="Send either ops or a filter with an action")
+    if len(request.ops) > MAX_BATCH_OPS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPS} ops per batch")
+
+    if request.filter:
+        if request.action is None:
+            raise HTTPException(status_code=400, detail="A filter batch needs an action")
+        criteria = admin_query.parse_filters(model, request.filter)
+        try:
+            affected, chunks = run_filter(
+                db, model, criteria, request.action, request.data, request.chunk_size, watch, touched
+            )
+        except (SQLAlchemyError, ValueError) as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(getattr(e, "orig", None) or e))
+        action_id = record(db, admin_id, resource, {request.action: affected})
+        return {"action": request.action, "affected": affected, "chunks": chunks, "action_id": action_id}
+
+    results = run_ops(db, model, request.ops, request.chunk_size, watch, touched)
+    summary = Counter(r["status"] for r in results)
+    applied = Counter(r["op"] for r in results if r["status"] not in ("error", "not_found"))
+    action_id = record(db, admin_id, resource, applied)
+    return {"results": results, "summary": dict(summary), "action_id": action_id}
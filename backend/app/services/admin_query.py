@@ -0,0 +1,150 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select
+from sqlalchemy.inspection import inspect
+
+from .. import pagination
+
+# Query building for the generic admin resource API.
+# Lists select only the requested columns and page with a keyset on
+# (sort column, primary key), so deep pages cost the same as the first one and
+# rows never shift between pages. Rows are serialized straight from tuples.
+
+
+def resource_columns(model) -> Dict[str, Any]:
+    return {col.key: col for col in inspect(model).columns}
+
+
+def primary_key(model) -> List[Any]:
+    return list(inspect(model).primary_key)
+
+
+def select_columns(model, fields: Optional[str]) -> List[Any]:
+    columns = resource_columns(model)
+    if not fields:
+        return list(columns.values())
+
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # The primary key is always returned so rows stay addressable (and pageable)
+    selected = [columns[n] for n in names]
+    for pk in primary_key(model):
+        if pk not in selected:
+            selected.insert(0, pk)
+    return selected
+
+
+FILTER_OPS = {
+    "eq": lambda c, v: c == v,
+    "ne": lambda c, v: c != v,
+    "lt": lambda c, v: c < v,
+    "lte": lambda c, v: c <= v,
+    "gt": lambda c, v: c > v,
+    "gte": lambda c, v: c >= v,
+    "like": lambda c, v: c.ilike(v),
+    "in": lambda c, v: c.in_(v),
+    "isnull": lambda c, v: c.is_(None) if v else c.isnot(None),
+}
+
+
+def coerce_value(column, raw: str):
+    # Query strings (and JSON strings) are text; bind values with the column's Python type
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return raw
+    if python_type is bool:
+        return raw.lower() in ("1", "true", "yes")
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(raw)
+    if python_type in (int, float, Decimal):
+        return python_type(raw)
+    return raw
+
+
+def parse_filters(model, filters: Optional[List[str]]) -> List[Any]:
+    # Each filter is "column:op:value", e.g. "is_read:eq:true",
+    # "created_at:lt:2026-01-01", "content_type:in:question,article".
+    if not filters:
+        return []
+
+    columns = resource_columns(model)
+    criteria = []
+    for raw in filters:
+        parts = raw.split(":", 2)
+        if len(parts) == 2 and parts[1] == "isnull":
+            parts.append("true")
+        if len(parts) != 3 or parts[0] not in columns or parts[1] not in FILTER_OPS:
+            raise HTTPException(status_code=400, detail=f"Invalid filter: {raw}")
+
+        name, op, value = parts
+        column = columns[name]
+        try:
+            if op == "in":
+                value = [coerce_value(column, v) for v in value.split(",")]
+            elif op == "isnull":
+                value = value.lower() in ("1", "true", "yes")
+            elif op != "like":
+                value = coerce_value(column, value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value in filter: {raw}")
+        criteria.append(FILTER_OPS[op](column, value))
+    return criteria
+
+
+def sort_column(model, sort_by: Optional[str]):
+    columns = resource_columns(model)
+    if sort_by:
+        if sort_by not in columns:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by {sort_by}")
+        return columns[sort_by]
+    if "created_at" in columns:
+        return columns["created_at"]
+    # Stable default for tables without created_at
+    return primary_key(model)[0]
+
+
+def _keyset_filter(sort_col, pks: Sequence[Any], values: List[Any], descending: bool, dialect: str):
+    sort_value, pk_values = values[0], values[1:]
+    if len(pk_values) != len(pks):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # NULL sort values are ordered last; inside that block rows go by primary key
+    if sort_value is None:
+        return and_(sort_col.is_(None), pagination.keyset_after(pks, pk_values, descending, dialect))
+    return or_(
+        pagination.keyset_after([sort_col, *pks], values, descending, dialect),
+        sort_col.is_(None),
+    )
+
+
+def list_statement(model, columns: List[Any], sort_col, descending: bool,
+                   cursor: Optional[str] = None, dialect: Optional[str] = None,
+                   criteria: Optional[List[Any]] = None):
+    pks = primary_key(model)
+    sort_key = [sort_col] + [pk for pk in pks if pk is not sort_col]
+
+    stmt = select(*columns)
+    if criteria:
+        stmt = stmt.where(*criteria)
+    if cursor:
+        stmt = stmt.where(_keyset_filter(sort_col, sort_key[1:], pagination.decode_cursor(cursor), descending, dialect))
+
+    ordering = [(c.desc() if descending else c.asc()) for c in sort_key]
+    ordering[0] = ordering[0].nulls_last()
+    return stmt.order_by(*ordering), sort_key
+
+
+def rows_to_dicts(columns: List[Any], rows) -> List[Dict[str, Any]]:
+    names = [c.key for c in columns]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def cursor_for(sort_key: List[Any], item: Dict[str, Any]) -> List[Any]:
+    return [item[c.key] for c in sort_key]
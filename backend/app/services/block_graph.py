@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import FrozenSet, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import TTLCache
+
+# Who blocks whom, cached per user so the message send path can enforce
+# blocks without a query. A user's entry holds the ids they block and the ids
+# blocking them, loaded on first use in one query. block_user updates the
+# entries of both users in this worker; other workers see the change within
+# BLOCK_GRAPH_TTL seconds.
+
+BLOCK_GRAPH_TTL = int(os.getenv("BLOCK_GRAPH_TTL", "300"))
+
+# user_id -> (blocking, blocked_by)
+_graph = TTLCache("block_graph", ttl=BLOCK_GRAPH_TTL, maxsize=50_000)
+
+# Bumped on every change so a load that raced with a block is not cached
+_generation = 0
+_lock = threading.Lock()
+
+
+def _load(db: Session, user_id: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    blocked = models.BlockedUser
+    generation = _generation
+    rows = db.execute(
+        select(blocked.blocker_id, blocked.blocked_id)
+        .where(or_(blocked.blocker_id == user_id, blocked.blocked_id == user_id))
+    ).all()
+    entry = (
+        frozenset(b for a, b in rows if a == user_id),
+        frozenset(a for a, b in rows if b == user_id),
+    )
+    with _lock:
+        if generation == _generation:
+            _graph.set(user_id, entry)
+    return entry
+
+
+def _entry(db: Session, user_id: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    entry = _graph.get(user_id)
+    return entry if entry is not None else _load(db, user_id)
+
+
+def blocked_with(db: Session, user_id: str) -> FrozenSet[str]:
+    # Users that user_id blocks or is blocked by
+    blocking, blocked_by = _entry(db, user_id)
+    return blocking | blocked_by
+
+
+def is_blocked(db: Session, user_id: str, other_id: str) -> bool:
+    # Either direction; one entry holds both, so only user_id's is needed
+    blocking, blocked_by = _entry(db, user_id)
+    return other_id in blocking or other_id in blocked_by
+
+
+def record_block(blocker_id: str, blocked_id: str) -> None:
+    # Call after the block is committed
+    global _generation
+    with _lock:
+        _generation += 1
+        blocker = _graph.get(blocker_id)
+        if blocker is not None:
+            _graph.set(blocker_id, (blocker[0] | {blocked_id}, blocker[1]))
+        blocked = _graph.get(blocked_id)
+        if blocked is not None:
+            _graph.set(blocked_id, (blocked[0], blocked[1] | {blocker_id}))
+
+
+def invalidate(*user_ids: str) -> None:
+    # For changes made outside block_user (admin edits, unblocks)
+    global _generation
+    with _lock:
+        _generation += 1
+        if not user_ids:
+            _graph.invalidate()
+        for user_id in user_ids:
+            _graph.invalidate(user_id)
@@ -0,0 +1,244 @@
+import json
+import os
+import time
+import zlib
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from .. import models
+from ..cache import TTLCache
+from ..serialization import MESSAGE_COLUMNS
+from . import retention
+
+# Tiering of chat history.
+# Messages of chats idle for ARCHIVE_AFTER_DAYS are moved out of the hot
+# `messages` table into archived_chat_segments: compressed JSONL blobs of up
+# to ARCHIVE_SEGMENT_SIZE messages each (zstd when the optional `zstandard`
+# package is installed, zlib otherwise). Each segment is written and its
+# messages deleted in one transaction. Chat.archived_messages counts what was
+# moved, so get_messages can page across both tiers: archived messages are
+# always older than the ones still in `messages`. The newest message of a chat
+# always stays hot, so the inbox can show it without touching the archive, and
+# so do messages some participant has not read yet: unread counts are taken
+# from the hot table alone.
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_SEGMENT_SIZE = int(os.getenv("ARCHIVE_SEGMENT_SIZE", "2000"))
+
+# Same fields as the serialization.MESSAGE_COLUMNS rows
+ArchivedMessage = namedtuple("ArchivedMessage", "id chat_id sender_id content is_read created_at")
+
+# Decompressed segments, so paging through an archived chat decodes each blob once
+_segments = TTLCache("chat_archive_segments", ttl=300, maxsize=64)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def default_codec() -> str:
+    return "zstd" if _zstd() else "zlib"
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("Archived chat segment is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+@dataclass
+class ArchiveReport:
+    chats: int = 0
+    segments: int = 0
+    messages: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    hot_bytes_freed: int = 0  # estimated from the average messages row
+    elapsed: float = 0.0
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+
+
+def _encode(rows) -> bytes:
+    return b"".join(
+        json.dumps({**r._asdict(), "created_at": r.created_at.isoformat() if r.created_at else None}).encode() + b"\n"
+        for r in rows
+    )
+
+
+def _decode(data: bytes) -> List[ArchivedMessage]:
+    messages = []
+    for line in data.splitlines():
+        record = json.loads(line)
+        if record["created_at"]:
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+        messages.append(ArchivedMessage(**record))
+    return messages
+
+
+def _read_by_everyone():
+    # Criterion on models.Message: no participant of its chat has it unread
+    participant = models.ChatParticipant
+    message = models.Message
+    return ~select(participant.id).where(
+        participant.chat_id == message.chat_id,
+        or_(participant.last_read_at.is_(None), participant.last_read_at < message.created_at),
+    ).exists()
+
+
+def archive_chat(db: Session, chat_id: str, report: ArchiveReport, segment_size: int = ARCHIVE_SEGMENT_SIZE,
+                 codec: Optional[str] = None) -> int:
+    # Moves the chat's read messages older than its newest one, oldest first
+    codec = codec or default_codec()
+    segment_model = models.ArchivedChatSegment
+    message = models.Message
+    newest = db.execute(
+        select(message.id, message.created_at).where(message.chat_id == chat_id)
+        .order_by(message.created_at.desc(), message.id.desc()).limit(1)
+    ).first()
+    if newest is None:
+        return 0
+    next_seq = db.execute(
+        select(func.coalesce(func.max(segment_model.seq), -1) + 1).where(segment_model.chat_id == chat_id)
+    ).scalar()
+
+    moved = 0
+    while True:
+        # Bounded by newest, not just "not newest": messages sent while the
+        # chat is being archived stay hot
+        rows = db.execute(
+            select(*MESSAGE_COLUMNS).where(
+                message.chat_id == chat_id,
+                message.created_at < newest.created_at,
+                message.id != newest.id,
+                _read_by_everyone(),
+            )
+            .order_by(message.created_at, message.id).limit(segment_size)
+        ).all()
+        if not rows:
+            break
+        raw = _encode(rows)
+        data = compress(raw, codec)
+        db.add(segment_model(
+            chat_id=chat_id, seq=next_seq, message_count=len(rows),
+            first_message_at=rows[0].created_at, last_message_at=rows[-1].created_at,
+            codec=codec, raw_bytes=len(raw), data=data,
+        ))
+        db.execute(delete(message).where(message.id.in_([r.id for r in rows])))
+        db.execute(
+            update(models.Chat).where(models.Chat.id == chat_id)
+            .values(archived_messages=func.coalesce(models.Chat.archived_messages, 0) + len(rows)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+        next_seq += 1
+        moved += len(rows)
+        report.segments += 1
+        report.messages += len(rows)
+        report.raw_bytes += len(raw)
+        report.stored_bytes += len(data)
+        if len(rows) < segment_size:
+            break
+    return moved
+
+
+def inactive_chats(db: Session, cutoff: datetime, limit: int):
+    # Idle chats with something archive_chat would move: a message every
+    # participant has read, with a newer message after it
+    chat = models.Chat
+    message = models.Message
+    later = aliased(message)
+    archivable = select(message.id).where(
+        message.chat_id == chat.id,
+        _read_by_everyone(),
+        select(later.id).where(later.chat_id == message.chat_id, later.created_at > message.created_at).exists(),
+    ).exists()
+    return db.execute(
+        select(chat.id).where(func.coalesce(chat.updated_at, chat.created_at) < cutoff, archivable).limit(limit)
+    ).scalars().all()
+
+
+def archive_inactive(db: Session, days: int = ARCHIVE_AFTER_DAYS, segment_size: int = ARCHIVE_SEGMENT_SIZE,
+                     batch_size: int = 100, progress: Optional[Callable[[ArchiveReport], None]] = None) -> ArchiveReport:
+    started = time.monotonic()
+    report = ArchiveReport()
+    row_bytes = retention.estimate_row_bytes(db, models.Message)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    while True:
+        chat_ids = inactive_chats(db, cutoff, batch_size)
+        if not chat_ids:
+            break
+        for chat_id in chat_ids:
+            archive_chat(db, chat_id, report, segment_size)
+            report.chats += 1
+        if progress:
+            progress(report)
+    report.hot_bytes_freed = report.messages * row_bytes
+    report.elapsed = time.monotonic() - started
+    return report
+
+
+def _segment_messages(db: Session, segment_id: str) -> List[ArchivedMessage]:
+    messages = _segments.get(segment_id)
+    if messages is None:
+        segment = db.execute(
+            select(models.ArchivedChatSegment.data, models.ArchivedChatSegment.codec)
+            .where(models.ArchivedChatSegment.id == segment_id)
+        ).one()
+        messages = _decode(decompress(segment.data, segment.codec))
+        _segments.set(segment_id, messages)
+    return messages
+
+
+def read_archived(db: Session, chat_id: str, skip: int, limit: int) -> List[ArchivedMessage]:
+    # Archived messages [skip, skip + limit), oldest first. Only the segments
+    # overlapping the range are fetched and decompressed.
+    segment_model = models.ArchivedChatSegment
+    segments = db.execute(
+        select(segment_model.id, segment_model.message_count)
+        .where(segment_model.chat_id == chat_id).order_by(segment_model.seq)
+    ).all()
+    result = []
+    start = 0
+    for segment in segments:
+        end = start + segment.message_count
+        if end > skip and len(result) < limit:
+            messages = _segment_messages(db, segment.id)
+            result.extend(messages[max(0, skip - start):skip + limit - start])
+        start = end
+    return result[:limit]
+
+
+def find_archived(db: Session, chat_id: str, message_id: str) -> Optional[ArchivedMessage]:
+    # An archived message by id, newest segments first. Only for the rare
+    # lookups by id (read marks); paging goes through read_archived.
+    segment_ids = db.execute(
+        select(models.ArchivedChatSegment.id)
+        .where(models.ArchivedChatSegment.chat_id == chat_id).order_by(models.ArchivedChatSegment.seq.desc())
+    ).scalars().all()
+    for segment_id in segment_ids:
+        for archived in _segment_messages(db, segment_id):
+            if archived.id == message_id:
+                return archived
+    return None
@@ -0,0 +1,74 @@
+import logging
+from typing import Callable, Dict, Iterable, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import dialect_insert
+
+# Denormalized counters are moved by the write paths that own them (crud's
+# toggles and notification helpers). Writers that bypass those paths, the
+# generic admin endpoints, admin batches and deletion purges, note the keys
+# their rows belong to and resync those keys here: the counter is recomputed
+# from its source rows in one UPDATE, so it is right whatever the write was.
+# Callers commit.
+
+logger = logging.getLogger(__name__)
+
+
+def resync_article_likes(db: Session, article_ids: Iterable[str]) -> None:
+    article_ids = list(article_ids)
+    if not article_ids:
+        return
+    like = models.ArticleLike
+    likes = (
+        select(func.count()).select_from(like)
+        .where(like.article_id == models.Article.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Article).where(models.Article.id.in_(article_ids)).values(like_count=likes),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def resync_notification_counters(db: Session, user_ids: Iterable[str]) -> None:
+    # Upsert so users without a counter row get one; version moves the ETag
+    notification, counter = models.Notification, models.NotificationCounter
+    users = db.execute(select(models.User.id).where(models.User.id.in_(list(user_ids)))).scalars().all()
+    if not users:
+        return
+    unread = dict(db.execute(
+        select(notification.user_id, func.count())
+        .where(notification.user_id.in_(users), notification.is_read == False)
+        .group_by(notification.user_id)
+    ).all())
+    stmt = dialect_insert(db, counter).values([
+        {"user_id": user_id, "unread_count": unread.get(user_id, 0), "version": 1} for user_id in users
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[counter.user_id],
+        set_={"unread_count": stmt.excluded.unread_count, "version": counter.version + 1, "updated_at": func.now()},
+    ))
+
+
+# source table -> (column holding the counter's key, resync function)
+SOURCES: Dict[str, Tuple[str, Callable[[Session, Iterable], None]]] = {
+    models.ArticleLike.__tablename__: ("article_id", resync_article_likes),
+    models.Notification.__tablename__: ("user_id", resync_notification_counters),
+}
+
+
+def key_column(table_name: str):
+    # Name of the column whose values a write to table_name has to resync, or None
+    source = SOURCES.get(table_name)
+    return source[0] if source else None
+
+
+def resync(db: Session, table_name: str, keys: Iterable) -> None:
+    keys = {key for key in keys if key is not None}
+    source = SOURCES.get(table_name)
+    if source and keys:
+        logger.info("Resyncing counters", extra={"table": table_name, "keys": len(keys)})
+        source[1](db, keys)
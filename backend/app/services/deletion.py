@@ -0,0 +1,210 @@
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import Table, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import Base, SessionLocal
+from . import counters, membership
+
+# Cascading deletes driven by the schema instead of hand-written cleanup.
+# Dependents are discovered from the foreign keys in the metadata plus the
+# polymorphic (content_type, content_id) references that have no FK. Rows are
+# removed leaves first with set-based DELETE ... WHERE pk IN (subquery) in
+# chunks, committing after each chunk: an interrupted cascade leaves fewer
+# children behind, never orphans. Cascades over DELETION_BACKGROUND_THRESHOLD
+# dependent rows run after the response has been sent. Purges that remove
+# chats or chat participants invalidate the membership cache entries they
+# touched, whatever the starting table (chats, users, ...), and purges that
+# remove rows feeding a denormalized counter (article likes, notifications)
+# resync the counters those rows belonged to.
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("DELETION_CHUNK_SIZE", "1000"))
+BACKGROUND_THRESHOLD = int(os.getenv("DELETION_BACKGROUND_THRESHOLD", "5000"))
+
+# Tables referenced by content_type/content_id pairs, and the content_type
+# value each referenced table is stored under
+POLYMORPHIC_REFS = [
+    (models.UserSavedContent.__table__, "content_type", "content_id"),
+    (models.ContentModeration.__table__, "content_type", "content_id"),
+    (models.FeaturedContent.__table__, "content_type", "content_id"),
+]
+CONTENT_TYPES = {
+    "questions": "question",
+    "answers": "answer",
+    "articles": "article",
+}
+
+
+def _pk(table: Table):
+    return list(table.primary_key.columns)[0]
+
+
+def dependents(table: Table) -> List[Tuple[Table, object]]:
+    # (child table, FK column) for every foreign key pointing at this table
+    found = []
+    for child in Base.metadata.sorted_tables:
+        for fk in child.foreign_keys:
+            if fk.column.table is table and child is not table:
+                found.append((child, fk.parent))
+    return found
+
+
+def supports_soft_delete(model) -> bool:
+    columns = model.__table__.columns
+    return "deleted_at" in columns or "is_active" in columns
+
+
+def soft_delete(db: Session, model, ids: Sequence[str]) -> int:
+    # Marks rows as deleted and keeps their dependents; caller commits
+    columns = model.__table__.columns
+    values = {}
+    if "deleted_at" in columns:
+        values["deleted_at"] = datetime.now(timezone.utc)
+    if "is_active" in columns:
+        values["is_active"] = False
+    if not values:
+        raise ValueError(f"{model.__tablename__} has no deleted_at/is_active column")
+    return db.execute(
+        update(model).where(_pk(model.__table__).in_(ids)).values(**values),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+
+def dependent_count(db: Session, model, ids: Sequence[str]) -> int:
+    # Direct dependents only: enough to decide whether a cascade is "big"
+    table = model.__table__
+    total = 0
+    for child, fk in dependents(table):
+        total += db.execute(select(func.count()).select_from(child).where(fk.in_(ids))).scalar() or 0
+    return total
+
+
+def _delete_chunked(db: Session, table: Table, criterion, chunk_size: int) -> int:
+    # Leaf tables: DELETE ... WHERE pk IN (SELECT pk ... LIMIT n) until none left
+    pk = _pk(table)
+    deleted = 0
+    while True:
+        chunk = select(pk).where(criterion).limit(chunk_size).scalar_subquery()
+        rowcount = db.execute(delete(table).where(pk.in_(chunk))).rowcount
+        db.commit()
+        deleted += rowcount
+        if rowcount < chunk_size:
+            return deleted
+
+
+def _note_membership(db: Session, table: Table, criterion, touched: Dict[str, set]) -> None:
+    # Chats and users whose cached membership the coming delete changes
+    if table is models.Chat.__table__:
+        touched["chat_ids"].update(db.execute(select(table.c.id).where(criterion)).scalars())
+    elif table is models.ChatParticipant.__table__:
+        for chat_id, user_id in db.execute(select(table.c.chat_id, table.c.user_id).where(criterion)):
+            touched["chat_ids"].add(chat_id)
+            touched["user_ids"].add(user_id)
+
+
+def _note_counters(db: Session, table: Table, criterion, touched: Dict[str, set]) -> None:
+    # Counter keys (e.g. article ids) of the rows the coming delete removes
+    column = counters.key_column(table.name)
+    if column:
+        touched["counters"][table.name].update(db.execute(select(table.c[column]).where(criterion)).scalars())
+
+
+def _note(db: Session, table: Table, criterion, touched: Dict[str, set]) -> None:
+    _note_membership(db, table, criterion, touched)
+    _note_counters(db, table, criterion, touched)
+
+
+def _purge(db: Session, table: Table, ids: Sequence[str], chunk_size: int, touched: Dict[str, set]) -> Counter:
+    counts = Counter()
+    for child, fk in dependents(table):
+        _note(db, child, fk.in_(ids), touched)
+        if len(child.primary_key.columns) > 1:
+            # Association tables (composite keys) go in one statement
+            counts[child.name] += _delete_by(db, child, fk.in_(ids))
+            continue
+        if not _has_dependents(child):
+            counts[child.name] += _delete_chunked(db, child, fk.in_(ids), chunk_size)
+            continue
+        # Children with their own dependents: walk them chunk by chunk
+        child_pk = _pk(child)
+        while True:
+            child_ids = db.execute(select(child_pk).where(fk.in_(ids)).limit(chunk_size)).scalars().all()
+            if not child_ids:
+                break
+            counts += _purge(db, child, child_ids, chunk_size, touched)
+
+    content_type = CONTENT_TYPES.get(table.name)
+    if content_type:
+        for ref, type_column, id_column in POLYMORPHIC_REFS:
+            criterion = (ref.c[type_column] == content_type) & ref.c[id_column].in_(ids)
+            counts[ref.name] += _delete_chunked(db, ref, criterion, chunk_size)
+
+    _note(db, table, _pk(table).in_(ids), touched)
+    counts[table.name] += _delete_by(db, table, _pk(table).in_(ids))
+    return counts
+
+
+def _has_dependents(table: Table) -> bool:
+    return bool(dependents(table)) or table.name in CONTENT_TYPES
+
+
+def _delete_by(db: Session, table: Table, criterion) -> int:
+    rowcount = db.execute(delete(table).where(criterion)).rowcount
+    db.commit()
+    return rowcount
+
+
+def purge(db: Session, model, ids: Sequence[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, int]:
+    # Hard delete of the rows and everything that depends on them.
+    # Returns deleted row counts per table.
+    table = model.__table__
+    counts = Counter()
+    touched = {"chat_ids": set(), "user_ids": set(), "counters": defaultdict(set)}
+    ids = list(ids)
+    try:
+        for start in range(0, len(ids), chunk_size):
+            counts += _purge(db, table, ids[start:start + chunk_size], chunk_size, touched)
+    finally:
+        # Chunks commit as they go, so even an interrupted purge changed these
+        if touched["chat_ids"] or touched["user_ids"]:
+            membership.invalidate(chat_ids=touched["chat_ids"], user_ids=touched["user_ids"])
+        if touched["counters"]:
+            db.rollback()
+            for table_name, keys in touched["counters"].items():
+                counters.resync(db, table_name, keys)
+            db.commit()
+    return {name: n for name, n in counts.items() if n}
+
+
+def purge_in_background(model, ids: Sequence[str], chunk_size: int = DEFAULT_CHUNK_SIZE):
+    # BackgroundTasks entry point: the request session is gone by now
+    db = SessionLocal()
+    try:
+        purge(db, model, ids, chunk_size)
+    finally:
+        db.close()
+
+
+def delete_content(db: Session, model, ids: Sequence[str], background_tasks=None, soft: bool = False) -> dict:
+    # Entry point for the delete endpoints.
+    # soft=True only flags the rows. Large hard cascades are handed to
+    # background_tasks; soft-deletable rows are hidden right away meanwhile.
+    if soft:
+        if not supports_soft_delete(model):
+            raise ValueError(f"{model.__tablename__} does not support soft delete")
+        rows = soft_delete(db, model, ids)
+        db.commit()
+        return {"status": "soft_deleted", "rows": rows}
+
+    if background_tasks is not None and dependent_count(db, model, ids) > BACKGROUND_THRESHOLD:
+        if supports_soft_delete(model):
+            soft_delete(db, model, ids)
+            db.commit()
+        background_tasks.add_task(purge_in_background, model, list(ids))
+        return {"status": "scheduled"}
+
+    return {"status": "deleted", "rows": purge(db, model, ids)}
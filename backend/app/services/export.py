@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterator, List
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric
+
+from ..database import SessionLocal
+
+# Streaming exports for the generic admin API.
+# Rows are read through a server-side cursor (yield_per) in partitions and
+# each partition is encoded and yielded before the next one is fetched, so
+# memory stays constant regardless of table size.
+
+EXPORT_BATCH_SIZE = 2000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _partitions(stmt) -> Iterator[List[tuple]]:
+    # Own session: the request-scoped one is closed while the body streams
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def stream_csv(stmt, columns) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c.key for c in columns])
+    for partition in _partitions(stmt):
+        writer.writerows(
+            [v.isoformat() if isinstance(v, (datetime, date)) else v for v in row]
+            for row in partition
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when the table is empty
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_jsonl(stmt, columns) -> Iterator[str]:
+    names = [c.key for c in columns]
+    for partition in _partitions(stmt):
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=_json_default) + "\n"
+            for row in partition
+        )
+
+
+class _ChunkSink:
+    # Write-only file object for ParquetWriter that can be drained between
+    # row groups. tell() keeps counting so footer offsets stay correct.
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(stmt, columns) -> Iterator[bytes]:
+    # Optional dependency: pyarrow (checked by the endpoint before streaming)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c.key, _arrow_type(pa, c)) for c in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for partition in _partitions(stmt):
+            # One row group per partition
+            arrays = [
+                pa.array(
+                    [float(v) if isinstance(v, Decimal) else v for v in values],
+                    type=field.type,
+                )
+                for values, field in zip(zip(*partition), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "jsonl": stream_jsonl,
+    "parquet": stream_parquet,
+}
@@ -0,0 +1,160 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import desc, event, func
+from sqlalchemy.orm import Session, joinedload
+
+from .. import models, schemas
+from ..cache import TTLCache
+from ..database import dialect_insert
+
+# Daily sentence ("best answer of the day") is computed once per day and
+# stored in featured_content. Helpful marks refresh it incrementally, and the
+# public endpoint reads the stored pick through a short-lived cache.
+
+DAILY_SENTENCE = "daily_sentence"
+
+# Other workers pick up incremental refreshes within this many seconds
+_daily_cache = TTLCache("daily_sentence", ttl=60, maxsize=4)
+# Cached for a day with nothing to feature, so requests don't recompute
+_NO_PICK = object()
+# Session.info key for days whose cached pick is dropped once the session commits
+_STALE_DAYS = "featured_stale_days"
+
+
+def _day_bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def _top_helpful(db: Session, start: datetime, end: datetime):
+    return db.query(
+        models.AnswerHelpful.answer_id,
+        func.count(models.AnswerHelpful.answer_id).label('count')
+    ).filter(
+        models.AnswerHelpful.created_at >= start,
+        models.AnswerHelpful.created_at < end
+    ).group_by(
+        models.AnswerHelpful.answer_id
+    ).order_by(desc('count')).first()
+
+
+def pick_daily_sentence(db: Session, day: date) -> Tuple[Optional[str], int]:
+    # Returns (answer_id, score). score is the number of helpful marks the
+    # answer got on `day`; fallback picks score 0 so any marked answer beats them.
+    # Priority 1: Answer with most helpful marks on the day.
+    # Priority 2: Answer with most helpful marks the day before.
+    # Priority 3: Highest rated answer from the last 7 days.
+    # Priority 4: Latest answer (Safety net).
+    today_start, today_end = _day_bounds(day)
+    todays_top = _top_helpful(db, today_start, today_end)
+    if todays_top:
+        return todays_top.answer_id, todays_top.count
+
+    yesterdays_top = _top_helpful(db, today_start - timedelta(days=1), today_start)
+    if yesterdays_top:
+        return yesterdays_top.answer_id, 0
+
+    weekly_best = db.query(models.Answer.id).filter(
+        models.Answer.created_at >= today_end - timedelta(days=7),
+        models.Answer.helpful_count > 0
+    ).order_by(desc(models.Answer.helpful_count)).first()
+    if weekly_best:
+        return weekly_best.id, 0
+
+    latest = db.query(models.Answer.id).order_by(desc(models.Answer.created_at)).first()
+    return (latest.id if latest else None), 0
+
+
+def _store(db: Session, day: date, answer_id: str, score: int, only_if_better: bool):
+    featured = models.FeaturedContent
+    stmt = dialect_insert(db, featured).values(
+        id=models.generate_uuid(),
+        kind=DAILY_SENTENCE,
+        period=day,
+        content_type='answer',
+        content_id=answer_id,
+        score=score,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[featured.kind, featured.period],
+        set_={"content_id": answer_id, "score": score, "computed_at": func.now()},
+        # Incremental refreshes only ever replace a weaker pick
+        where=(featured.score < score) if only_if_better else None,
+    )
+    db.execute(stmt)
+
+
+def compute_daily_sentence(db: Session, day: Optional[date] = None) -> Optional[str]:
+    # Scheduled job entry point: full recompute for the day (UTC).
+    day = day or datetime.utcnow().date()
+    answer_id, score = pick_daily_sentence(db, day)
+    if answer_id:
+        _store(db, day, answer_id, score, only_if_better=False)
+        db.commit()
+    _daily_cache.invalidate(day)
+    return answer_id
+
+
+def record_helpful_mark(db: Session, answer_id: str):
+    # Called in the same transaction as a new helpful mark: promote the answer
+    # if it now has more marks today than the stored pick. Caller commits.
+    day = datetime.utcnow().date()
+    start, end = _day_bounds(day)
+    marks_today = db.query(func.count(models.AnswerHelpful.id)).filter(
+        models.AnswerHelpful.answer_id == answer_id,
+        models.AnswerHelpful.created_at >= start,
+        models.AnswerHelpful.created_at < end
+    ).scalar() or 0
+    if marks_today:
+        _store(db, day, answer_id, marks_today, only_if_better=True)
+        # Dropped after the commit, so a read in between can't cache the old pick again
+        db.info.setdefault(_STALE_DAYS, set()).add(day)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        # A savepoint: wait for the outer transaction
+        return
+    for day in session.info.pop(_STALE_DAYS, ()):
+        _daily_cache.invalidate(day)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction) -> None:
+    # Rolled back: the stored pick did not change
+    if transaction.parent is None:
+        session.info.pop(_STALE_DAYS, None)
+
+
+def get_daily_sentence(db: Session) -> Optional[dict]:
+    day = datetime.utcnow().date()
+    cached = _daily_cache.get(day)
+    if cached is _NO_PICK:
+        return None
+    if cached is not None:
+        return cached
+
+    def read():
+        return db.query(models.Answer).options(
+            joinedload(models.Answer.user)
+        ).join(
+            models.FeaturedContent, models.FeaturedContent.content_id == models.Answer.id
+        ).filter(
+            models.FeaturedContent.kind == DAILY_SENTENCE,
+            models.FeaturedContent.period == day
+        ).first()
+
+    answer = read()
+    if not answer:
+        # First hit of the day before the job ran (or the pick was deleted)
+        if compute_daily_sentence(db, day):
+            answer = read()
+        if not answer:
+            _daily_cache.set(day, _NO_PICK)
+            return None
+
+    payload = schemas.AnswerOut.model_validate(answer).model_dump()
+    _daily_cache.set(day, payload)
+    return payload
@@ -0,0 +1,399 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time as time_module
+import traceback
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, dialect_insert
+
+# In-process background jobs.
+# Jobs are rows in the `jobs` table, so queued work survives restarts and is
+# shared by every worker process. Each process started through the app
+# lifespan runs JOB_WORKERS threads that claim due jobs with a guarded UPDATE
+# (queued -> running), so a job runs in one place only. A failing job is
+# retried with exponential backoff until it has used max_attempts. Each
+# process renews the lease of the jobs it is running; a job whose process died
+# is requeued once its lease (JOB_LEASE seconds) runs out.
+# Schedules enqueue one job per period. The period is part of the dedupe_key,
+# so with several processes the run is still enqueued once, and a run missed
+# while the app was down is made up at the next start.
+#
+# Tasks and schedules are registered in app/tasks.py. A task is called as
+# func(db, **payload) with its own session and must commit its own work.
+#
+# Environment:
+#   JOB_WORKERS          worker threads per process, 0 disables the runner (default 2);
+#                        see runner_active() for work that must not wait on it
+#   JOB_POLL_INTERVAL    seconds between polls when idle (default 1)
+#   JOB_LEASE            seconds before a running job is presumed dead (default 900)
+#   JOB_BACKOFF_BASE     first retry delay in seconds, doubled per attempt (default 10)
+#   JOB_RETENTION_HOURS  finished jobs are deleted after this long (default 72)
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+LEASE = int(os.getenv("JOB_LEASE", "900"))
+BACKOFF_BASE = int(os.getenv("JOB_BACKOFF_BASE", "10"))
+BACKOFF_MAX = 3600
+RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "72"))
+DEFAULT_MAX_ATTEMPTS = 5
+ERROR_MAX_CHARS = 4000
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    concurrency: Optional[int] = None  # running at once in this process, None = no limit
+
+
+@dataclass
+class Schedule:
+    task: str
+    every: Optional[int] = None  # seconds
+    at: Optional[time] = None    # daily, UTC
+
+    def slot(self, now: datetime) -> datetime:
+        # Start of the period `now` falls in
+        if self.every:
+            epoch = datetime(1970, 1, 1)
+            return epoch + timedelta(seconds=int((now - epoch).total_seconds()) // self.every * self.every)
+        today = datetime.combine(now.date(), self.at)
+        return today if now >= today else today - timedelta(days=1)
+
+    def next_run(self, now: datetime) -> datetime:
+        return self.slot(now) + (timedelta(seconds=self.every) if self.every else timedelta(days=1))
+
+    def describe(self) -> str:
+        return f"every {self.every}s" if self.every else f"daily at {self.at:%H:%M} UTC"
+
+
+_tasks: Dict[str, Task] = {}
+_schedules: Dict[str, Schedule] = {}
+_running = Counter()         # task name -> jobs running in this process
+_last_slot: Dict[str, datetime] = {}
+_claim_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def task(name: Optional[str] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS, concurrency: Optional[int] = None):
+    def register(func):
+        task_name = name or func.__name__
+        _tasks[task_name] = Task(task_name, func, max_attempts, concurrency)
+        return func
+    return register
+
+
+def schedule(task_name: str, every: Optional[int] = None, at: Optional[time] = None) -> None:
+    if (every is None) == (at is None):
+        raise ValueError("A schedule needs exactly one of every / at")
+    _schedules[task_name] = Schedule(task_name, every, at)
+
+
+def enqueue(db: Session, name: str, payload: Optional[dict] = None, run_at: Optional[datetime] = None,
+            dedupe_key: Optional[str] = None) -> bool:
+    # Caller commits, so a job deferred by a request is only visible once the
+    # request's own changes are. False if dedupe_key was already taken.
+    registered = _tasks.get(name)
+    job = models.Job
+    inserted = db.execute(
+        dialect_insert(db, job).values(
+            id=models.generate_uuid(),
+            name=name,
+            payload=json.dumps(payload) if payload else None,
+            status="queued",
+            attempts=0,
+            max_attempts=registered.max_attempts if registered else DEFAULT_MAX_ATTEMPTS,
+            run_at=run_at or datetime.utcnow(),
+            dedupe_key=dedupe_key,
+        ).on_conflict_do_nothing(index_elements=[job.dedupe_key])
+    ).rowcount == 1
+    if inserted:
+        _wake.set()
+    return inserted
+
+
+def backoff(attempts: int) -> float:
+    # Seconds before retry number `attempts`, with jitter so a burst of
+    # failures does not come back all at once
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+# --- Running jobs ---
+
+def claim(db: Session):
+    # The oldest due job of a task this process can run now, marked running;
+    # None if there is nothing to do
+    job = models.Job
+    with _claim_lock:
+        names = [t.name for t in _tasks.values() if t.concurrency is None or _running[t.name] < t.concurrency]
+        if not names:
+            return None
+        now = datetime.utcnow()
+        candidates = db.execute(
+            select(job.id).where(job.status == "queued", job.run_at <= now, job.name.in_(names))
+            .order_by(job.run_at).limit(max(WORKERS, 1) * 2)
+        ).scalars().all()
+        for job_id in candidates:
+            claimed = db.execute(
+                update(job)
+                .where(job.id == job_id, job.status == "queued")
+                .values(status="running", attempts=job.attempts + 1, locked_by=WORKER_ID, locked_at=now)
+                .returning(job.id, job.name, job.payload, job.attempts, job.max_attempts),
+                execution_options={"synchronize_session": False},
+            ).first()
+            db.commit()
+            if claimed:
+                _running[claimed.name] += 1
+                return claimed
+        return None
+
+
+def _finish(db: Session, job_id: str, **values) -> None:
+    # Only while this process still holds the job; after a lease expiry it
+    # may already be running elsewhere
+    job = models.Job
+    db.execute(
+        update(job)
+        .where(job.id == job_id, job.status == "running", job.locked_by == WORKER_ID)
+        .values(locked_by=None, locked_at=None, **values),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+
+
+def execute(claimed) -> bool:
+    # Runs a claimed job in its own session; True on success
+    db = SessionLocal()
+    try:
+        try:
+            _tasks[claimed.name].func(db, **json.loads(claimed.payload or "{}"))
+        except Exception:
+            db.rollback()
+            error = traceback.format_exc()[-ERROR_MAX_CHARS:]
+            if claimed.attempts >= claimed.max_attempts:
+                logger.exception("Job failed", extra={"job": claimed.name, "job_id": claimed.id, "attempts": claimed.attempts})
+                _finish(db, claimed.id, status="failed", last_error=error, finished_at=datetime.utcnow())
+            else:
+                retry_at = datetime.utcnow() + timedelta(seconds=backoff(claimed.attempts))
+                logger.warning("Job failed, retrying", extra={"job": claimed.name, "job_id": claimed.id, "retry_at": retry_at})
+                _finish(db, claimed.id, status="queued", last_error=error, run_at=retry_at)
+            return False
+        _finish(db, claimed.id, status="done", finished_at=datetime.utcnow())
+        return True
+    finally:
+        db.close()
+        with _claim_lock:
+            _running[claimed.name] -= 1
+
+
+def run_pending(db: Session, limit: int = 1000) -> int:
+    # Runs due jobs in the calling thread until none are left (scripts, tests)
+    ran = 0
+    while ran < limit:
+        claimed = claim(db)
+        if claimed is None:
+            break
+        execute(claimed)
+        ran += 1
+    return ran
+
+
+# --- Scheduling and upkeep ---
+
+def enqueue_scheduled(db: Session, now: Optional[datetime] = None) -> int:
+    # One job per schedule and period; cheap to call often, the database is
+    # only touched when a new period starts
+    now = now or datetime.utcnow()
+    enqueued = 0
+    for entry in _schedules.values():
+        slot = entry.slot(now)
+        if _last_slot.get(entry.task) == slot:
+            continue
+        if enqueue(db, entry.task, run_at=slot, dedupe_key=f"{entry.task}:{slot:%Y-%m-%dT%H:%M:%S}"):
+            enqueued += 1
+        _last_slot[entry.task] = slot
+    db.commit()
+    return enqueued
+
+
+def renew_leases(db: Session) -> None:
+    job = models.Job
+    db.execute(
+        update(job).where(job.status == "running", job.locked_by == WORKER_ID)
+        .values(locked_at=datetime.utcnow()),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+
+
+def requeue_expired(db: Session) -> int:
+    # Jobs whose process stopped renewing their lease: retry, or fail them if
+    # that was their last attempt
+    job = models.Job
+    now = datetime.utcnow()
+    stale = [job.status == "running", job.locked_at < now - timedelta(seconds=LEASE)]
+    failed = db.execute(
+        update(job).where(*stale, job.attempts >= job.max_attempts)
+        .values(status="failed", last_error="Lease expired", locked_by=None, locked_at=None, finished_at=now),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    requeued = db.execute(
+        update(job).where(*stale)
+        .values(status="queued", last_error="Lease expired", locked_by=None, locked_at=None, run_at=now),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.commit()
+    if failed or requeued:
+        logger.warning("Expired job leases", extra={"requeued": requeued, "failed": failed})
+    return failed + requeued
+
+
+@task("jobs_cleanup")
+def cleanup(db: Session) -> None:
+    job = models.Job
+    db.execute(
+        delete(job).where(job.status.in_(["done", "failed"]),
+                          job.finished_at < datetime.utcnow() - timedelta(hours=RETENTION_HOURS))
+    )
+    db.commit()
+
+
+schedule("jobs_cleanup", every=3600)
+
+
+# --- Admin ---
+
+def _job_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+def status(db: Session, state: Optional[str] = None, name: Optional[str] = None, limit: int = 50) -> dict:
+    job = models.Job
+    counts: Dict[str, Dict[str, int]] = {}
+    for task_name, job_status, count in db.execute(
+        select(job.name, job.status, func.count()).group_by(job.name, job.status)
+    ):
+        counts.setdefault(task_name, {})[job_status] = count
+
+    query = select(
+        job.id, job.name, job.status, job.attempts, job.max_attempts, job.run_at, job.dedupe_key,
+        job.locked_by, job.locked_at, job.last_error, job.created_at, job.finished_at,
+    )
+    if state:
+        query = query.where(job.status == state)
+    if name:
+        query = query.where(job.name == name)
+    recent = db.execute(query.order_by(job.run_at.desc()).limit(limit)).all()
+
+    now = datetime.utcnow()
+    return {
+        "counts": counts,
+        "running_here": {k: v for k, v in _running.items() if v},
+        "schedules": [
+            {"task": s.task, "schedule": s.describe(), "next_run": s.next_run(now)}
+            for s in _schedules.values()
+        ],
+        "jobs": [_job_dict(r) for r in recent],
+    }
+
+
+def retry(db: Session, job_id: str) -> Optional[bool]:
+    # None if the job does not exist, False if it is not failed
+    job = models.Job
+    current = db.execute(select(job.status).where(job.id == job_id)).scalar()
+    if current is None:
+        return None
+    retried = db.execute(
+        update(job).where(job.id == job_id, job.status == "failed")
+        .values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None),
+        execution_options={"synchronize_session": False},
+    ).rowcount == 1
+    db.commit()
+    if retried:
+        _wake.set()
+    return retried
+
+
+# --- Runner ---
+
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+
+
+def _work():
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            claimed = claim(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Claiming a job failed")
+            claimed = None
+        finally:
+            db.close()
+        if claimed is not None:
+            execute(claimed)
+        elif _wake.wait(POLL_INTERVAL):
+            _wake.clear()
+
+
+def _schedule_loop():
+    upkeep_due = 0.0
+    while True:
+        db = SessionLocal()
+        try:
+            enqueue_scheduled(db)
+            if time_module.monotonic() >= upkeep_due:
+                renew_leases(db)
+                requeue_expired(db)
+                upkeep_due = time_module.monotonic() + LEASE / 3
+        except Exception:
+            db.rollback()
+            logger.exception("Job scheduling failed")
+        finally:
+            db.close()
+        if _stop.wait(POLL_INTERVAL):
+            break
+
+
+def runner_active() -> bool:
+    # Whether this process runs jobs; with JOB_WORKERS=0, or before the
+    # lifespan started the runner, callers must not rely on queued work
+    return bool(_threads) and not _stop.is_set()
+
+
+def start() -> None:
+    if WORKERS <= 0 or _threads:
+        return
+    _stop.clear()
+    _threads.append(threading.Thread(target=_schedule_loop, name="job-scheduler", daemon=True))
+    for i in range(WORKERS):
+        _threads.append(threading.Thread(target=_work, name=f"job-worker-{i}", daemon=True))
+    for thread in _threads:
+        thread.start()
+
+
+def stop() -> None:
+    # Lets running jobs finish; queued ones stay in the table for the next start
+    _stop.set()
+    _wake.set()
+    for thread in _threads:
+        thread.join()
+    _threads.clear()
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import TTLCache
+
+# The level curve: which level a user is at for a given XP, and how far the
+# next one is. Stored in site_settings under "level_curve" as a JSON list of
+# [minimum xp, level name] pairs, e.g. [[0, "Beginner"], [100, "A1 Elementary"]],
+# and cached per process for LEVEL_CURVE_TTL seconds. Lookups bisect the
+# sorted thresholds; SQL writers use the equivalent CASE. After changing the
+# curve, recompute() re-levels every user in one UPDATE
+# (scripts/recompute_levels.py, or the "recompute_levels" job that admin edits
+# of the setting enqueue).
+
+logger = logging.getLogger(__name__)
+
+SETTING_KEY = "level_curve"
+LEVEL_CURVE_TTL = int(os.getenv("LEVEL_CURVE_TTL", "60"))
+
+DEFAULT_CURVE = (
+    (0, "Beginner"),
+    (100, "A1 Elementary"),
+    (500, "A2 Pre-Intermediate"),
+    (1000, "B1 Intermediate"),
+    (2000, "B2 Upper-Intermediate"),
+    (4000, "C1 Advanced"),
+)
+
+_curve = TTLCache("level_curve", ttl=LEVEL_CURVE_TTL, maxsize=1)
+
+
+class LevelCurve:
+    def __init__(self, levels: Sequence[Tuple[int, str]]):
+        levels = [(int(minimum), str(name)) for minimum, name in levels]
+        thresholds = [minimum for minimum, _ in levels]
+        if not levels or thresholds[0] != 0 or any(a >= b for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("Level thresholds must start at 0 and strictly increase")
+        self.levels = levels
+        self.thresholds: List[int] = thresholds
+        self.names: List[str] = [name for _, name in levels]
+
+    def _index(self, xp: int) -> int:
+        return max(bisect_right(self.thresholds, xp or 0) - 1, 0)
+
+    def level_for(self, xp: int) -> str:
+        return self.names[self._index(xp)]
+
+    def next_threshold(self, xp: int) -> Optional[int]:
+        # XP needed for the next level, None at the top
+        index = self._index(xp) + 1
+        return self.thresholds[index] if index < len(self.thresholds) else None
+
+    def progress(self, xp: int) -> int:
+        # Percent of the way from the current level to the next one
+        index = self._index(xp)
+        if index + 1 >= len(self.thresholds):
+            return 100
+        low, high = self.thresholds[index], self.thresholds[index + 1]
+        return min(int(((xp or 0) - low) * 100 / (high - low)), 100)
+
+    def case(self, xp_expr):
+        # SQL counterpart of level_for
+        return case(*[(xp_expr >= minimum, name) for minimum, name in reversed(self.levels[1:])], else_=self.names[0])
+
+
+def parse(value: str) -> LevelCurve:
+    return LevelCurve(json.loads(value))
+
+
+def current(db: Session, refresh: bool = False) -> LevelCurve:
+    curve = None if refresh else _curve.get(SETTING_KEY)
+    if curve is None:
+        value = db.execute(
+            select(models.SiteSetting.value).where(models.SiteSetting.key == SETTING_KEY)
+        ).scalar()
+        curve = LevelCurve(DEFAULT_CURVE)
+        if value:
+            try:
+                curve = parse(value)
+            except (ValueError, TypeError):
+                logger.error("Invalid level_curve setting, using the default curve", exc_info=True)
+        _curve.set(SETTING_KEY, curve)
+    return curve
+
+
+def invalidate() -> None:
+    _curve.invalidate()
+
+
+def recompute(db: Session) -> int:
+    # Re-levels every user whose stored level does not match the current
+    # curve, in one statement; returns the number of users changed
+    curve = current(db, refresh=True)
+    users = models.User.__table__
+    level = curve.case(func.coalesce(users.c.xp, 0))
+    changed = db.execute(
+        update(users)
+        .where(users.c.current_level.is_distinct_from(level))
+        .values(current_level=level)
+    ).rowcount
+    db.commit()
+    return changed
@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import defaultdict, namedtuple
+from typing import Dict, FrozenSet, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..cache import TTLCache
+
+# Chat membership, cached both ways: chat -> (type, participant ids) and
+# user -> chat ids. Chat endpoints authorize with a set lookup instead of a
+# chat_participants query, and the same sets tell who a message has to be
+# delivered to. Code that adds or removes participants, or changes a chat's
+# type, invalidates the affected entries in this worker. Other workers catch
+# up within MEMBERSHIP_TTL seconds. A user missing from a cached chat is
+# re-checked against the database before being refused, since another worker
+# may just have added them.
+
+MEMBERSHIP_TTL = int(os.getenv("MEMBERSHIP_TTL", "60"))
+
+ChatMembers = namedtuple("ChatMembers", "type user_ids")
+
+_chats = TTLCache("chat_members", ttl=MEMBERSHIP_TTL, maxsize=50_000)
+_users = TTLCache("user_chats", ttl=MEMBERSHIP_TTL, maxsize=50_000)
+
+# Bumped on every invalidation so a load that raced with a change is not cached
+_generation = 0
+_lock = threading.Lock()
+
+
+def _load_chats(db: Session, chat_ids: Iterable[str]) -> Dict[str, ChatMembers]:
+    participant = models.ChatParticipant
+    generation = _generation
+    rows = db.execute(
+        select(models.Chat.id, models.Chat.type, participant.user_id)
+        .outerjoin(participant, participant.chat_id == models.Chat.id)
+        .where(models.Chat.id.in_(list(chat_ids)))
+    ).all()
+    types, user_ids = {}, defaultdict(set)
+    for chat_id, chat_type, user_id in rows:
+        types[chat_id] = chat_type
+        if user_id is not None:
+            user_ids[chat_id].add(user_id)
+    loaded = {chat_id: ChatMembers(chat_type, frozenset(user_ids[chat_id])) for chat_id, chat_type in types.items()}
+    with _lock:
+        if generation == _generation:
+            for chat_id, members in loaded.items():
+                _chats.set(chat_id, members)
+    return loaded
+
+
+def chat_members(db: Session, chat_id: str, refresh: bool = False) -> Optional[ChatMembers]:
+    # None if the chat does not exist
+    members = None if refresh else _chats.get(chat_id)
+    return members if members is not None else _load_chats(db, [chat_id]).get(chat_id)
+
+
+def members_many(db: Session, chat_ids: Iterable[str]) -> Dict[str, ChatMembers]:
+    # Cache misses are loaded in one query
+    found, missing = {}, []
+    for chat_id in chat_ids:
+        members = _chats.get(chat_id)
+        if members is None:
+            missing.append(chat_id)
+        else:
+            found[chat_id] = members
+    if missing:
+        found.update(_load_chats(db, missing))
+    return found
+
+
+def member_of(db: Session, chat_id: str, user_id: str) -> Optional[ChatMembers]:
+    # The chat's members if user_id is one of them, else None
+    members = chat_members(db, chat_id)
+    if members is None or user_id not in members.user_ids:
+        members = chat_members(db, chat_id, refresh=True)
+    return members if members is not None and user_id in members.user_ids else None
+
+
+def user_chat_ids(db: Session, user_id: str) -> FrozenSet[str]:
+    chat_ids = _users.get(user_id)
+    if chat_ids is None:
+        generation = _generation
+        chat_ids = frozenset(db.execute(
+            select(models.ChatParticipant.chat_id).where(models.ChatParticipant.user_id == user_id)
+        ).scalars())
+        with _lock:
+            if generation == _generation:
+                _users.set(user_id, chat_ids)
+    return chat_ids
+
+
+def cached_user_chat_ids(user_id: str) -> Optional[FrozenSet[str]]:
+    # The cached chat ids, or None on a miss (nothing is loaded)
+    return _users.get(user_id)
+
+
+def invalidate(chat_ids: Iterable[str] = (), user_ids: Iterable[str] = ()) -> None:
+    # Call after committing a change to participants or chat type
+    global _generation
+    with _lock:
+        _generation += 1
+        for chat_id in chat_ids:
+            _chats.invalidate(chat_id)
+        for user_id in user_ids:
+            _users.invalidate(user_id)
+
+
+def invalidate_all() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _chats.invalidate()
+        _users.invalidate()
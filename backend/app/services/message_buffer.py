@@ -0,0 +1,306 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, dialect_insert
+
+# Optional write-behind mode for chat messages (MESSAGE_WRITE_BEHIND=1).
+# send_message appends the message to a local log segment and returns once
+# the append is fsync'd; concurrent appends share one fsync (group commit).
+# Until flushed the message is served from memory by get_messages. A
+# background thread moves everything appended so far into `messages` every
+# MESSAGE_FLUSH_INTERVAL_MS with multi-row INSERTs, then deletes the segment.
+#
+# Ordering: timestamps are assigned under the append lock and strictly
+# increase, so messages of a chat keep their send order in the table.
+# Recovery: on startup, segments left behind by a crashed process are
+# replayed. Inserts ignore ids that already exist, so replaying a segment
+# that was partly flushed is safe. Live processes hold a lock on their
+# segments, so several workers can share MESSAGE_LOG_DIR.
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("MESSAGE_WRITE_BEHIND", "0") == "1"
+LOG_DIR = os.getenv("MESSAGE_LOG_DIR", "message_log")
+FLUSH_INTERVAL = int(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "20")) / 1000
+INSERT_BATCH = 1000
+
+# Same fields as the serialization.MESSAGE_COLUMNS rows
+PendingMessage = namedtuple("PendingMessage", "id chat_id sender_id content is_read created_at")
+
+
+def _encode(message: PendingMessage) -> bytes:
+    record = message._asdict()
+    record["created_at"] = message.created_at.isoformat()
+    return json.dumps(record).encode() + b"\n"
+
+
+def _decode(data: bytes, path: str) -> List[PendingMessage]:
+    messages = []
+    for line in data.split(b"\n"):
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Torn write at the end of a crashed segment: never acknowledged
+            logger.warning("Skipping unreadable message log record", extra={"path": path})
+            continue
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+        messages.append(PendingMessage(**record))
+    return messages
+
+
+def write_messages(db: Session, messages: Sequence[PendingMessage]) -> None:
+    # Multi-row INSERTs that skip ids already stored, then each chat's
+    # updated_at and each sender's read watermark moved forward to their
+    # newest message, all in one transaction.
+    message_model = models.Message
+    for start in range(0, len(messages), INSERT_BATCH):
+        chunk = messages[start:start + INSERT_BATCH]
+        db.execute(
+            dialect_insert(db, message_model)
+            .values([m._asdict() for m in chunk])
+            .on_conflict_do_nothing(index_elements=[message_model.id])
+        )
+
+    latest, watermarks = {}, {}
+    for m in messages:
+        latest[m.chat_id] = m
+        if m.sender_id is not None:
+            watermarks[(m.chat_id, m.sender_id)] = m
+
+    chats = models.Chat.__table__
+    db.execute(
+        update(chats)
+        .where(chats.c.id == bindparam("b_chat"), or_(chats.c.updated_at.is_(None), chats.c.updated_at < bindparam("b_at")))
+        .values(updated_at=bindparam("b_at")),
+        [{"b_chat": chat_id, "b_at": m.created_at} for chat_id, m in latest.items()],
+    )
+    if watermarks:
+        participants = models.ChatParticipant.__table__
+        db.execute(
+            update(participants)
+            .where(
+                participants.c.chat_id == bindparam("b_chat"),
+                participants.c.user_id == bindparam("b_user"),
+                or_(participants.c.last_read_at.is_(None), participants.c.last_read_at < bindparam("b_at")),
+            )
+            .values(last_read_message_id=bindparam("b_id"), last_read_at=bindparam("b_at")),
+            [
+                {"b_chat": chat_id, "b_user": user_id, "b_id": m.id, "b_at": m.created_at}
+                for (chat_id, user_id), m in watermarks.items()
+            ],
+        )
+    db.commit()
+
+
+class _Segment:
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "ab")
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.messages: List[PendingMessage] = []
+        self.synced = 0
+
+    def close(self, remove: bool = False):
+        if remove:
+            os.remove(self.path)
+        self.file.close()
+
+
+class MessageBuffer:
+    def __init__(self, log_dir: str = LOG_DIR, interval: float = FLUSH_INTERVAL, session_factory=SessionLocal):
+        self.log_dir = log_dir
+        self.interval = interval
+        self.session_factory = session_factory
+        os.makedirs(log_dir, exist_ok=True)
+
+        self._lock = threading.Lock()        # appends, pending index, segment swaps
+        self._sync_lock = threading.Lock()   # one fsync at a time
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._pending: Dict[str, Dict[str, PendingMessage]] = {}
+        self._unflushed: List[_Segment] = []
+        self._last_at: Optional[datetime] = None
+        self._segment = self._new_segment()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _new_segment(self) -> _Segment:
+        return _Segment(os.path.join(self.log_dir, f"{time.time_ns():020d}-{os.getpid()}.log"))
+
+    # --- Writes ---
+
+    def append(self, chat_id: str, sender_id: Optional[str], content: str) -> PendingMessage:
+        # Returns once the message is durable in the log
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            if self._last_at is not None and now <= self._last_at:
+                now = self._last_at + timedelta(microseconds=1)
+            self._last_at = now
+            message = PendingMessage(models.generate_uuid(), chat_id, sender_id, content, False, now)
+            segment = self._segment
+            segment.file.write(_encode(message))
+            segment.messages.append(message)
+            written = len(segment.messages)
+            self._pending.setdefault(chat_id, {})[message.id] = message
+        self._sync(segment, written)
+        return message
+
+    def _sync(self, segment: _Segment, written: int):
+        # Group commit: whoever gets here first fsyncs every record written
+        # so far, and the appends queued behind it find their record synced
+        with self._sync_lock:
+            if segment.synced >= written:
+                return
+            with self._lock:
+                segment.file.flush()
+                written = len(segment.messages)
+            os.fsync(segment.file.fileno())
+            segment.synced = written
+
+    def flush(self) -> int:
+        # Moves everything appended so far into the messages table
+        with self._flush_lock:
+            with self._lock:
+                if self._segment.messages:
+                    self._unflushed.append(self._segment)
+                    self._segment = self._new_segment()
+                segments = list(self._unflushed)
+
+            flushed = 0
+            for segment in segments:
+                self._sync(segment, len(segment.messages))
+                self._write(segment.messages)
+                with self._lock:
+                    self._forget(segment.messages)
+                    self._unflushed.remove(segment)
+                segment.close(remove=True)
+                flushed += len(segment.messages)
+            return flushed
+
+    def _write(self, messages: Sequence[PendingMessage]):
+        db = self.session_factory()
+        try:
+            try:
+                write_messages(db, messages)
+            except IntegrityError:
+                # A chat or sender disappeared meanwhile: keep the rest of the batch
+                db.rollback()
+                for message in messages:
+                    try:
+                        write_messages(db, [message])
+                    except IntegrityError:
+                        db.rollback()
+                        logger.error("Dropping buffered message", extra={"chat_id": message.chat_id, "message_id": message.id})
+        finally:
+            db.close()
+
+    def _forget(self, messages: Sequence[PendingMessage]):
+        for message in messages:
+            chat = self._pending.get(message.chat_id)
+            if chat is not None:
+                chat.pop(message.id, None)
+                if not chat:
+                    del self._pending[message.chat_id]
+
+    # --- Reads ---
+
+    def pending(self, chat_id: str) -> List[PendingMessage]:
+        with self._lock:
+            return list(self._pending.get(chat_id, {}).values())
+
+    def merge_pending(self, chat_id: str, rows: list, skip: int, limit: int, stored: int) -> list:
+        # rows: a page of stored messages (oldest first) starting at skip.
+        # stored: how many messages the chat has stored, archived ones
+        # included. Pending messages are newer than anything stored, so they
+        # continue the last page.
+        pending = self.pending(chat_id)
+        if not pending or len(rows) >= limit:
+            return rows
+        stored_ids = {r.id for r in rows}
+        pending = [m for m in pending if m.id not in stored_ids]
+        offset = max(0, skip - stored)
+        return list(rows) + pending[offset:offset + limit - len(rows)]
+
+    # --- Lifecycle ---
+
+    def replay(self) -> int:
+        # Segments of crashed processes; live ones are locked and skipped
+        replayed = 0
+        with self._lock:
+            own = {self._segment.path, *(s.path for s in self._unflushed)}
+        for name in sorted(os.listdir(self.log_dir)):
+            path = os.path.join(self.log_dir, name)
+            if not name.endswith(".log") or path in own:
+                continue
+            with open(path, "rb") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                messages = _decode(f.read(), path)
+                if messages:
+                    self._write(messages)
+                os.remove(path)
+            replayed += len(messages)
+        if replayed:
+            logger.info("Replayed buffered messages", extra={"messages": replayed})
+        return replayed
+
+    def start(self):
+        self.replay()
+        self._thread = threading.Thread(target=self._run, name="message-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Message flush failed, retrying")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            # Left on disk for the next start to replay
+            logger.exception("Final message flush failed")
+        with self._lock:
+            self._segment.close(remove=not self._segment.messages)
+
+
+_buffer: Optional[MessageBuffer] = None
+
+
+def start() -> None:
+    global _buffer
+    if ENABLED and _buffer is None:
+        _buffer = MessageBuffer()
+        _buffer.start()
+
+
+def stop() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer = None
+
+
+def active() -> Optional[MessageBuffer]:
+    # The running buffer, None when messages are written synchronously
+    return _buffer
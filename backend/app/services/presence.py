@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from . import deletion
+
+# Presence of users waiting in the random chat queue.
+# A waiting client sends a heartbeat every few seconds: the chat page's inbox
+# poll (GET /chats/), the message poll on the queue chat, or an explicit
+# POST /chats/random/heartbeat all count. Heartbeats are kept in
+# memory and written through to the queue chat's updated_at at most every
+# QUEUE_TTL / 3 seconds, so every worker's matchmaker can tell live waiters
+# from abandoned tabs: a queue entry without a heartbeat for QUEUE_TTL
+# seconds is dead. A periodic sweep drops dead entries from memory and
+# garbage-collects their queue chats in batches.
+
+logger = logging.getLogger(__name__)
+
+QUEUE_TTL = int(os.getenv("RANDOM_QUEUE_TTL", "60"))
+SWEEP_INTERVAL = int(os.getenv("RANDOM_QUEUE_SWEEP_INTERVAL", "30"))
+GC_BATCH_SIZE = int(os.getenv("RANDOM_QUEUE_GC_BATCH", "200"))
+PERSIST_EVERY = QUEUE_TTL / 3
+
+QueueEntry = namedtuple("QueueEntry", "chat_id user_id native_language_id")
+
+# queue chat id -> (user id, last heartbeat, last write-through), monotonic seconds
+_seen: Dict[str, Tuple[str, float, float]] = {}
+_lock = threading.Lock()
+
+
+def _cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=QUEUE_TTL)
+
+
+def _last_active():
+    return func.coalesce(models.Chat.updated_at, models.Chat.created_at)
+
+
+def register(chat_id: str, user_id: str) -> None:
+    # A queue chat was just created (its created_at is the first heartbeat)
+    now = time.monotonic()
+    with _lock:
+        _seen[chat_id] = (user_id, now, now)
+
+
+def forget(chat_id: str) -> None:
+    with _lock:
+        _seen.pop(chat_id, None)
+
+
+def touch(db: Session, chat_id: str, user_id: str) -> None:
+    # Heartbeat; writes through to the chat row when due
+    now = time.monotonic()
+    with _lock:
+        entry = _seen.get(chat_id)
+        due = entry is None or now - entry[2] >= PERSIST_EVERY
+        _seen[chat_id] = (user_id, now, now if due else entry[2])
+    if due:
+        db.execute(
+            update(models.Chat)
+            .where(models.Chat.id == chat_id, models.Chat.type == 'random_queue')
+            .values(updated_at=func.now()),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+
+def live_queues(db: Session) -> List[QueueEntry]:
+    # Queue chats with a single waiter and a recent heartbeat, oldest first
+    chat = models.Chat
+    participant = models.ChatParticipant
+    rows = db.execute(
+        select(chat.id, participant.user_id, models.User.native_language_id)
+        .join(participant, participant.chat_id == chat.id)
+        .join(models.User, models.User.id == participant.user_id)
+        .where(chat.type == 'random_queue', _last_active() >= _cutoff())
+        .order_by(chat.created_at, chat.id)
+    ).all()
+    waiters = Counter(r.id for r in rows)
+    return [QueueEntry(r.id, r.user_id, r.native_language_id) for r in rows if waiters[r.id] == 1]
+
+
+def claim(db: Session, chat_id: str) -> bool:
+    # Turns a queue chat into a random chat; False if another request (or the
+    # sweep) got it first. Caller commits.
+    claimed = db.execute(
+        update(models.Chat)
+        .where(models.Chat.id == chat_id, models.Chat.type == 'random_queue')
+        .values(type='random', updated_at=func.now()),
+        execution_options={"synchronize_session": False},
+    ).rowcount == 1
+    if claimed:
+        forget(chat_id)
+    return claimed
+
+
+def sweep(db: Session, batch_size: int = GC_BATCH_SIZE) -> int:
+    # Drops dead entries from memory, then deletes abandoned queue chats.
+    # Each batch is first claimed (type -> expired_queue) so a concurrent
+    # match can never pick a chat that is being deleted.
+    now = time.monotonic()
+    with _lock:
+        for chat_id, (_, last_seen, _) in list(_seen.items()):
+            if now - last_seen > QUEUE_TTL:
+                del _seen[chat_id]
+
+    chat = models.Chat
+    removed = 0
+    while True:
+        ids = db.execute(
+            select(chat.id).where(chat.type == 'random_queue', _last_active() < _cutoff()).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        expired = db.execute(
+            update(chat)
+            .where(chat.id.in_(ids), chat.type == 'random_queue', _last_active() < _cutoff())
+            .values(type='expired_queue')
+            .returning(chat.id),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+        db.commit()
+
+        if expired:
+            # Also drops the chats from the membership cache
+            deletion.purge(db, chat, expired)
+            removed += len(expired)
+        if len(ids) < batch_size:
+            break
+    if removed:
+        logger.info("Removed abandoned random chat queues", extra={"chats": removed})
+    return removed
+
+
+# --- Background sweeper ---
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _run():
+    while not _stop.wait(SWEEP_INTERVAL):
+        db = SessionLocal()
+        try:
+            sweep(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Random queue sweep failed")
+        finally:
+            db.close()
+
+
+def start() -> None:
+    global _thread
+    if _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=_run, name="queue-sweep", daemon=True)
+        _thread.start()
+
+
+def stop() -> None:
+    global _thread
+    if _thread is not None:
+        _stop.set()
+        _thread.join()
+        _thread = None
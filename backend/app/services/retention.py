@@ -0,0 +1,216 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import String, cast, func, select, text
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import membership
+
+# Retention / archival of rows that would otherwise grow forever.
+# Each policy selects "expired" parent rows by age, removes their dependent
+# rows first, then the parents themselves - always in small batches with a
+# commit per batch so no statement holds locks for long.
+
+DEFAULT_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+DEFAULT_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.05"))
+
+
+@dataclass
+class RetentionPolicy:
+    name: str
+    model: type
+    days: int
+    # Builds the "expired" criterion from the cutoff timestamp
+    criterion: Callable[[datetime], object]
+    # (child model, FK column name) deleted before the parent rows
+    children: List[Tuple[type, str]] = field(default_factory=list)
+    description: str = ""
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        return (now or datetime.utcnow()) - timedelta(days=self.days)
+
+
+@dataclass
+class TableReport:
+    table: str
+    rows: int = 0
+    est_bytes: int = 0
+
+
+@dataclass
+class PolicyReport:
+    policy: str
+    cutoff: datetime
+    dry_run: bool
+    tables: Dict[str, TableReport] = field(default_factory=dict)
+    batches: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def total_rows(self) -> int:
+        return sum(t.rows for t in self.tables.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(t.est_bytes for t in self.tables.values())
+
+    def add(self, table: str, rows: int, row_bytes: int):
+        report = self.tables.setdefault(table, TableReport(table))
+        report.rows += rows
+        report.est_bytes += rows * row_bytes
+
+
+def default_policies() -> List[RetentionPolicy]:
+    notification_days = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+    chat_days = int(os.getenv("CHAT_RETENTION_DAYS", "180"))
+
+    return [
+        RetentionPolicy(
+            name="read_notifications",
+            model=models.Notification,
+            days=notification_days,
+            # Unread rows are never touched, so notification counters stay exact
+            criterion=lambda cutoff: (models.Notification.is_read == True) & (models.Notification.created_at < cutoff),
+            description="Read notifications older than NOTIFICATION_RETENTION_DAYS",
+        ),
+        RetentionPolicy(
+            name="terminated_chats",
+            model=models.Chat,
+            days=chat_days,
+            criterion=lambda cutoff: (models.Chat.type == 'terminated') & (
+                func.coalesce(models.Chat.updated_at, models.Chat.created_at) < cutoff
+            ),
+            children=[
+                (models.Message, "chat_id"),
+                (models.ArchivedChatSegment, "chat_id"),
+                (models.ChatParticipant, "chat_id"),
+            ],
+            description="Terminated chats (and their messages) idle for CHAT_RETENTION_DAYS",
+        ),
+    ]
+
+
+def estimate_row_bytes(db: Session, model) -> int:
+    # Average on-disk footprint of one row, used for "reclaimed space" reports.
+    table = model.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        row = db.execute(text(
+            "SELECT pg_total_relation_size(c.oid), c.reltuples FROM pg_class c "
+            "WHERE c.relname = :name AND c.relkind = 'r'"
+        ), {"name": table.name}).first()
+        if row and row[0]:
+            # reltuples is -1 for never-analyzed tables
+            return int(row[0] / max(row[1] or 1, 1))
+
+    # Portable fallback: sum of column value lengths over a sample of rows
+    length = sum(
+        (func.coalesce(func.length(cast(col, String)), 0) for col in table.columns),
+        0,
+    )
+    sample = select(length.label("len")).select_from(table).limit(1000).subquery()
+    avg = db.execute(select(func.avg(sample.c.len))).scalar()
+    return int(avg or 0)
+
+
+def _pk(model):
+    return inspect(model).primary_key[0]
+
+
+def _archive(db: Session, archive_dir: str, model, criterion):
+    # Append the rows about to be deleted to <archive_dir>/<table>-<date>.jsonl
+    table = model.__table__
+    path = os.path.join(archive_dir, f"{table.name}-{datetime.utcnow():%Y%m%d}.jsonl")
+    rows = db.execute(select(table).where(criterion)).mappings()
+    with open(path, "a", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps(dict(row), default=str) + "\n")
+
+
+def _delete_children(db: Session, policy: RetentionPolicy, parent_ids: List, batch_size: int,
+                     archive_dir: Optional[str], report: PolicyReport, row_bytes: Dict[str, int]):
+    for child, fk_name in policy.children:
+        fk = getattr(child, fk_name)
+        child_pk = _pk(child)
+        while True:
+            # Bounded chunk of child rows per statement
+            ids = [r[0] for r in db.execute(
+                select(child_pk).where(fk.in_(parent_ids)).limit(batch_size)
+            )]
+            if not ids:
+                break
+            if archive_dir:
+                _archive(db, archive_dir, child, child_pk.in_(ids))
+            db.execute(child.__table__.delete().where(child_pk.in_(ids)))
+            db.commit()
+            report.add(child.__tablename__, len(ids), row_bytes[child.__tablename__])
+            report.batches += 1
+
+
+def run_policy(db: Session, policy: RetentionPolicy, dry_run: bool = False,
+               batch_size: int = DEFAULT_BATCH_SIZE, pause: float = DEFAULT_BATCH_PAUSE,
+               archive_dir: Optional[str] = None,
+               progress: Optional[Callable[[PolicyReport], None]] = None) -> PolicyReport:
+    started = time.monotonic()
+    cutoff = policy.cutoff()
+    criterion = policy.criterion(cutoff)
+    report = PolicyReport(policy=policy.name, cutoff=cutoff, dry_run=dry_run)
+
+    all_models = [policy.model] + [child for child, _ in policy.children]
+    row_bytes = {m.__tablename__: estimate_row_bytes(db, m) for m in all_models}
+
+    pk = _pk(policy.model)
+    expired_ids = select(pk).where(criterion)
+
+    if dry_run:
+        for child, fk_name in policy.children:
+            count = db.query(func.count()).select_from(child).filter(
+                getattr(child, fk_name).in_(expired_ids)
+            ).scalar()
+            report.add(child.__tablename__, count, row_bytes[child.__tablename__])
+        count = db.query(func.count()).select_from(policy.model).filter(criterion).scalar()
+        report.add(policy.model.__tablename__, count, row_bytes[policy.model.__tablename__])
+        report.elapsed = time.monotonic() - started
+        return report
+
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    while True:
+        ids = [r[0] for r in db.execute(expired_ids.limit(batch_size))]
+        if not ids:
+            break
+        member_ids = []
+        if policy.model is models.Chat:
+            member_ids = db.execute(
+                select(models.ChatParticipant.user_id).where(models.ChatParticipant.chat_id.in_(ids))
+            ).scalars().all()
+
+        _delete_children(db, policy, ids, batch_size, archive_dir, report, row_bytes)
+
+        if archive_dir:
+            _archive(db, archive_dir, policy.model, pk.in_(ids))
+        db.execute(policy.model.__table__.delete().where(pk.in_(ids)))
+        db.commit()
+        if policy.model is models.Chat:
+            membership.invalidate(chat_ids=ids, user_ids=member_ids)
+
+        report.add(policy.model.__tablename__, len(ids), row_bytes[policy.model.__tablename__])
+        report.batches += 1
+        if progress:
+            progress(report)
+        if pause:
+            # Let other writers get at the locks between batches
+            time.sleep(pause)
+
+    report.elapsed = time.monotonic() - started
+    return report
+
+
+def run_retention(db: Session, policies: Optional[List[RetentionPolicy]] = None, **kwargs) -> List[PolicyReport]:
+    return [run_policy(db, policy, **kwargs) for policy in (policies or default_policies())]
@@ -0,0 +1,100 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..database import SessionLocal
+
+# Row counts for admin screens without a COUNT(*) per page load.
+# - estimate_count: Postgres planner statistics (pg_class.reltuples), falling
+#   back to the last exact count we have.
+# - exact counts are computed off the request path and cached together with
+#   the time they were taken; stale entries keep being served while a refresh
+#   runs in the background.
+
+EXACT_COUNT_TTL = int(os.getenv("TABLE_COUNT_TTL", "300"))
+
+# table name -> (count, counted_at)
+_exact_counts = TTLCache("table_counts", maxsize=256)
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+def _table_name(model) -> str:
+    return model.__tablename__
+
+
+def exact_count(db: Session, model) -> int:
+    count = db.execute(select(func.count()).select_from(model)).scalar() or 0
+    _exact_counts.set(_table_name(model), (count, datetime.utcnow()))
+    return count
+
+
+def cached_count(model) -> Optional[Tuple[int, datetime]]:
+    return _exact_counts.get(_table_name(model))
+
+
+def invalidate(model) -> None:
+    # After a write through the admin API: the next read counts again
+    _exact_counts.invalidate(_table_name(model))
+
+
+def is_stale(model) -> bool:
+    cached = cached_count(model)
+    return cached is None or (datetime.utcnow() - cached[1]).total_seconds() > EXACT_COUNT_TTL
+
+
+def estimate_count(db: Session, model) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        reltuples = db.execute(text(
+            "SELECT reltuples FROM pg_class WHERE relname = :name AND relkind = 'r'"
+        ), {"name": _table_name(model)}).scalar()
+        # -1 means the table has never been vacuumed/analyzed
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    cached = cached_count(model)
+    if cached:
+        return cached[0]
+    # Nothing better available (e.g. SQLite in development)
+    return exact_count(db, model)
+
+
+def refresh_counts(models: Iterable) -> None:
+    # Runs outside the request (BackgroundTasks / job runner) with its own session.
+    with _refresh_lock:
+        pending = [m for m in models if _table_name(m) not in _refreshing]
+        _refreshing.update(_table_name(m) for m in pending)
+    if not pending:
+        return
+
+    db = SessionLocal()
+    try:
+        for model in pending:
+            exact_count(db, model)
+    finally:
+        db.close()
+        with _refresh_lock:
+            _refreshing.difference_update(_table_name(m) for m in pending)
+
+
+def counts_for(db: Session, models: Dict[str, type]) -> Tuple[Dict[str, int], Dict[str, Optional[datetime]], list]:
+    # Best available count per key plus when it was taken (None = estimate).
+    # Returns the models whose exact count should be refreshed in the background.
+    counts, as_of, stale = {}, {}, []
+    for key, model in models.items():
+        cached = cached_count(model)
+        if cached:
+            counts[key], as_of[key] = cached
+        else:
+            counts[key], as_of[key] = estimate_count(db, model), None
+            cached = cached_count(model)
+            if cached:
+                as_of[key] = cached[1]
+        if is_stale(model):
+            stale.append(model)
+    return counts, as_of, stale
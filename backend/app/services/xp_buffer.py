@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Date, Integer, bindparam, case, event, func, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from . import levels
+
+# XP and streak updates, batched (XP_BUFFER=1, the default).
+# Every XP event used to re-read and rewrite the user row. Events are now
+# staged on the request's session, handed to the accumulator once that
+# session commits (a rollback drops them, so failed requests award nothing),
+# merged per user and day in memory and flushed every XP_FLUSH_INTERVAL_MS as
+# one `UPDATE users SET xp = xp + :delta ...` per user, sent as a single
+# executemany. The same statement moves the streak forward and recomputes the
+# level with a CASE built from the level curve (services/levels.py), so
+# nothing is read back first.
+# Read paths that show a user their progress add the XP still pending in this
+# process (progress()). Deltas not yet flushed are lost if the process is
+# killed; XP is not worth a durable log. Without a running accumulator
+# (scripts, tests, XP_BUFFER=0) the statement runs directly in the caller's
+# transaction.
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("XP_BUFFER", "1") == "1"
+FLUSH_INTERVAL = int(os.getenv("XP_FLUSH_INTERVAL_MS", "2000")) / 1000
+
+XPDelta = namedtuple("XPDelta", "user_id day xp")
+Progress = namedtuple("Progress", "xp level streak_days last_activity_date")
+
+
+def advance_streak(streak: Optional[int], last_day: Optional[date], day: date) -> Tuple[int, date]:
+    # Streak after activity on `day`: unchanged the same day, +1 the day after, else restarted
+    if last_day is not None and last_day >= day:
+        return streak or 0, last_day
+    if last_day == day - timedelta(days=1):
+        return (streak or 0) + 1, day
+    return 1, day
+
+
+def _statement(curve: levels.LevelCurve):
+    users = models.User.__table__
+    delta = bindparam("b_xp", type_=Integer)
+    day = bindparam("b_day", type_=Date)
+    new_xp = func.coalesce(users.c.xp, 0) + delta
+    same_day = users.c.last_activity_date >= day
+    return (
+        update(users)
+        .where(users.c.id == bindparam("b_user"))
+        .values(
+            xp=new_xp,
+            current_level=case((delta > 0, curve.case(new_xp)), else_=users.c.current_level),
+            streak_days=case(
+                (same_day, users.c.streak_days),
+                (users.c.last_activity_date == bindparam("b_yesterday", type_=Date), func.coalesce(users.c.streak_days, 0) + 1),
+                else_=1,
+            ),
+            last_activity_date=case((same_day, users.c.last_activity_date), else_=day),
+        )
+    )
+
+
+def write(db: Session, deltas: Iterable[XPDelta]) -> None:
+    # One executemany per day, oldest day first so streaks advance in order.
+    # Caller commits.
+    by_day = defaultdict(list)
+    for delta in deltas:
+        by_day[delta.day].append({
+            "b_user": delta.user_id, "b_xp": delta.xp,
+            "b_day": delta.day, "b_yesterday": delta.day - timedelta(days=1),
+        })
+    if not by_day:
+        return
+    statement = _statement(levels.current(db))
+    for day in sorted(by_day):
+        db.execute(statement, by_day[day])
+
+
+class XPAccumulator:
+    def __init__(self, interval: float = FLUSH_INTERVAL, session_factory=SessionLocal):
+        self.interval = interval
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # user_id -> day -> XP
+        self._pending: Dict[str, Dict[date, int]] = defaultdict(lambda: defaultdict(int))
+        # Taken by a flush but not committed yet; still counted by readers
+        self._flushing: Dict[str, Dict[date, int]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, deltas: Iterable[XPDelta]) -> None:
+        with self._lock:
+            for delta in deltas:
+                self._pending[delta.user_id][delta.day] += delta.xp
+
+    def pending(self, user_id: str) -> Dict[date, int]:
+        # day -> XP not yet in the users table
+        result = defaultdict(int)
+        with self._lock:
+            for source in (self._flushing, self._pending):
+                for day, xp in source.get(user_id, {}).items():
+                    result[day] += xp
+        return dict(result)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+                batch = [
+                    XPDelta(user_id, day, xp)
+                    for user_id, days in self._flushing.items() for day, xp in days.items()
+                ]
+
+            db = self.session_factory()
+            try:
+                write(db, batch)
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Merge back and retry with the next flush
+                with self._lock:
+                    for user_id, days in self._flushing.items():
+                        for day, xp in days.items():
+                            self._pending[user_id][day] += xp
+                    self._flushing = {}
+                raise
+            finally:
+                db.close()
+            with self._lock:
+                self._flushing = {}
+            return len(batch)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="xp-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("XP flush failed, retrying")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final XP flush failed, pending XP dropped")
+
+
+_accumulator: Optional[XPAccumulator] = None
+
+# Session.info key for deltas waiting on the session's commit
+_STAGED = "xp_buffer_staged"
+
+
+def record(db: Session, user_id: str, xp: int = 0, day: Optional[date] = None) -> None:
+    # XP gain (0 for activity only) for user_id, counted once db commits
+    delta = XPDelta(user_id, day or date.today(), xp)
+    if _accumulator is not None:
+        db.info.setdefault(_STAGED, []).append(delta)
+    else:
+        write(db, [delta])
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        # A savepoint: wait for the outer transaction
+        return
+    staged = session.info.pop(_STAGED, None)
+    if not staged:
+        return
+    accumulator = _accumulator
+    if accumulator is None:
+        # Stopped between record() and the commit (shutdown)
+        logger.warning("XP accumulator stopped, dropping %d committed XP events", len(staged))
+        return
+    accumulator.add(staged)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction) -> None:
+    # Rolled back or closed without a commit: the events never happened
+    if transaction.parent is None:
+        session.info.pop(_STAGED, None)
+
+
+def progress(db: Session, user: models.User) -> Progress:
+    # The user's stats including XP still pending in this process
+    curve = levels.current(db)
+    xp, level = user.xp or 0, user.current_level or curve.level_for(user.xp or 0)
+    streak, last_day = user.streak_days or 0, user.last_activity_date
+    pending = _accumulator.pending(user.id) if _accumulator is not None else {}
+    for day in sorted(pending):
+        streak, last_day = advance_streak(streak, last_day, day)
+        xp += pending[day]
+    if any(pending.values()):
+        level = curve.level_for(xp)
+    return Progress(xp, level, streak, last_day)
+
+
+def start() -> None:
+    global _accumulator
+    if ENABLED and _accumulator is None:
+        _accumulator = XPAccumulator()
+        _accumulator.start()
+
+
+def stop() -> None:
+    global _accumulator
+    if _accumulator is not None:
+        accumulator, _accumulator = _accumulator, None
+        accumulator.stop()
+
+
+def active() -> Optional[XPAccumulator]:
+    return _accumulator
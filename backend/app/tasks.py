@@ -0,0 +1,44 @@
+from datetime import time
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .services import chat_archive, featured, jobs, levels, retention
+
+# Background jobs run by app/services/jobs.py. Imported by main.py so every
+# process that serves requests can also run them. The maintenance scripts in
+# scripts/ still work for one-off runs; the schedules below replace their
+# cron entries.
+
+
+@jobs.task("notify")
+def notify(db: Session, user_id: str, title: str, message: str) -> None:
+    # Deferred from request handlers (answers, likes)
+    crud.create_notification(db, user_id=user_id, title=title, message=message)
+    db.commit()
+
+
+@jobs.task("daily_sentence", max_attempts=3)
+def daily_sentence(db: Session) -> None:
+    featured.compute_daily_sentence(db)
+
+
+@jobs.task("retention", max_attempts=3, concurrency=1)
+def run_retention(db: Session) -> None:
+    retention.run_retention(db)
+
+
+@jobs.task("chat_archive", max_attempts=3, concurrency=1)
+def archive_chats(db: Session) -> None:
+    chat_archive.archive_inactive(db)
+
+
+@jobs.task("recompute_levels", max_attempts=3, concurrency=1)
+def recompute_levels(db: Session) -> None:
+    # Enqueued when site settings (the level curve) are edited
+    levels.recompute(db)
+
+
+jobs.schedule("daily_sentence", at=time(0, 5))
+jobs.schedule("retention", at=time(3, 15))
+jobs.schedule("chat_archive", at=time(3, 45))
@@ -0,0 +1,70 @@
+"""Move the history of idle chats into compressed archive segments.
+
+Usage (from backend/):
+    python scripts/archive_chats.py
+    python scripts/archive_chats.py --days 60 --segment-size 5000
+
+The app already runs this nightly at 03:45 UTC as the "chat_archive" job
+(app/tasks.py); use the script for one-off runs with other settings.
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app import models
+from app.database import SessionLocal
+from app.services import chat_archive
+
+
+def format_bytes(n: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def print_progress(report):
+    print(f"  {report.chats} chats, {report.messages} messages archived so far")
+
+
+def hot_rows(db) -> int:
+    return db.execute(select(func.count()).select_from(models.Message)).scalar() or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive messages of inactive chats")
+    parser.add_argument("--days", type=int, default=chat_archive.ARCHIVE_AFTER_DAYS,
+                        help="Archive chats idle for this many days")
+    parser.add_argument("--segment-size", type=int, default=chat_archive.ARCHIVE_SEGMENT_SIZE,
+                        help="Messages per compressed segment")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        before = hot_rows(db)
+        print(f"Archiving chats idle for {args.days} days ({chat_archive.default_codec()}), "
+              f"messages table: {before} rows")
+        report = chat_archive.archive_inactive(db, days=args.days, segment_size=args.segment_size,
+                                               progress=print_progress)
+        after = hot_rows(db)
+        print(f"  archived {report.messages} messages of {report.chats} chats into {report.segments} segments "
+              f"({report.elapsed:.1f}s)")
+        print(f"  messages table: {before} -> {after} rows, ~{format_bytes(report.hot_bytes_freed)} moved out")
+        print(f"  archive: {format_bytes(report.raw_bytes)} raw -> {format_bytes(report.stored_bytes)} stored "
+              f"({report.ratio:.1f}x)")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Recompute and store today's daily sentence (featured answer).
+
+The app runs this once per day at 00:05 UTC as the "daily_sentence" job
+(app/tasks.py); use the script to recompute by hand.
+
+Helpful marks keep the stored pick up to date during the day, so this only
+needs to seed the new period. Pass --date YYYY-MM-DD to recompute a past day.
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services import featured
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the daily sentence")
+    parser.add_argument("--date", type=date.fromisoformat, help="Day to compute (defaults to today, UTC)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        answer_id = featured.compute_daily_sentence(db, args.date)
+        if answer_id:
+            print(f"Daily sentence set to answer {answer_id}")
+        else:
+            print("No answers found; nothing to feature.")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Re-level every user against the current level curve.
+
+Run after changing the "level_curve" site setting, e.g. to:
+    [[0, "Beginner"], [100, "A1 Elementary"], [500, "A2 Pre-Intermediate"], ...]
+
+Usage (from backend/):
+    python scripts/recompute_levels.py
+    python scripts/recompute_levels.py --show
+
+Edits made through the admin panel enqueue the same recompute as a
+background job; this script is for changes made directly in the database.
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services import levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute user levels from the level curve")
+    parser.add_argument("--show", action="store_true", help="Only print the curve in effect")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        curve = levels.current(db, refresh=True)
+        for minimum, name in curve.levels:
+            print(f"  {minimum:>7} XP  {name}")
+        if not args.show:
+            changed = levels.recompute(db)
+            print(f"Re-leveled {changed} users")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Delete (or archive) expired notifications and chats in small batches.
+
+Usage (from backend/):
+    python scripts/run_retention.py --dry-run
+    python scripts/run_retention.py --policy read_notifications --batch-size 200
+    python scripts/run_retention.py --archive-dir ./archive
+
+The app already runs all policies nightly at 03:15 UTC as the "retention"
+job (app/tasks.py); use the script for dry runs and one-off overrides.
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services import retention
+
+
+def format_bytes(n: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def print_progress(report):
+    print(f"  [{report.policy}] batch {report.batches}: {report.total_rows} rows so far")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run data retention policies")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--policy", action="append", help="Run only the named policy (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=retention.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=retention.DEFAULT_BATCH_PAUSE,
+                        help="Seconds to sleep between batches")
+    parser.add_argument("--archive-dir", help="Append deleted rows as JSONL to this directory")
+    parser.add_argument("--notification-days", type=int, help="Override NOTIFICATION_RETENTION_DAYS")
+    parser.add_argument("--chat-days", type=int, help="Override CHAT_RETENTION_DAYS")
+    args = parser.parse_args()
+
+    policies = retention.default_policies()
+    for policy in policies:
+        if policy.name == "read_notifications" and args.notification_days is not None:
+            policy.days = args.notification_days
+        if policy.name == "terminated_chats" and args.chat_days is not None:
+            policy.days = args.chat_days
+    if args.policy:
+        unknown = set(args.policy) - {p.name for p in policies}
+        if unknown:
+            parser.error(f"Unknown policy: {', '.join(sorted(unknown))}")
+        policies = [p for p in policies if p.name in args.policy]
+
+    db = SessionLocal()
+    try:
+        for policy in policies:
+            mode = "DRY RUN" if args.dry_run else "RUN"
+            print(f"{mode} {policy.name} ({policy.description}), cutoff {policy.cutoff():%Y-%m-%d %H:%M}")
+            report = retention.run_policy(
+                db, policy,
+                dry_run=args.dry_run,
+                batch_size=args.batch_size,
+                pause=args.pause,
+                archive_dir=args.archive_dir,
+                progress=print_progress,
+            )
+            for table in report.tables.values():
+                print(f"  {table.table}: {table.rows} rows, ~{format_bytes(table.est_bytes)}")
+            verb = "would reclaim" if args.dry_run else "reclaimed"
+            print(f"  total: {report.total_rows} rows, {verb} ~{format_bytes(report.total_bytes)} "
+                  f"in {report.batches} batches ({report.elapsed:.1f}s)")
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
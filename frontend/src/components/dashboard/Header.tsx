@@ -25,21 +25,37 @@ export default function Header() {
         try {
             const res = await api.get("/notifications");
             setNotifications(res.data);
-            setUnreadCount(res.data.filter((n: any) => !n.is_read).length);
         } catch {
             console.error("Failed to fetch notifications");
         }
     };
 
+    // Cheap badge poll; the browser revalidates with the ETag and gets 304s while nothing changes
+    const fetchUnreadCount = async () => {
+        try {
+            const res = await api.get("/notifications/unread-count");
+            setUnreadCount(res.data.unread_count);
+        } catch {
+            console.error("Failed to fetch unread count");
+        }
+    };
+
     useEffect(() => {
         if (user) {
             fetchNotifications();
+            fetchUnreadCount();
             // Poll every 60 seconds
-            const interval = setInterval(fetchNotifications, 60000);
+            const interval = setInterval(fetchUnreadCount, 60000);
             return () => clearInterval(interval);
         }
     }, [user]);
 
+    useEffect(() => {
+        if (showNotifications) {
+            fetchNotifications();
+        }
+    }, [showNotifications]);
+
     const markRead = async (id: string, e: React.MouseEvent) => {
         e.stopPropagation();
         try {
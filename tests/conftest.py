@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# In-process tests run the backend against a throwaway SQLite database.
+# DATABASE_URL has to be set before app.database is imported.
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+_DB_DIR = tempfile.mkdtemp(prefix="lanxpert-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    from app import models  # noqa: F401  (registers the tables)
+    from app.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client(app_db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def db(app_db):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def make_user(db, username, **fields):
+    from app import models
+
+    user = models.User(username=username, email=f"{username}@example.com", password_hash="x", **fields)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def auth_headers(username):
+    from app import auth
+
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": username})}
+
+
+@pytest.fixture(scope="session")
+def admin_headers(app_db):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        make_user(session, "admin")
+    finally:
+        session.close()
+    return auth_headers("admin")
+
+
+@pytest.fixture
+def query_budget():
+    # with query_budget(5): client.get(...) fails if any request made inside
+    # the block runs more than 5 statements or repeats one statement shape
+    # (an N+1) at least max_repeats times.
+    from contextlib import contextmanager
+    from app import instrumentation
+
+    @contextmanager
+    def budget(max_queries, max_repeats=instrumentation.REPEAT_THRESHOLD):
+        requests = []
+        observer = lambda scope, stats: requests.append((scope["method"], scope["path"], stats))
+        instrumentation.observers.append(observer)
+        try:
+            yield requests
+        finally:
+            instrumentation.observers.remove(observer)
+
+        assert requests, "no request was made inside the query budget block"
+        for method, path, stats in requests:
+            assert stats.count <= max_queries, (
+                f"{method} {path} ran {stats.count} queries (budget {max_queries}):\n{stats.report()}"
+            )
+            assert not stats.repeated(max_repeats), (
+                f"{method} {path} repeats a statement (N+1):\n{stats.report()}"
+            )
+
+    return budget
@@ -0,0 +1,81 @@
+from sqlalchemy import func, select
+
+from conftest import make_user
+
+
+def _count(db, model, *criteria):
+    return db.execute(select(func.count()).select_from(model).where(*criteria)).scalar()
+
+
+def test_batch_ops_report_per_item_results(client, admin_headers, db):
+    from app import models
+
+    existing = make_user(db, "batch_target")
+    response = client.post(
+        "/api/v1/admin/generic/users/batch",
+        json={
+            "ops": [
+                {"op": "create", "data": {"username": "batch_new", "email": "batch_new@example.com", "xp": "5"}},
+                {"op": "update", "id": existing.id, "data": {"is_active": False, "unknown": 1}},
+                {"op": "delete", "id": "missing"},
+                # Duplicate username violates the unique index
+                {"op": "create", "data": {"username": "batch_target", "email": "dup@example.com"}},
+            ],
+            "chunk_size": 10,
+        },
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created", "updated", "not_found", "error"]
+    assert body["summary"] == {"created": 1, "updated": 1, "not_found": 1, "error": 1}
+
+    db.expire_all()
+    created = db.get(models.User, body["results"][0]["id"])
+    assert created.username == "batch_new" and created.xp == 5
+    assert db.get(models.User, existing.id).is_active is False
+
+    action = db.get(models.AdminAction, body["action_id"])
+    assert action.action == "batch create=1,update=1"
+    assert action.target_table == "users"
+
+
+def test_batch_filter_delete_runs_in_chunks(client, admin_headers, db):
+    from app import models
+
+    author = make_user(db, "spammer")
+    db.add_all(models.Question(user_id=author.id, question_text=f"spam {i}") for i in range(25))
+    db.add(models.Question(user_id=author.id, question_text="keep me"))
+    db.commit()
+
+    response = client.post(
+        "/api/v1/admin/generic/questions/batch",
+        json={"filter": [f"user_id:eq:{author.id}", "question_text:like:spam%"], "action": "delete", "chunk_size": 10},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["affected"] == 25
+    assert body["chunks"] == 3
+    assert _count(db, models.Question, models.Question.user_id == author.id) == 1
+
+
+def test_batch_filter_update(client, admin_headers, db):
+    from app import models
+
+    users = [make_user(db, f"bulk_deactivate_{i}") for i in range(7)]
+    response = client.post(
+        "/api/v1/admin/generic/users/batch",
+        json={"filter": ["username:like:bulk_deactivate_%"], "action": "update", "data": {"is_active": False}, "chunk_size": 3},
+        headers=admin_headers,
+    )
+    assert response.json()["affected"] == len(users)
+    assert _count(db, models.User, models.User.username.like("bulk_deactivate_%"), models.User.is_active.is_(True)) == 0
+
+
+def test_batch_rejects_ambiguous_requests(client, admin_headers):
+    url = "/api/v1/admin/generic/users/batch"
+    assert client.post(url, json={}, headers=admin_headers).status_code == 400
+    assert client.post(url, json={"filter": ["username:eq:x"]}, headers=admin_headers).status_code == 400
+    assert client.post(url, json={"ops": [{"op": "delete"}]}, headers=admin_headers).status_code == 400
@@ -0,0 +1,119 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+# Generic admin lists and dashboard counts: count modes, keyset pages over a
+# sort column with NULLs, field selection, and the background recount.
+
+
+@pytest.fixture
+def words(app_db, db):
+    from app import models
+
+    tag = f"w{uuid.uuid4().hex[:8]}"
+    levels = ["B1", None, "A1", None, "A1", "C1", None]
+    db.add_all([models.Word(word=f"{tag}-{i}", meaning="m", level=level) for i, level in enumerate(levels)])
+    db.commit()
+    return tag
+
+
+def _list(client, headers, resource="words", **params):
+    response = client.get(f"/api/v1/admin/generic/{resource}", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_count_modes(client, db, admin_headers, words):
+    from app import models
+    from app.services import table_stats
+
+    table_stats.invalidate(models.Word)
+    exact = db.query(models.Word).count()
+    assert _list(client, admin_headers, limit=1)["total"] == exact
+    assert table_stats.cached_count(models.Word)[0] == exact
+    # SQLite has no planner statistics: the estimate is the last exact count
+    assert _list(client, admin_headers, limit=1, count="estimate")["total"] == exact
+    assert _list(client, admin_headers, limit=1, count="none")["total"] is None
+
+    # Filtered lists are counted exactly, or not at all
+    word_filter = f"word:like:{words}-%"
+    assert _list(client, admin_headers, limit=1, filter=word_filter)["total"] == 7
+    assert _list(client, admin_headers, limit=1, filter=word_filter, count="estimate")["total"] is None
+    assert _list(client, admin_headers, limit=1, filter=word_filter, count="none")["total"] is None
+
+
+def test_exact_count_is_cached_and_refreshed_in_the_background(client, db, admin_headers, words, query_budget):
+    from app import models
+    from app.services import table_stats
+
+    table_stats.invalidate(models.Word)
+    first = _list(client, admin_headers, limit=1)
+    assert first["total"] == db.query(models.Word).count() and first["counted_at"]
+
+    # Fresh cached count: pages don't count again
+    db.add(models.Word(word=f"{words}-late", meaning="m"))
+    db.commit()
+    with query_budget(10) as requests:
+        assert _list(client, admin_headers, limit=1)["total"] == first["total"]
+    for _, _, stats in requests:
+        assert not any("count(*)" in sql.lower() for sql in stats.shapes), stats.report()
+
+    # Past the TTL the stale count is served and recounted after the response
+    stale_at = datetime.utcnow() - timedelta(seconds=table_stats.EXACT_COUNT_TTL + 60)
+    table_stats._exact_counts.set("words", (first["total"], stale_at))
+    assert _list(client, admin_headers, limit=1)["total"] == first["total"]
+    assert _list(client, admin_headers, limit=1)["total"] == first["total"] + 1
+
+    # Writes through the admin API drop the cached count
+    response = client.post("/api/v1/admin/generic/words", json={"word": f"{words}-admin", "meaning": "m"}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert _list(client, admin_headers, limit=1)["total"] == first["total"] + 2
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_keyset_pages_put_nulls_last(client, admin_headers, words, order):
+    params = {"sort_by": "level", "order": order, "filter": f"word:like:{words}-%", "fields": "word,level"}
+    everything = _list(client, admin_headers, limit=100, **params)["items"]
+    levels = [item["level"] for item in everything]
+    assert levels[-3:] == [None, None, None]
+    assert levels[:4] == sorted(levels[:4], reverse=order == "desc")
+
+    seen, cursor = [], None
+    while True:
+        body = _list(client, admin_headers, limit=2, **params, **({"cursor": cursor} if cursor else {}))
+        seen += body["items"]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == everything
+    assert set(everything[0]) == {"id", "word", "level"}
+
+
+def test_unknown_fields_are_rejected(client, admin_headers):
+    response = client.get("/api/v1/admin/generic/words", params={"fields": "word,secret"}, headers=admin_headers)
+    assert response.status_code == 400 and "secret" in response.json()["detail"]
+    response = client.get("/api/v1/admin/generic/words", params={"sort_by": "secret"}, headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_dashboard_serves_stale_counts_and_refreshes_them_after_the_response(client, db, admin_headers):
+    from app import models
+    from app.services import table_stats
+
+    tracked = {"users": models.User, "words": models.Word, "articles": models.Article, "questions": models.Question}
+    stale_at = datetime.utcnow() - timedelta(seconds=table_stats.EXACT_COUNT_TTL + 60)
+    for model in tracked.values():
+        table_stats._exact_counts.set(model.__tablename__, (-1, stale_at))
+
+    response = client.get("/api/v1/admin/dashboard-stats", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [body[key] for key in tracked] == [-1] * 4
+
+    # TestClient runs the response's BackgroundTasks before returning
+    for model in tracked.values():
+        count, counted_at = table_stats.cached_count(model)
+        assert count == db.query(model).count() and counted_at > stale_at
+    body = client.get("/api/v1/admin/dashboard-stats", headers=admin_headers).json()
+    assert body["words"] == db.query(models.Word).count()
@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Blocks are enforced on every message from the in-process block graph.
+
+
+@pytest.fixture
+def chat(app_db, db):
+    from app import models
+
+    suffix = uuid.uuid4().hex[:8]
+    users = [make_user(db, f"bg_{name}_{suffix}") for name in ("ann", "ben")]
+    chat = models.Chat(type="random")
+    db.add(chat)
+    db.flush()
+    db.add_all(models.ChatParticipant(chat_id=chat.id, user_id=u.id) for u in users)
+    db.commit()
+    return {"id": chat.id, "users": [(u.id, u.username) for u in users]}
+
+
+def _send(client, chat, username):
+    return client.post(f"/api/v1/chats/{chat['id']}/messages", json={"content": "hi"}, headers=auth_headers(username))
+
+
+def test_block_applies_to_existing_chat(client, chat):
+    (ann_id, ann), (ben_id, ben) = chat["users"]
+    assert _send(client, chat, ann).status_code == 200
+    assert _send(client, chat, ben).status_code == 200
+
+    client.post("/api/v1/chats/block", json={"user_id": ann_id}, headers=auth_headers(ben))
+    assert _send(client, chat, ann).status_code == 403
+    assert _send(client, chat, ben).status_code == 403
+
+
+def test_send_path_does_not_query_blocks(client, chat, query_budget):
+    _, (_, ben) = chat["users"]
+    _send(client, chat, ben)  # loads the graph entry
+    with query_budget(10) as requests:
+        assert _send(client, chat, ben).status_code == 200
+    assert not any("blocked_users" in sql for sql in requests[0][2].shapes)
+
+
+def test_admin_unblock_invalidates(client, db, chat, admin_headers):
+    from app import models
+
+    (ann_id, ann), (ben_id, ben) = chat["users"]
+    client.post("/api/v1/chats/block", json={"user_id": ben_id}, headers=auth_headers(ann))
+    assert _send(client, chat, ben).status_code == 403
+
+    block = db.query(models.BlockedUser).filter_by(blocker_id=ann_id, blocked_id=ben_id).one()
+    response = client.delete(f"/api/v1/admin/generic/blocked_users/{block.id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert _send(client, chat, ben).status_code == 200
@@ -0,0 +1,160 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Messages of idle chats move to compressed segments; reads span both tiers.
+
+
+@pytest.fixture
+def chat(app_db, db):
+    from app import models
+
+    suffix = uuid.uuid4().hex[:8]
+    users = [make_user(db, f"arc_{name}_{suffix}") for name in ("ada", "bo")]
+    old = datetime.utcnow() - timedelta(days=90)
+    chat = models.Chat(type="terminated", created_at=old, updated_at=old)
+    db.add(chat)
+    db.flush()
+    # Both have read everything: only read messages are archived
+    read_at = old + timedelta(seconds=24)
+    db.add_all(models.ChatParticipant(chat_id=chat.id, user_id=u.id, last_read_at=read_at) for u in users)
+    db.add_all(
+        models.Message(chat_id=chat.id, sender_id=users[i % 2].id, content=f"message {i} " + "lorem ipsum " * 5,
+                       created_at=old + timedelta(seconds=i))
+        for i in range(25)
+    )
+    db.commit()
+    return {"id": chat.id, "reader": users[1].username, "reader_id": users[1].id}
+
+
+def _contents(client, chat, **params):
+    response = client.get(f"/api/v1/chats/{chat['id']}/messages", params=params, headers=auth_headers(chat["reader"]))
+    assert response.status_code == 200
+    return [m["content"].split(" ")[1] for m in response.json()]
+
+
+def test_archive_moves_history_and_reads_stay_transparent(client, db, chat):
+    from app import models
+    from app.services import chat_archive
+
+    before = _contents(client, chat, limit=100)
+    report = chat_archive.archive_inactive(db, days=30, segment_size=10)
+
+    # Everything but the newest message
+    assert report.messages == 24 and report.segments == 3
+    assert report.stored_bytes < report.raw_bytes
+    assert db.query(models.Message).filter_by(chat_id=chat["id"]).count() == 1
+    assert db.get(models.Chat, chat["id"]).archived_messages == 24
+    # Nothing left to archive until newer messages go idle
+    assert chat["id"] not in chat_archive.inactive_chats(db, datetime.utcnow(), 100)
+
+    assert _contents(client, chat, limit=100) == before
+    assert _contents(client, chat, skip=8, limit=5) == before[8:13]
+
+    # New hot messages follow the archived history
+    db.add(models.Message(chat_id=chat["id"], content="message hot", created_at=datetime.utcnow()))
+    db.commit()
+    assert _contents(client, chat, skip=23, limit=5) == before[23:] + ["hot"]
+    assert _contents(client, chat, skip=25) == ["hot"]
+
+
+def test_inbox_keeps_last_message_of_archived_chat(client, db, chat):
+    from app.services import chat_archive
+
+    def last_message():
+        chats = client.get("/api/v1/chats/", headers=auth_headers(chat["reader"])).json()
+        return next(c for c in chats if c["id"] == chat["id"])["last_message"]
+
+    before = last_message()
+    chat_archive.archive_inactive(db, days=30, segment_size=10)
+    after = last_message()
+    assert after is not None and after == before
+    assert after["content"].startswith("message 24 ")
+
+
+def test_active_chats_are_left_alone(db, chat):
+    from app import models
+    from app.services import chat_archive
+
+    db.get(models.Chat, chat["id"]).updated_at = datetime.utcnow()
+    db.commit()
+    chat_archive.archive_inactive(db, days=30)
+    assert db.query(models.Message).filter_by(chat_id=chat["id"]).count() == 25
+    assert chat["id"] not in chat_archive.inactive_chats(db, datetime.utcnow() - timedelta(days=30), 100)
+
+
+def test_purging_a_chat_removes_its_archive(db, chat):
+    from app import models
+    from app.services import chat_archive, deletion
+
+    chat_archive.archive_inactive(db, days=30)
+    deletion.purge(db, models.Chat, [chat["id"]])
+    assert db.query(models.ArchivedChatSegment).filter_by(chat_id=chat["id"]).count() == 0
+
+
+def _unread(client, chat):
+    chats = client.get("/api/v1/chats/", headers=auth_headers(chat["reader"])).json()
+    return next(c for c in chats if c["id"] == chat["id"])["unread_count"]
+
+
+def test_unread_messages_stay_hot(client, db, chat):
+    from app import models
+    from app.services import chat_archive
+
+    participant = db.query(models.ChatParticipant).filter_by(chat_id=chat["id"], user_id=chat["reader_id"]).one()
+    participant.last_read_at -= timedelta(seconds=10)  # read up to message 14
+    db.commit()
+    before = _unread(client, chat)
+
+    report = chat_archive.archive_inactive(db, days=30, segment_size=10)
+    assert report.messages == 15
+    assert _unread(client, chat) == before
+    assert chat["id"] not in chat_archive.inactive_chats(db, datetime.utcnow(), 100)
+
+    # A participant who never read the chat keeps all of it hot
+    participant.last_read_at = None
+    db.commit()
+    db.add(models.Message(chat_id=chat["id"], content="message late", created_at=datetime.utcnow()))
+    db.commit()
+    assert chat_archive.archive_chat(db, chat["id"], chat_archive.ArchiveReport()) == 0
+
+
+def test_archived_message_can_be_marked_read(client, db, chat):
+    from app import models
+    from app.services import chat_archive
+
+    first = db.query(models.Message).filter_by(chat_id=chat["id"]).order_by(models.Message.created_at).first()
+    chat_archive.archive_inactive(db, days=30, segment_size=10)
+    assert db.get(models.Message, first.id) is None
+
+    url = f"/api/v1/chats/{chat['id']}/read"
+    headers = auth_headers(chat["reader"])
+    response = client.post(url, json={"message_id": first.id}, headers=headers)
+    assert response.status_code == 200, response.text
+    # Already read past it: the watermark does not move back
+    assert response.json()["last_read_at"].startswith((first.created_at + timedelta(seconds=24)).isoformat())
+    assert client.post(url, json={"message_id": "missing"}, headers=headers).status_code == 404
+
+
+def test_messages_sent_while_archiving_stay_hot(db, chat, monkeypatch):
+    from app import models
+    from app.services import chat_archive
+
+    encode = chat_archive._encode
+    late = []
+
+    def encode_then_send(rows):
+        # Another request sends (and reads) a message between two segments
+        if not late:
+            late.append(models.Message(chat_id=chat["id"], content="message late", created_at=datetime.utcnow()))
+            db.add(late[0])
+            db.query(models.ChatParticipant).filter_by(chat_id=chat["id"]).update({"last_read_at": datetime.utcnow()})
+        return encode(rows)
+
+    monkeypatch.setattr(chat_archive, "_encode", encode_then_send)
+    assert chat_archive.archive_chat(db, chat["id"], chat_archive.ArchiveReport(), segment_size=10) == 24
+    hot = db.query(models.Message.content).filter_by(chat_id=chat["id"]).all()
+    assert sorted(content.split(" ")[1] for content, in hot) == ["24", "late"]
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Read state is a per-participant watermark; unread counts are derived from it.
+
+
+@pytest.fixture(scope="module")
+def chat(app_db):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    alice, bob = make_user(db, "read_alice"), make_user(db, "read_bob")
+    chat = models.Chat(type="direct")
+    db.add(chat)
+    db.flush()
+    db.add_all([
+        models.ChatParticipant(chat_id=chat.id, user_id=alice.id),
+        models.ChatParticipant(chat_id=chat.id, user_id=bob.id),
+    ])
+    start = datetime(2026, 1, 1, 9, 0)
+    messages = [
+        models.Message(chat_id=chat.id, sender_id=alice.id if i % 2 else bob.id, content=str(i),
+                       created_at=start + timedelta(minutes=i))
+        for i in range(10)
+    ]
+    db.add_all(messages)
+    db.commit()
+    result = {"id": chat.id, "messages": [m.id for m in messages]}
+    db.close()
+    return result
+
+
+def _unread(client, username):
+    return client.get("/api/v1/chats/", headers=auth_headers(username)).json()[0]["unread_count"]
+
+
+def test_unread_counts_and_watermark(client, chat):
+    headers = auth_headers("read_alice")
+    # Own messages are never unread: bob sent the even ones
+    assert _unread(client, "read_alice") == 5
+    assert _unread(client, "read_bob") == 5
+
+    response = client.post(f"/api/v1/chats/{chat['id']}/read", json={"message_id": chat["messages"][3]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["last_read_message_id"] == chat["messages"][3]
+    assert _unread(client, "read_alice") == 3
+
+    # Watermark never moves backwards
+    client.post(f"/api/v1/chats/{chat['id']}/read", json={"message_id": chat["messages"][1]}, headers=headers)
+    assert _unread(client, "read_alice") == 3
+
+    response = client.post(f"/api/v1/chats/{chat['id']}/read", headers=headers)
+    assert response.json()["last_read_message_id"] == chat["messages"][-1]
+    assert _unread(client, "read_alice") == 0
+    assert _unread(client, "read_bob") == 5
+
+
+def test_read_requires_participant(client, db, chat):
+    make_user(db, "read_stranger")
+    response = client.post(f"/api/v1/chats/{chat['id']}/read", headers=auth_headers("read_stranger"))
+    assert response.status_code == 403
+    response = client.post(f"/api/v1/chats/{chat['id']}/read", json={"message_id": "missing"}, headers=auth_headers("read_bob"))
+    assert response.status_code == 404
+
+
+def test_mark_read_is_constant_queries(client, chat, query_budget):
+    with query_budget(5):
+        client.post(f"/api/v1/chats/{chat['id']}/read", headers=auth_headers("read_bob"))
@@ -0,0 +1,101 @@
+from sqlalchemy import func, select
+
+from conftest import auth_headers, make_user
+
+
+def _count(db, model, *criteria):
+    return db.execute(select(func.count()).select_from(model).where(*criteria)).scalar()
+
+
+def _question_with_dependents(db, models, author, reader):
+    question = models.Question(user_id=author.id, question_text="to delete")
+    db.add(question)
+    db.flush()
+    answers = [models.Answer(question_id=question.id, user_id=author.id, answer_text=f"a{i}") for i in range(3)]
+    db.add_all(answers)
+    db.flush()
+    for answer in answers:
+        db.add_all([
+            models.AnswerVote(answer_id=answer.id, user_id=reader.id, vote_type=True),
+            models.AnswerReport(answer_id=answer.id, user_id=reader.id, reason="spam"),
+            models.AnswerHelpful(answer_id=answer.id, user_id=reader.id),
+            models.UserSavedContent(user_id=reader.id, content_type="answer", content_id=answer.id),
+        ])
+    db.add(models.UserSavedContent(user_id=reader.id, content_type="question", content_id=question.id))
+    db.add(models.ContentModeration(content_type="question", content_id=question.id, status="pending"))
+    db.commit()
+    return question.id, [a.id for a in answers]
+
+
+def test_purge_removes_every_dependent(db):
+    from app import models
+    from app.services import deletion
+
+    author, reader = make_user(db, "del_author"), make_user(db, "del_reader")
+    question_id, answer_ids = _question_with_dependents(db, models, author, reader)
+    other_id, _ = _question_with_dependents(db, models, author, reader)
+
+    counts = deletion.purge(db, models.Question, [question_id], chunk_size=2)
+    assert counts == {
+        "questions": 1,
+        "answers": 3,
+        "answer_votes": 3,
+        "answer_reports": 3,
+        "answer_helpful": 3,
+        "user_saved_content": 4,
+        "content_moderation": 1,
+    }
+    assert _count(db, models.Answer, models.Answer.question_id == question_id) == 0
+    assert _count(db, models.AnswerVote, models.AnswerVote.answer_id.in_(answer_ids)) == 0
+    assert _count(db, models.UserSavedContent, models.UserSavedContent.content_id == question_id) == 0
+    # Unrelated content is untouched
+    assert _count(db, models.Answer, models.Answer.question_id == other_id) == 3
+
+
+def test_admin_delete_question_soft_and_hard(client, admin_headers, db):
+    from app import models
+
+    author, reader = make_user(db, "del_author2"), make_user(db, "del_reader2")
+    question_id, _ = _question_with_dependents(db, models, author, reader)
+
+    response = client.delete(f"/api/v1/admin/questions/{question_id}", params={"soft": True}, headers=admin_headers)
+    assert response.json() == {"status": "soft_deleted", "rows": 1}
+    listed = client.get("/api/v1/questions/", params={"user_id": author.id}).json()
+    assert question_id not in [q["id"] for q in listed]
+    assert _count(db, models.Answer, models.Answer.question_id == question_id) == 3
+
+    response = client.delete(f"/api/v1/admin/questions/{question_id}", headers=admin_headers)
+    assert response.json()["status"] == "deleted"
+    assert _count(db, models.Question, models.Question.id == question_id) == 0
+    assert client.delete(f"/api/v1/admin/questions/{question_id}", headers=admin_headers).status_code == 404
+
+
+def test_large_cascade_runs_in_background(client, admin_headers, db, monkeypatch):
+    from app import models
+    from app.services import deletion
+
+    monkeypatch.setattr(deletion, "BACKGROUND_THRESHOLD", 2)
+    author, reader = make_user(db, "del_author3"), make_user(db, "del_reader3")
+    question_id, _ = _question_with_dependents(db, models, author, reader)
+
+    # TestClient runs background tasks before returning the response
+    response = client.delete(f"/api/v1/admin/questions/{question_id}", headers=admin_headers)
+    assert response.json() == {"status": "scheduled"}
+    assert _count(db, models.Question, models.Question.id == question_id) == 0
+
+
+def test_author_deletes_liked_article(client, db):
+    from app import models
+
+    author, reader = make_user(db, "art_author"), make_user(db, "art_reader")
+    article = models.Article(user_id=author.id, title="t", content="c")
+    db.add(article)
+    db.flush()
+    db.add(models.ArticleLike(article_id=article.id, user_id=reader.id))
+    db.add(models.UserSavedContent(user_id=reader.id, content_type="article", content_id=article.id))
+    db.commit()
+
+    assert client.delete(f"/api/v1/articles/{article.id}", headers=auth_headers("art_reader")).status_code == 403
+    assert client.delete(f"/api/v1/articles/{article.id}", headers=auth_headers("art_author")).status_code == 200
+    assert _count(db, models.ArticleLike, models.ArticleLike.article_id == article.id) == 0
+    assert _count(db, models.UserSavedContent, models.UserSavedContent.content_id == article.id) == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Direct chats are keyed by the canonical (low, high) user id pair.
+
+
+@pytest.fixture(scope="module")
+def pair(app_db):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    plan = models.Plan(name="direct-chat-plan")
+    db.add(plan)
+    db.commit()
+    users = {name: make_user(db, name, plan_id=plan.id).id for name in ("dc_alice", "dc_bob", "dc_carol")}
+    db.close()
+    return users
+
+
+def _create(client, username, target_id):
+    return client.post("/api/v1/chats/direct", json={"type": "direct", "target_user_id": target_id}, headers=auth_headers(username))
+
+
+def test_direct_chat_is_reused_from_either_side(client, db, pair):
+    from app import models
+
+    first = _create(client, "dc_alice", pair["dc_bob"])
+    assert first.status_code == 200
+    again = _create(client, "dc_bob", pair["dc_alice"])
+    assert again.json()["id"] == first.json()["id"]
+    assert {p["user"]["id"] for p in first.json()["participants"]} == {pair["dc_alice"], pair["dc_bob"]}
+
+    chat = db.get(models.Chat, first.json()["id"])
+    assert (chat.user_low_id, chat.user_high_id) == tuple(sorted((pair["dc_alice"], pair["dc_bob"])))
+    assert db.query(models.ChatParticipant).filter_by(chat_id=chat.id).count() == 2
+
+
+def test_pair_key_is_unique(db, pair):
+    from app import crud
+
+    first = crud.get_or_create_direct_chat(db, pair["dc_carol"], pair["dc_bob"])
+    assert crud.get_or_create_direct_chat(db, pair["dc_bob"], pair["dc_carol"]) == first
+
+
+def test_blocked_pair_cannot_start_chat(client, pair):
+    headers = auth_headers("dc_carol")
+    assert client.post("/api/v1/chats/block", json={"user_id": pair["dc_alice"]}, headers=headers).json() == {"status": "blocked"}
+    assert client.post("/api/v1/chats/block", json={"user_id": pair["dc_alice"]}, headers=headers).json() == {"status": "already_blocked"}
+
+    assert _create(client, "dc_alice", pair["dc_carol"]).status_code == 403
+    assert _create(client, "dc_carol", pair["dc_alice"]).status_code == 403
+
+
+def test_lookup_query_budget(client, pair, query_budget):
+    _create(client, "dc_alice", pair["dc_bob"])
+    with query_budget(6):
+        assert _create(client, "dc_alice", pair["dc_bob"]).status_code == 200
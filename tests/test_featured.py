@@ -0,0 +1,180 @@
+import importlib.util
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import make_user
+
+# Daily sentence: the stored pick in featured_content, the read cache, day
+# boundaries and the manual script. Days far in the past keep each test's
+# featured_content row to itself.
+
+
+@pytest.fixture
+def featured(app_db):
+    from app.services import featured
+
+    featured._daily_cache.invalidate()
+    yield featured
+    featured._daily_cache.invalidate()
+
+
+@pytest.fixture
+def answers(db):
+    from app import models
+
+    user = make_user(db, f"featured_{uuid.uuid4().hex[:8]}")
+    question = models.Question(user_id=user.id, question_text="Best phrase?")
+    db.add(question)
+    db.commit()
+    rows = [models.Answer(user_id=user.id, question_id=question.id, answer_text=f"answer {i}") for i in range(2)]
+    db.add_all(rows)
+    db.commit()
+    return user, rows
+
+
+def _mark(db, answer, at):
+    from app import models
+
+    marker = make_user(db, f"marker_{uuid.uuid4().hex[:8]}")
+    db.add(models.AnswerHelpful(answer_id=answer.id, user_id=marker.id, created_at=at))
+    db.commit()
+
+
+def _stored(db, day):
+    from app import models
+
+    return db.query(models.FeaturedContent).filter_by(kind="daily_sentence", period=day).one_or_none()
+
+
+@pytest.fixture
+def frozen_now(featured, monkeypatch):
+    # featured.datetime.utcnow() returns now[0]
+    now = [datetime(2001, 5, 1, 12, 0)]
+
+    class Frozen(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now[0]
+
+    monkeypatch.setattr(featured, "datetime", Frozen)
+    return now
+
+
+def test_marks_count_for_the_day_they_were_made(db, featured, answers):
+    _, (first, second) = answers
+    day = date(2001, 1, 2)
+    _mark(db, first, datetime(2001, 1, 1, 23, 59, 59))
+    _mark(db, first, datetime(2001, 1, 1, 23, 59, 59))
+    _mark(db, second, datetime(2001, 1, 2, 0, 0))
+
+    assert featured.compute_daily_sentence(db, day) == second.id
+    stored = _stored(db, day)
+    assert (stored.content_type, stored.content_id, stored.score) == ("answer", second.id, 1)
+
+    # The next day has no marks of its own: yesterday's top answer, scored 0
+    assert featured.compute_daily_sentence(db, day + timedelta(days=1)) == second.id
+    assert _stored(db, day + timedelta(days=1)).score == 0
+
+    # Recomputing replaces the day's row instead of adding one
+    assert featured.compute_daily_sentence(db, day) == second.id
+    assert _stored(db, day).id == stored.id
+
+
+def test_reads_are_cached_per_day(db, featured, answers, frozen_now, monkeypatch):
+    _, (first, second) = answers
+    picks = {date(2001, 5, 1): first.id, date(2001, 5, 2): second.id}
+    calls = []
+
+    def pick(db, day):
+        calls.append(day)
+        return picks[day], 0
+
+    monkeypatch.setattr(featured, "pick_daily_sentence", pick)
+    assert featured.get_daily_sentence(db)["id"] == first.id
+    assert featured.get_daily_sentence(db)["id"] == first.id
+    assert calls == [date(2001, 5, 1)]
+
+    # First read after midnight UTC computes the new day
+    frozen_now[0] = datetime(2001, 5, 2, 0, 0, 1)
+    assert featured.get_daily_sentence(db)["id"] == second.id
+    assert calls == [date(2001, 5, 1), date(2001, 5, 2)]
+    assert _stored(db, date(2001, 5, 2)).content_id == second.id
+
+
+def test_day_without_a_pick_is_cached(db, featured, answers, frozen_now, monkeypatch):
+    _, (first, _) = answers
+    picks = {}
+    calls = []
+
+    def pick(db, day):
+        calls.append(day)
+        return picks.get(day), 0
+
+    frozen_now[0] = datetime(2001, 6, 1, 8, 0)
+    monkeypatch.setattr(featured, "pick_daily_sentence", pick)
+    assert featured.get_daily_sentence(db) is None
+    assert featured.get_daily_sentence(db) is None
+    assert calls == [date(2001, 6, 1)]
+    assert _stored(db, date(2001, 6, 1)) is None
+
+    # A pick stored later (the job, a helpful mark) replaces the sentinel
+    picks[date(2001, 6, 1)] = first.id
+    featured.compute_daily_sentence(db, date(2001, 6, 1))
+    assert featured.get_daily_sentence(db)["id"] == first.id
+
+    # The sentinel only covers its own day
+    frozen_now[0] = datetime(2001, 6, 2, 8, 0)
+    assert featured.get_daily_sentence(db) is None
+    assert calls[-1] == date(2001, 6, 2)
+
+
+def test_helpful_mark_drops_the_cached_pick_after_commit(db, featured, answers, frozen_now):
+    from app import models
+
+    _, (first, second) = answers
+    day = date(2001, 8, 1)
+    frozen_now[0] = datetime(2001, 8, 1, 9, 0)
+    _mark(db, first, datetime(2001, 8, 1, 8, 0))
+    featured.compute_daily_sentence(db, day)
+    assert featured.get_daily_sentence(db)["id"] == first.id
+
+    markers = [make_user(db, f"marker_{uuid.uuid4().hex[:8]}") for _ in range(2)]
+    db.add_all(models.AnswerHelpful(answer_id=second.id, user_id=m.id, created_at=datetime(2001, 8, 1, 8, 30))
+               for m in markers)
+    db.flush()
+    featured.record_helpful_mark(db, second.id)
+    # Not committed yet: other sessions still read the old pick, and may cache it
+    assert featured._daily_cache.get(day)["id"] == first.id
+    db.commit()
+    assert featured._daily_cache.get(day) is None
+    assert featured.get_daily_sentence(db)["id"] == second.id
+
+    # A rolled back promotion leaves the cache alone
+    db.add_all(models.AnswerHelpful(answer_id=first.id, user_id=m.id, created_at=datetime(2001, 8, 1, 8, 45))
+               for m in markers)
+    db.flush()
+    featured.record_helpful_mark(db, first.id)
+    assert db.info[featured._STALE_DAYS] == {day}
+    db.rollback()
+    db.commit()
+    assert featured._daily_cache.get(day)["id"] == second.id
+
+
+def test_script_computes_the_given_day(db, answers, monkeypatch, capsys):
+    _, (first, _) = answers
+    _mark(db, first, datetime(2001, 7, 4, 10, 0))
+
+    path = os.path.join(os.path.dirname(__file__), "..", "backend", "scripts", "compute_daily_sentence.py")
+    spec = importlib.util.spec_from_file_location("compute_daily_sentence", path)
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+
+    monkeypatch.setattr(sys, "argv", ["compute_daily_sentence.py", "--date", "2001-07-04"])
+    script.main()
+    assert f"answer {first.id}" in capsys.readouterr().out
+    db.expire_all()
+    assert _stored(db, date(2001, 7, 4)).content_id == first.id
@@ -0,0 +1,178 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Background jobs: deferred work, retries, schedules and the admin view. The
+# runner threads only start with the app lifespan, so tests drive the runner
+# with jobs.run_pending().
+
+
+@pytest.fixture
+def flaky_task():
+    from app.services import jobs
+
+    name = f"flaky_{uuid.uuid4().hex[:8]}"
+    calls = []
+
+    @jobs.task(name, max_attempts=2)
+    def flaky(db, value):
+        calls.append(value)
+        raise RuntimeError("boom")
+
+    yield name, calls
+    jobs._tasks.pop(name, None)
+
+
+def _make_due(db, job_id):
+    from app import models
+
+    db.query(models.Job).filter_by(id=job_id).update({"run_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def _answer(client, db):
+    from app import models
+
+    suffix = uuid.uuid4().hex[:8]
+    asker = make_user(db, f"asker_{suffix}")
+    answerer = make_user(db, f"answerer_{suffix}")
+    question = models.Question(user_id=asker.id, question_text="How do you say hello?")
+    db.add(question)
+    db.commit()
+
+    response = client.post(
+        "/api/v1/answers/",
+        json={"answer_text": "Merhaba", "question_id": question.id},
+        headers=auth_headers(answerer.username),
+    )
+    assert response.status_code == 200, response.text
+    return asker
+
+
+def test_answer_notification_is_deferred(client, db, monkeypatch):
+    from app import models
+    from app.services import jobs
+
+    monkeypatch.setattr(jobs, "runner_active", lambda: True)
+    asker = _answer(client, db)
+    assert db.query(models.Notification).filter_by(user_id=asker.id).count() == 0
+    assert db.query(models.Job).filter_by(name="notify", status="queued").count() >= 1
+
+    jobs.run_pending(db)
+    notification = db.query(models.Notification).filter_by(user_id=asker.id).one()
+    assert notification.title == "New Answer"
+    assert db.query(models.NotificationCounter).filter_by(user_id=asker.id).one().unread_count == 1
+
+
+def test_notification_is_written_inline_without_a_runner(client, db):
+    from app import models
+    from app.services import jobs
+
+    # The test client skips the lifespan, so no runner is started
+    assert not jobs.runner_active()
+    asker = _answer(client, db)
+    assert db.query(models.Notification).filter_by(user_id=asker.id).one().title == "New Answer"
+    assert db.query(models.NotificationCounter).filter_by(user_id=asker.id).one().unread_count == 1
+
+
+def test_failed_job_backs_off_then_fails(db, flaky_task):
+    from app import models
+    from app.services import jobs
+
+    name, calls = flaky_task
+    jobs.enqueue(db, name, {"value": 7})
+    db.commit()
+    job = db.query(models.Job).filter_by(name=name).one()
+
+    jobs.run_pending(db)
+    db.refresh(job)
+    assert calls == [7]
+    assert job.status == "queued" and job.attempts == 1
+    assert job.run_at > datetime.utcnow() and "boom" in job.last_error
+
+    # Not due yet: nothing runs
+    jobs.run_pending(db)
+    assert calls == [7]
+
+    _make_due(db, job.id)
+    jobs.run_pending(db)
+    db.refresh(job)
+    assert calls == [7, 7]
+    assert job.status == "failed" and job.attempts == 2 and job.finished_at is not None
+
+
+def test_backoff_grows_and_is_capped():
+    from app.services import jobs
+
+    assert jobs.backoff(1) <= jobs.BACKOFF_BASE
+    assert jobs.backoff(3) >= jobs.BACKOFF_BASE * 2
+    assert jobs.backoff(50) <= jobs.BACKOFF_MAX
+
+
+def test_schedule_enqueues_once_per_period(db, flaky_task):
+    from app import models
+    from app.services import jobs
+
+    name, _ = flaky_task
+    jobs.schedule(name, every=3600)
+    try:
+        now = datetime.utcnow()
+        jobs.enqueue_scheduled(db, now)
+        # Another process (no memory of the slot) enqueues the same period
+        jobs._last_slot.pop(name)
+        jobs.enqueue_scheduled(db, now)
+        assert db.query(models.Job).filter_by(name=name).count() == 1
+
+        jobs.enqueue_scheduled(db, now + timedelta(hours=1))
+        assert db.query(models.Job).filter_by(name=name).count() == 2
+    finally:
+        jobs._schedules.pop(name, None)
+        jobs._last_slot.pop(name, None)
+
+
+def test_expired_lease_is_requeued(db, flaky_task):
+    from app import models
+    from app.services import jobs
+
+    name, _ = flaky_task
+    job = models.Job(
+        name=name, status="running", attempts=1, max_attempts=2, run_at=datetime.utcnow(),
+        locked_by="gone:1", locked_at=datetime.utcnow() - timedelta(seconds=jobs.LEASE + 60),
+    )
+    db.add(job)
+    db.commit()
+
+    assert jobs.requeue_expired(db) >= 1
+    db.refresh(job)
+    assert job.status == "queued" and job.locked_by is None
+
+
+def test_admin_jobs_view_and_retry(client, db, admin_headers, flaky_task):
+    from app import models
+    from app.services import jobs
+
+    name, _ = flaky_task
+    jobs.enqueue(db, name, {"value": 1})
+    db.commit()
+    job = db.query(models.Job).filter_by(name=name).one()
+    for _ in range(2):
+        _make_due(db, job.id)
+        jobs.run_pending(db)
+
+    response = client.get("/api/v1/admin/jobs", params={"status": "failed", "name": name}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["counts"][name] == {"failed": 1}
+    assert [j["id"] for j in body["jobs"]] == [job.id]
+    assert "daily_sentence" in {s["task"] for s in body["schedules"]}
+
+    response = client.post(f"/api/v1/admin/jobs/{job.id}/retry", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    db.refresh(job)
+    assert job.status == "queued" and job.attempts == 0
+
+    assert client.post(f"/api/v1/admin/jobs/{job.id}/retry", headers=admin_headers).status_code == 400
+    assert client.post("/api/v1/admin/jobs/missing/retry", headers=admin_headers).status_code == 404
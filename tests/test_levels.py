@@ -0,0 +1,152 @@
+import json
+import uuid
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Level curve: bisect lookups, the site setting, and re-leveling users.
+
+
+@pytest.fixture
+def curve_setting(app_db, db):
+    from app import models
+    from app.services import levels
+
+    yield
+    db.query(models.SiteSetting).filter_by(key=levels.SETTING_KEY).delete()
+    db.commit()
+    levels.invalidate()
+
+
+def test_default_curve_lookups():
+    from app.services import levels
+
+    curve = levels.LevelCurve(levels.DEFAULT_CURVE)
+    assert curve.level_for(0) == "Beginner"
+    assert curve.level_for(99) == "Beginner"
+    assert curve.level_for(100) == "A1 Elementary"
+    assert curve.level_for(10_000) == "C1 Advanced"
+    assert curve.next_threshold(150) == 500
+    assert curve.next_threshold(10_000) is None
+    assert curve.progress(300) == 50
+    assert curve.progress(10_000) == 100
+
+
+def test_invalid_curves_are_rejected():
+    from app.services import levels
+
+    with pytest.raises(ValueError):
+        levels.LevelCurve([(10, "A"), (20, "B")])
+    with pytest.raises(ValueError):
+        levels.LevelCurve([(0, "A"), (50, "B"), (50, "C")])
+
+
+def test_curve_change_relevels_users_in_one_update(client, db, admin_headers, curve_setting):
+    from app import models
+    from app.services import jobs, levels
+
+    suffix = uuid.uuid4().hex[:8]
+    novice = make_user(db, f"lvl_novice_{suffix}", xp=50, current_level="Beginner")
+    expert = make_user(db, f"lvl_expert_{suffix}", xp=3000, current_level="B2 Upper-Intermediate")
+
+    curve = [[0, "Seed"], [40, "Sprout"], [2500, "Tree"]]
+    response = client.post(
+        "/api/v1/admin/generic/site_settings",
+        json={"key": levels.SETTING_KEY, "value": json.dumps(curve)},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+
+    jobs.run_pending(db)
+    db.refresh(novice)
+    db.refresh(expert)
+    assert (novice.current_level, expert.current_level) == ("Sprout", "Tree")
+    assert db.query(models.Job).filter_by(name="recompute_levels", status="done").count() >= 1
+
+    # Nothing left to change
+    assert levels.recompute(db) == 0
+
+    body = client.get("/api/v1/stats/overview", headers=auth_headers(novice.username)).json()
+    assert body["level"] == "Sprout" and body["next_level_goal"] == 2500
+
+
+def test_curve_change_schedules_a_second_pass_after_the_cache_ttl(client, db, admin_headers, curve_setting):
+    from datetime import datetime, timedelta
+    from app import models
+    from app.services import levels
+
+    db.query(models.Job).filter_by(name="recompute_levels", status="queued").delete()
+    db.commit()
+    response = client.post(
+        "/api/v1/admin/generic/site_settings",
+        json={"key": levels.SETTING_KEY, "value": json.dumps([[0, "Seed"], [10, "Sprout"]])},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+
+    run_at = sorted(j.run_at for j in db.query(models.Job).filter_by(name="recompute_levels", status="queued"))
+    assert len(run_at) == 2
+    assert run_at[1] - run_at[0] >= timedelta(seconds=levels.LEVEL_CURVE_TTL)
+    assert run_at[0] <= datetime.utcnow()
+
+
+def test_only_curve_writes_relevel(client, db, admin_headers, curve_setting):
+    from app import models
+    from app.services import levels
+
+    def queued():
+        return db.query(models.Job).filter_by(name="recompute_levels", status="queued").count()
+
+    db.query(models.Job).filter_by(name="recompute_levels", status="queued").delete()
+    db.commit()
+    url = "/api/v1/admin/generic/site_settings"
+    key = f"motd_{uuid.uuid4().hex[:8]}"
+    assert client.post(url, json={"key": key, "value": "hi"}, headers=admin_headers).status_code == 200
+    assert client.put(f"{url}/{key}", json={"value": "hello"}, headers=admin_headers).status_code == 200
+    response = client.post(
+        f"{url}/batch", json={"filter": [f"key:eq:{key}"], "action": "update", "data": {"value": "hey"}}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert client.delete(f"{url}/{key}", headers=admin_headers).status_code == 200
+    assert queued() == 0
+
+    curve = json.dumps([[0, "Seed"], [10, "Sprout"]])
+    response = client.post(
+        f"{url}/batch", json={"ops": [{"op": "create", "data": {"key": levels.SETTING_KEY, "value": curve}}]}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert queued() == 2
+    assert client.delete(f"{url}/{levels.SETTING_KEY}", headers=admin_headers).status_code == 200
+    assert queued() == 4
+
+
+@pytest.mark.parametrize("value", ["not json", json.dumps([[10, "A"]]), json.dumps([[0, "A"], [0, "B"]]), json.dumps({"a": 1})])
+def test_invalid_curve_setting_is_rejected(client, db, admin_headers, curve_setting, value):
+    from app import models
+    from app.services import levels
+
+    url = "/api/v1/admin/generic/site_settings"
+    response = client.post(url, json={"key": levels.SETTING_KEY, "value": value}, headers=admin_headers)
+    assert response.status_code == 400, response.text
+    assert db.get(models.SiteSetting, levels.SETTING_KEY) is None
+
+    good = json.dumps([[0, "Seed"], [10, "Sprout"]])
+    assert client.post(url, json={"key": levels.SETTING_KEY, "value": good}, headers=admin_headers).status_code == 200
+    response = client.put(f"{url}/{levels.SETTING_KEY}", json={"value": value}, headers=admin_headers)
+    assert response.status_code == 400, response.text
+
+    response = client.post(
+        f"{url}/batch",
+        json={"ops": [{"op": "update", "id": levels.SETTING_KEY, "data": {"value": value}}]},
+        headers=admin_headers,
+    )
+    assert response.status_code == 400, response.text
+    response = client.post(
+        f"{url}/batch",
+        json={"filter": [f"key:eq:{levels.SETTING_KEY}"], "action": "update", "data": {"value": value}},
+        headers=admin_headers,
+    )
+    assert response.status_code == 400, response.text
+    db.expire_all()
+    assert db.get(models.SiteSetting, levels.SETTING_KEY).value == good
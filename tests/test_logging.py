@@ -0,0 +1,80 @@
+import json
+import logging
+
+
+def test_json_formatter_includes_extras_and_request_id():
+    from app import logging_config
+
+    logger = logging.getLogger("tests.logging")
+    record = logger.makeRecord(
+        logger.name, logging.ERROR, __file__, 1, "chat %s failed", ("c1",), None, extra={"user_id": "u1"}
+    )
+    record.request_id = "req-1"
+    payload = json.loads(logging_config.JsonFormatter().format(record))
+    assert payload["message"] == "chat c1 failed"
+    assert payload["level"] == "ERROR"
+    assert payload["user_id"] == "u1"
+    assert payload["request_id"] == "req-1"
+
+
+def test_debug_records_are_sampled_per_call_site():
+    from app import logging_config
+
+    sampler = logging_config.SamplingFilter(every=10)
+
+    def record(level, lineno):
+        return logging.LogRecord("x", level, __file__, lineno, "m", (), None)
+
+    kept = [sampler.filter(record(logging.DEBUG, 1)) for _ in range(25)]
+    assert sum(kept) == 3
+    # Another call site has its own counter; INFO and above always pass
+    assert sampler.filter(record(logging.DEBUG, 2))
+    assert all(sampler.filter(record(logging.INFO, 1)) for _ in range(5))
+
+
+def test_queue_handler_writes_from_background_thread(tmp_path, monkeypatch):
+    from app import logging_config
+
+    log_file = tmp_path / "app.log"
+    monkeypatch.setenv("LOG_FILE", str(log_file))
+    root = logging.getLogger()
+    previous = (list(root.handlers), root.level)
+    logging_config.setup_logging()
+    try:
+        token = logging_config.request_id_var.set("req-42")
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.getLogger("tests.logging").exception("boom", extra={"user_id": "u9"})
+        logging_config.request_id_var.reset(token)
+    finally:
+        logging_config.shutdown_logging()
+        root.handlers[:] = previous[0]
+        root.setLevel(previous[1])
+
+    payload = json.loads(log_file.read_text().strip().splitlines()[-1])
+    assert payload["message"] == "boom"
+    assert payload["request_id"] == "req-42"
+    assert payload["user_id"] == "u9"
+    assert "ZeroDivisionError" in payload["exc_info"]
+
+
+def test_request_id_header(client):
+    response = client.get("/", headers={"X-Request-ID": "abc123"})
+    assert response.headers["x-request-id"] == "abc123"
+    assert len(client.get("/").headers["x-request-id"]) == 32
+
+
+def test_verification_token_is_not_logged(client, app_db, db, caplog):
+    import uuid
+
+    from conftest import auth_headers, make_user
+
+    user = make_user(db, f"verify_{uuid.uuid4().hex[:8]}")
+    with caplog.at_level(logging.INFO, logger="app.routers.users"):
+        response = client.post("/api/v1/users/verify-email/send", headers=auth_headers(user.username))
+    assert response.status_code == 200, response.text
+    token = response.json()["dev_token"]
+    records = [r for r in caplog.records if r.getMessage() == "Verification email sent"]
+    assert records and records[0].user_id == user.id
+    assert not any(token in json.dumps(vars(r), default=str) for r in caplog.records)
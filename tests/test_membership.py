@@ -0,0 +1,115 @@
+import uuid
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Chat endpoints authorize from the membership cache.
+
+
+@pytest.fixture
+def chat(app_db, db):
+    from app import models
+
+    suffix = uuid.uuid4().hex[:8]
+    users = [make_user(db, f"mem_{name}_{suffix}") for name in ("cy", "di", "ed")]
+    chat = models.Chat(type="random")
+    db.add(chat)
+    db.flush()
+    db.add_all(models.ChatParticipant(chat_id=chat.id, user_id=u.id) for u in users[:2])
+    db.add(models.Message(chat_id=chat.id, sender_id=users[0].id, content="hi"))
+    db.commit()
+    return {"id": chat.id, "users": [(u.id, u.username) for u in users]}
+
+
+def _messages(client, chat, username):
+    return client.get(f"/api/v1/chats/{chat['id']}/messages", headers=auth_headers(username))
+
+
+def test_authorization_is_a_cache_lookup(client, chat, query_budget):
+    _, (_, di), _ = chat["users"]
+    assert _messages(client, chat, di).status_code == 200
+    with query_budget(10) as requests:
+        assert _messages(client, chat, di).status_code == 200
+        client.post(f"/api/v1/chats/{chat['id']}/messages", json={"content": "x"}, headers=auth_headers(di))
+    for _, _, stats in requests:
+        assert not any("FROM chat_participants" in sql for sql in stats.shapes), stats.report()
+
+
+def test_participant_added_elsewhere_is_not_refused(client, db, chat):
+    from app import models
+
+    _, _, (ed_id, ed) = chat["users"]
+    assert _messages(client, chat, ed).status_code == 403
+    # e.g. matched by another worker: this worker's cache has not seen it
+    db.add(models.ChatParticipant(chat_id=chat["id"], user_id=ed_id))
+    db.commit()
+    assert _messages(client, chat, ed).status_code == 200
+
+
+def test_inbox_lists_chats_joined_elsewhere(client, db, chat):
+    from app import models
+    from app.services import membership
+
+    _, _, (ed_id, ed) = chat["users"]
+    assert client.get("/api/v1/chats/", headers=auth_headers(ed)).json() == []
+    assert membership.user_chat_ids(db, ed_id) == set()
+    # Joined through another worker: this worker's cache still says no chats
+    db.add(models.ChatParticipant(chat_id=chat["id"], user_id=ed_id))
+    db.commit()
+    assert [c["id"] for c in client.get("/api/v1/chats/", headers=auth_headers(ed)).json()] == [chat["id"]]
+
+
+def test_leaving_invalidates(client, chat):
+    (_, cy), (_, di), _ = chat["users"]
+    assert [c["id"] for c in client.get("/api/v1/chats/", headers=auth_headers(cy)).json()] == [chat["id"]]
+
+    assert client.delete(f"/api/v1/chats/{chat['id']}", headers=auth_headers(cy)).json() == {"status": "chat_left"}
+    assert client.get("/api/v1/chats/", headers=auth_headers(cy)).json() == []
+    assert _messages(client, chat, cy).status_code == 403
+
+    response = client.post(f"/api/v1/chats/{chat['id']}/messages", json={"content": "x"}, headers=auth_headers(di))
+    assert response.status_code == 403  # terminated
+    assert client.delete(f"/api/v1/chats/{chat['id']}", headers=auth_headers(di)).json() == {"status": "chat_deleted"}
+    assert client.get("/api/v1/chats/", headers=auth_headers(di)).json() == []
+
+
+def test_purges_invalidate_the_cache(db, chat):
+    from app import models
+    from app.services import deletion, membership
+
+    (cy_id, _), (di_id, _), _ = chat["users"]
+    assert membership.user_chat_ids(db, di_id) == {chat["id"]}
+    assert membership.chat_members(db, chat["id"]).user_ids == {cy_id, di_id}
+
+    # Deleting a user removes their participant rows
+    deletion.purge(db, models.User, [cy_id])
+    assert membership.cached_user_chat_ids(cy_id) is None
+    assert membership.chat_members(db, chat["id"]).user_ids == {di_id}
+
+    deletion.purge(db, models.Chat, [chat["id"]])
+    assert membership.cached_user_chat_ids(di_id) is None
+    assert membership.chat_members(db, chat["id"]) is None
+
+
+def test_retention_invalidates_the_cache(db, chat):
+    import dataclasses
+    from datetime import datetime, timedelta
+
+    from app import models
+    from app.services import membership, retention
+
+    (cy_id, _), _, _ = chat["users"]
+    db.query(models.Chat).filter_by(id=chat["id"]).update({
+        "type": "terminated", "updated_at": datetime.utcnow() - timedelta(days=365),
+    })
+    db.commit()
+    assert membership.chat_members(db, chat["id"], refresh=True).type == "terminated"
+    assert membership.user_chat_ids(db, cy_id) == {chat["id"]}
+
+    policy = next(p for p in retention.default_policies() if p.name == "terminated_chats")
+    criterion = policy.criterion
+    policy = dataclasses.replace(policy, criterion=lambda cutoff: criterion(cutoff) & (models.Chat.id == chat["id"]))
+    retention.run_policy(db, policy, pause=0)
+    assert membership.cached_user_chat_ids(cy_id) is None
+    assert membership.chat_members(db, chat["id"]) is None
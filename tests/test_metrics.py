@@ -0,0 +1,54 @@
+import re
+
+
+def _sample(text, name, **labels):
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    series = f"{name}{{{wanted}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_exposition(client):
+    route = "/api/v1/questions/"
+    before = _sample(client.get("/metrics").text, "http_requests_total", method="GET", route=route, status="200") or 0
+
+    client.get(route)
+    client.get(route)
+    client.get("/api/v1/does-not-exist")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    assert _sample(text, "http_requests_total", method="GET", route=route, status="200") == before + 2
+    assert _sample(text, "http_requests_total", method="GET", route="<unmatched>", status="404") >= 1
+    assert _sample(text, "http_request_duration_seconds_bucket", method="GET", route=route, le="+Inf") >= 2
+    assert _sample(text, "http_response_size_bytes_count", method="GET", route=route) >= 2
+    # The /metrics request itself is in flight while rendering
+    assert _sample(text, "http_requests_in_flight") == 1
+    assert "# TYPE db_pool_connections gauge" in text
+    assert re.search(r'^cache_hit_ratio\{cache="daily_sentence"\} ', text, re.M)
+
+
+def test_route_templates_keep_ids_out_of_labels(client, admin_headers):
+    client.get("/api/v1/admin/generic/users/some-id", headers=admin_headers)
+    text = client.get("/metrics").text
+    assert 'route="/api/v1/admin/generic/{resource}/{id}"' in text
+    assert "some-id" not in text
+
+
+def test_histogram_buckets_are_cumulative():
+    from app import metrics
+
+    histogram = metrics.Histogram("test_histogram_seconds", "test", ("kind",), buckets=(0.1, 1.0))
+    metrics._registry.remove(histogram)
+    child = histogram.labels("a")
+    for value in (0.05, 0.5, 0.7, 3.0):
+        child.observe(value)
+    assert histogram.render().splitlines()[2:] == [
+        'test_histogram_seconds_bucket{kind="a",le="0.1"} 1',
+        'test_histogram_seconds_bucket{kind="a",le="1.0"} 3',
+        'test_histogram_seconds_bucket{kind="a",le="+Inf"} 4',
+        'test_histogram_seconds_sum{kind="a"} 4.25',
+        'test_histogram_seconds_count{kind="a"} 4',
+    ]
@@ -0,0 +1,133 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Notifications: the maintained unread counter, its ETag and cursor pages.
+
+
+@pytest.fixture
+def user(app_db, db):
+    return make_user(db, f"notified_{uuid.uuid4().hex[:8]}")
+
+
+def _notify(db, user, count, created_at=None):
+    from app import crud
+
+    notifications = [crud.create_notification(db, user.id, "Hello", f"message {i}") for i in range(count)]
+    db.commit()
+    if created_at is not None:
+        for notification in notifications:
+            notification.created_at = created_at
+        db.commit()
+    return notifications
+
+
+def _unread(client, user):
+    response = client.get("/api/v1/notifications/unread-count", headers=auth_headers(user.username))
+    assert response.status_code == 200, response.text
+    return response.json()["unread_count"]
+
+
+def test_counter_follows_creates_and_reads(client, db, user):
+    headers = auth_headers(user.username)
+    assert _unread(client, user) == 0
+
+    first, *_ = _notify(db, user, 3)
+    assert _unread(client, user) == 3
+
+    assert client.put(f"/api/v1/notifications/{first.id}/read", headers=headers).status_code == 200
+    assert _unread(client, user) == 2
+    # Reading it again does not count twice
+    assert client.put(f"/api/v1/notifications/{first.id}/read", headers=headers).status_code == 200
+    assert _unread(client, user) == 2
+
+    assert client.post("/api/v1/notifications/read-all", headers=headers).status_code == 200
+    assert _unread(client, user) == 0
+    assert client.post("/api/v1/notifications/read-all", headers=headers).status_code == 200
+    assert _unread(client, user) == 0
+
+    _notify(db, user, 1)
+    assert _unread(client, user) == 1
+
+
+def test_unread_count_etag(client, db, user):
+    from app import models
+
+    headers = auth_headers(user.username)
+    _notify(db, user, 2)
+    url = "/api/v1/notifications/unread-count"
+
+    response = client.get(url, headers=headers)
+    counter = db.query(models.NotificationCounter).filter_by(user_id=user.id).one()
+    etag = response.headers["ETag"]
+    assert etag == f'W/"{counter.version}-2"'
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag and not response.content
+
+    _notify(db, user, 1)
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json() == {"unread_count": 3}
+    assert response.headers["ETag"] != etag
+
+
+def test_writes_that_bypass_crud_resync_the_counter(client, db, admin_headers, user):
+    from app import models
+    from app.services import deletion
+
+    url = "/api/v1/notifications/unread-count"
+    headers = auth_headers(user.username)
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    admin_url = "/api/v1/admin/generic/notifications"
+    created = client.post(admin_url, json={"user_id": user.id, "title": "t", "message": "m"}, headers=admin_headers)
+    assert created.status_code == 200, created.text
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json() == {"unread_count": 1}
+    etag = response.headers["ETag"]
+
+    batch = {"ops": [{"op": "create", "data": {"user_id": user.id, "title": "t", "message": f"m{i}"}} for i in range(2)]}
+    assert client.post(f"{admin_url}/batch", json=batch, headers=admin_headers).status_code == 200
+    assert _unread(client, user) == 3
+
+    notification_id = created.json()["id"]
+    update = client.put(f"{admin_url}/{notification_id}", json={"is_read": True}, headers=admin_headers)
+    assert update.status_code == 200
+    assert _unread(client, user) == 2
+    assert client.delete(f"{admin_url}/{notification_id}", headers=admin_headers).status_code == 200
+    assert _unread(client, user) == 2
+
+    others = db.query(models.Notification.id).filter_by(user_id=user.id).all()
+    deletion.purge(db, models.Notification, [others[0].id])
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200 and response.json() == {"unread_count": 1}
+
+
+@pytest.mark.parametrize("unread_only", [False, True])
+def test_cursor_pages_neither_overlap_nor_skip(client, db, user, unread_only):
+    headers = auth_headers(user.username)
+    # Ties on created_at are broken by id
+    tied = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5)
+    _notify(db, user, 4, created_at=tied)
+    _notify(db, user, 3, created_at=tied - timedelta(minutes=1))
+    _notify(db, user, 4)
+    params = {"unread_only": unread_only}
+
+    everything = client.get("/api/v1/notifications/", params={**params, "limit": 100}, headers=headers).json()
+    assert len(everything) == 11
+
+    seen, cursor = [], None
+    while True:
+        page_params = {**params, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/notifications/", params=page_params, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += [n["id"] for n in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [n["id"] for n in everything]
+
+    assert client.get("/api/v1/notifications/", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Random chat queue: only waiters with a recent heartbeat are matched.
+
+
+def _age_queues(db, **filters):
+    from app import models
+
+    old = datetime.utcnow() - timedelta(hours=1)
+    db.query(models.Chat).filter_by(type="random_queue", **filters).update(
+        {"created_at": old, "updated_at": old}, synchronize_session=False
+    )
+    db.commit()
+
+
+@pytest.fixture
+def users(app_db, db):
+    from app.services import presence
+
+    # Start from an empty queue
+    _age_queues(db)
+    presence.sweep(db)
+    suffix = uuid.uuid4().hex[:8]
+    return [
+        make_user(db, f"rq_{i}_{suffix}", native_language_id="en", target_language_id="tr").username
+        for i in range(3)
+    ]
+
+
+def _join(client, username):
+    response = client.post("/api/v1/chats/random", headers=auth_headers(username))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_live_waiters_are_matched(client, users):
+    queued = _join(client, users[0])
+    assert queued["type"] == "random_queue"
+    assert _join(client, users[0])["id"] == queued["id"]  # still waiting, same entry
+
+    matched = _join(client, users[1])
+    assert matched["id"] == queued["id"] and matched["type"] == "random"
+    assert len(matched["participants"]) == 2
+
+
+def test_abandoned_queues_are_skipped_and_collected(client, db, users):
+    from app import models
+    from app.services import presence
+
+    abandoned = _join(client, users[0])
+    _age_queues(db, id=abandoned["id"])
+
+    # Not matched with the dead entry: a new queue is opened instead
+    assert _join(client, users[1])["id"] != abandoned["id"]
+
+    assert presence.sweep(db) == 1
+    assert db.get(models.Chat, abandoned["id"]) is None
+    assert db.query(models.ChatParticipant).filter_by(chat_id=abandoned["id"]).count() == 0
+    assert client.get("/api/v1/chats/", headers=auth_headers(users[0])).json() == []
+
+
+def test_heartbeat_keeps_entry_alive(client, db, users, monkeypatch):
+    from app import models
+    from app.services import presence
+
+    queued = _join(client, users[0])
+    _age_queues(db, id=queued["id"])
+    monkeypatch.setattr(presence, "PERSIST_EVERY", 0)
+
+    body = client.post("/api/v1/chats/random/heartbeat", headers=auth_headers(users[0])).json()
+    assert body["status"] == "waiting" and body["chat_id"] == queued["id"]
+    assert presence.sweep(db) == 0
+    assert _join(client, users[1])["id"] == queued["id"]
+
+    body = client.post("/api/v1/chats/random/heartbeat", headers=auth_headers(users[2])).json()
+    assert body == {"status": "not_waiting"}
+
+
+def test_chat_page_polls_keep_entry_alive(client, db, users, monkeypatch):
+    from app.services import presence
+
+    # What the chat page does: POST /chats/random once, then poll the inbox
+    # and the open chat's messages; it never calls the heartbeat endpoint
+    queued = _join(client, users[0])
+    monkeypatch.setattr(presence, "PERSIST_EVERY", 0)
+
+    for poll in ("/api/v1/chats/", f"/api/v1/chats/{queued['id']}/messages"):
+        _age_queues(db, id=queued["id"])
+        assert client.get(poll, headers=auth_headers(users[0])).status_code == 200
+        assert presence.sweep(db) == 0
+        assert queued["id"] in {q.chat_id for q in presence.live_queues(db)}
+
+    assert _join(client, users[1])["id"] == queued["id"]
+
+
+def test_queue_can_only_be_claimed_once(client, db, users):
+    from app.services import presence
+
+    queued = _join(client, users[0])
+    assert presence.claim(db, queued["id"]) is True
+    assert presence.claim(db, queued["id"]) is False
+    db.commit()
@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import auth_headers, make_user
+
+# Statement budgets for hot endpoints. Each budget is independent of the number
+# of rows returned, so an N+1 regression fails here instead of in production.
+# Users are batch-loaded in three statements (users, roles, plans).
+
+
+@pytest.fixture(scope="module")
+def seeded(app_db):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    users = [make_user(db, f"budget_{i}") for i in range(6)]
+    owner = users[0]
+    for other in users[1:]:
+        chat = models.Chat(type="direct")
+        db.add(chat)
+        db.flush()
+        db.add_all([
+            models.ChatParticipant(chat_id=chat.id, user_id=owner.id),
+            models.ChatParticipant(chat_id=chat.id, user_id=other.id),
+            models.Message(chat_id=chat.id, sender_id=other.id, content="hi"),
+            models.Message(chat_id=chat.id, sender_id=owner.id, content="hello"),
+        ])
+        question = models.Question(user_id=other.id, question_text=f"budget q {other.username}")
+        db.add(question)
+        db.flush()
+        db.add_all(models.Answer(question_id=question.id, user_id=u.id, answer_text="a") for u in users[:3])
+        db.add(models.Article(user_id=other.id, title="budget", content="c", language_id="en"))
+        db.add(models.Notification(user_id=owner.id, title="t", message="m"))
+    db.commit()
+    result = {"owner": owner.username, "owner_id": owner.id, "chat": chat.id}
+    db.close()
+    return result
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/api/v1/questions/", 5),
+    ("/api/v1/articles/", 5),
+])
+def test_public_list_budgets(client, query_budget, seeded, path, budget):
+    with query_budget(budget):
+        assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize("path, budget", [
+    ("/api/v1/chats/", 7),
+    ("/api/v1/notifications/", 2),
+    ("/api/v1/notifications/unread-count", 2),
+    ("/api/v1/features/saved", 2),
+])
+def test_authenticated_list_budgets(client, query_budget, seeded, path, budget):
+    with query_budget(budget):
+        assert client.get(path, headers=auth_headers(seeded["owner"])).status_code == 200
+
+
+def test_messages_budget(client, query_budget, seeded):
+    with query_budget(6):
+        response = client.get(f"/api/v1/chats/{seeded['chat']}/messages", headers=auth_headers(seeded["owner"]))
+    assert response.status_code == 200
+
+
+def test_instrumentation_headers(client, seeded):
+    response = client.get("/api/v1/questions/")
+    assert int(response.headers["x-db-queries"]) >= 1
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+
+def test_repeated_statements_are_flagged():
+    from app import instrumentation
+
+    stats = instrumentation.QueryStats()
+    for _ in range(instrumentation.REPEAT_THRESHOLD):
+        stats.record("SELECT * FROM users WHERE id = ?", 0.001)
+    stats.record("SELECT 1", 0.001)
+    assert stats.repeated() == [("SELECT * FROM users WHERE id = ?", instrumentation.REPEAT_THRESHOLD)]
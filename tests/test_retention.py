@@ -0,0 +1,134 @@
+import dataclasses
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_user
+
+# Retention policies: only eligible rows go, in batches of the configured
+# size, and dry runs only report. The default criteria are narrowed to the
+# rows each test creates, since the database is shared.
+
+
+def _policy(name, narrow):
+    from app.services import retention
+
+    policy = next(p for p in retention.default_policies() if p.name == name)
+    criterion = policy.criterion
+    return dataclasses.replace(policy, criterion=lambda cutoff: criterion(cutoff) & narrow)
+
+
+@pytest.fixture
+def user(app_db, db):
+    return make_user(db, f"retained_{uuid.uuid4().hex[:8]}")
+
+
+@pytest.fixture
+def notifications(db, user):
+    from app import models
+
+    old = datetime.utcnow() - timedelta(days=120)
+    recent = datetime.utcnow() - timedelta(days=10)
+    rows = {
+        "old_read": [models.Notification(user_id=user.id, title="t", message="m", is_read=True, created_at=old) for _ in range(5)],
+        "old_unread": [models.Notification(user_id=user.id, title="t", message="m", is_read=False, created_at=old) for _ in range(2)],
+        "recent_read": [models.Notification(user_id=user.id, title="t", message="m", is_read=True, created_at=recent) for _ in range(2)],
+    }
+    db.add_all([n for group in rows.values() for n in group])
+    db.commit()
+    return {group: {n.id for n in items} for group, items in rows.items()}
+
+
+@pytest.fixture
+def chats(db, user):
+    from app import models
+
+    old = datetime.utcnow() - timedelta(days=365)
+    chats = {
+        "old_terminated": models.Chat(type="terminated", created_at=old, updated_at=old),
+        "old_active": models.Chat(type="direct", created_at=old, updated_at=old),
+        "recent_terminated": models.Chat(type="terminated"),
+    }
+    db.add_all(chats.values())
+    db.commit()
+    for chat in chats.values():
+        db.add(models.ChatParticipant(chat_id=chat.id, user_id=user.id))
+        db.add_all([models.Message(chat_id=chat.id, sender_id=user.id, content=f"m{i}") for i in range(3)])
+    db.add(models.ArchivedChatSegment(
+        chat_id=chats["old_terminated"].id, seq=0, message_count=1, codec="zlib", raw_bytes=1, data=b"x",
+    ))
+    db.commit()
+    return {name: chat.id for name, chat in chats.items()}
+
+
+def _remaining(db, model, ids):
+    return {row.id for row in db.query(model.id).filter(model.id.in_(ids))}
+
+
+def test_read_notifications_policy(db, user, notifications, tmp_path):
+    from app import models
+    from app.services import retention
+
+    policy = _policy("read_notifications", models.Notification.user_id == user.id)
+    report = retention.run_policy(db, policy, batch_size=2, pause=0, archive_dir=str(tmp_path))
+
+    assert report.total_rows == 5 and report.tables["notifications"].rows == 5
+    assert report.batches == 3  # 2 + 2 + 1
+    every = set().union(*notifications.values())
+    assert _remaining(db, models.Notification, every) == notifications["old_unread"] | notifications["recent_read"]
+
+    archived = [json.loads(line) for name in os.listdir(tmp_path) for line in open(tmp_path / name)]
+    assert {row["id"] for row in archived} == notifications["old_read"]
+
+
+def test_batches_never_exceed_batch_size(db, user, notifications):
+    from app import models
+    from app.services import retention
+
+    sizes = []
+    progress = lambda report: sizes.append(report.total_rows - sum(sizes))
+    policy = _policy("read_notifications", models.Notification.user_id == user.id)
+    retention.run_policy(db, policy, batch_size=2, pause=0, progress=progress)
+    assert sizes == [2, 2, 1]
+
+
+def test_terminated_chats_policy(db, chats):
+    from app import models
+    from app.services import retention
+
+    policy = _policy("terminated_chats", models.Chat.id.in_(chats.values()))
+    report = retention.run_policy(db, policy, batch_size=2, pause=0)
+
+    gone = chats["old_terminated"]
+    assert _remaining(db, models.Chat, chats.values()) == {chats["old_active"], chats["recent_terminated"]}
+    for model in (models.Message, models.ChatParticipant, models.ArchivedChatSegment):
+        assert db.query(model).filter(model.chat_id == gone).count() == 0
+    assert db.query(models.Message).filter(models.Message.chat_id.in_(chats.values())).count() == 6
+    assert {t: r.rows for t, r in report.tables.items()} == {
+        "messages": 3, "archived_chat_segments": 1, "chat_participants": 1, "chats": 1,
+    }
+    # Three messages in batches of two, then a segment, a participant and the chat
+    assert report.batches == 5
+
+
+def test_dry_run_leaves_data_untouched(db, user, notifications, chats):
+    from app import models
+    from app.services import retention
+
+    policies = [
+        _policy("read_notifications", models.Notification.user_id == user.id),
+        _policy("terminated_chats", models.Chat.id.in_(chats.values())),
+    ]
+    notification_report, chat_report = retention.run_retention(db, policies, dry_run=True, batch_size=2, pause=0)
+
+    assert notification_report.dry_run and notification_report.total_rows == 5
+    assert chat_report.tables["messages"].rows == 3 and chat_report.tables["chats"].rows == 1
+    assert notification_report.batches == chat_report.batches == 0
+
+    every = set().union(*notifications.values())
+    assert _remaining(db, models.Notification, every) == every
+    assert _remaining(db, models.Chat, chats.values()) == set(chats.values())
+    assert db.query(models.Message).filter(models.Message.chat_id.in_(chats.values())).count() == 9
@@ -0,0 +1,93 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# GET /features/saved: the response shape per content type (as served before
+# the single-query read model), saved rows whose content is gone, and keyset
+# pages.
+
+
+@pytest.fixture
+def saver(app_db, db):
+    return make_user(db, f"saver_{uuid.uuid4().hex[:8]}")
+
+
+@pytest.fixture
+def content(db, saver):
+    from app import models
+
+    author = make_user(db, f"saved_author_{uuid.uuid4().hex[:8]}")
+    question = models.Question(user_id=author.id, question_text="Ser or estar?", description="For moods")
+    orphan_question = models.Question(user_id="deleted-user", question_text="Whose is this?")
+    article = models.Article(user_id=author.id, title="Gendered nouns", content="...")
+    word = models.Word(word="gato", meaning="cat", level="A1")
+    gone_article = models.Article(user_id=author.id, title="Removed", content="...")
+    db.add_all([question, orphan_question, article, word, gone_article])
+    db.commit()
+    return author, question, orphan_question, article, word, gone_article
+
+
+def _save(db, user, content_type, content_id, created_at):
+    from app import models
+
+    row = models.UserSavedContent(user_id=user.id, content_type=content_type, content_id=content_id, created_at=created_at)
+    db.add(row)
+    db.commit()
+    return row.id
+
+
+def test_details_per_content_type(client, db, saver, content):
+    author, question, orphan_question, article, word, gone_article = content
+    now = datetime.utcnow().replace(microsecond=0)
+    ids = {
+        "question": _save(db, saver, "question", question.id, now - timedelta(minutes=1)),
+        "orphan": _save(db, saver, "question", orphan_question.id, now - timedelta(minutes=2)),
+        "article": _save(db, saver, "article", article.id, now - timedelta(minutes=3)),
+        "word": _save(db, saver, "word", word.id, now - timedelta(minutes=4)),
+        "gone": _save(db, saver, "article", gone_article.id, now - timedelta(minutes=5)),
+        "missing": _save(db, saver, "question", "never-existed", now - timedelta(minutes=6)),
+    }
+    db.delete(gone_article)
+    db.commit()
+
+    response = client.get("/api/v1/features/saved", headers=auth_headers(saver.username))
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [item["id"] for item in body] == list(ids.values())
+    assert set(body[0]) == {"id", "content_type", "content_id", "created_at", "details"}
+
+    details = {item["id"]: item["details"] for item in body}
+    assert details[ids["question"]] == {"text": "Ser or estar?", "description": "For moods", "author": author.username}
+    assert details[ids["orphan"]] == {"text": "Whose is this?", "description": None, "author": "Unknown"}
+    assert details[ids["article"]] == {"title": "Gendered nouns", "author": author.username}
+    assert details[ids["word"]] == {"word": "gato", "meaning": "cat", "level": "A1"}
+    # Saved rows whose content was deleted stay listed, without details
+    assert details[ids["gone"]] == {} and details[ids["missing"]] == {}
+
+    articles = client.get("/api/v1/features/saved", params={"content_type": "article"}, headers=auth_headers(saver.username)).json()
+    assert [item["id"] for item in articles] == [ids["article"], ids["gone"]]
+
+
+def test_keyset_pages(client, db, saver):
+    # Rows sharing a created_at are ordered by id
+    tied = datetime.utcnow().replace(microsecond=0)
+    for i in range(7):
+        _save(db, saver, ["question", "article", "word"][i % 3], f"{i}-{uuid.uuid4().hex}", tied - timedelta(minutes=i // 3))
+
+    headers = auth_headers(saver.username)
+    everything = [item["id"] for item in client.get("/api/v1/features/saved", headers=headers).json()]
+    assert len(everything) == 7
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/features/saved", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == everything
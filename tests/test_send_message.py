@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from conftest import auth_headers, make_user
+
+# The send path: one membership query, INSERT ... RETURNING and two updates
+# in a single transaction.
+
+
+@pytest.fixture(scope="module")
+def chat(app_db):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    users = [make_user(db, f"send_{name}") for name in ("sam", "kim")]
+    chat = models.Chat(type="random")
+    db.add(chat)
+    db.flush()
+    db.add_all(models.ChatParticipant(chat_id=chat.id, user_id=u.id) for u in users)
+    db.commit()
+    result = {"id": chat.id, "sender": users[0].id}
+    db.close()
+    return result
+
+
+def _send(client, chat, content="hello", username="send_sam"):
+    return client.post(f"/api/v1/chats/{chat['id']}/messages", json={"content": content}, headers=auth_headers(username))
+
+
+def test_send_returns_message_and_moves_pointers(client, db, chat):
+    from app import models
+
+    response = _send(client, chat)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["content"] == "hello" and body["sender"]["id"] == chat["sender"] and body["is_read"] is False
+
+    message = db.get(models.Message, body["id"])
+    assert db.get(models.Chat, chat["id"]).updated_at == message.created_at
+    sender = db.query(models.ChatParticipant).filter_by(chat_id=chat["id"], user_id=chat["sender"]).one()
+    assert sender.last_read_message_id == message.id
+
+    unread = client.get("/api/v1/chats/", headers=auth_headers("send_kim")).json()[0]["unread_count"]
+    assert unread >= 1
+    assert client.get("/api/v1/chats/", headers=auth_headers("send_sam")).json()[0]["unread_count"] == 0
+
+
+def test_send_rejects_outsiders_and_missing_chats(client, db, chat):
+    make_user(db, "send_outsider")
+    assert _send(client, chat, username="send_outsider").status_code == 403
+    assert _send(client, {"id": "missing"}).status_code == 404
+
+
+def test_send_query_budget(client, chat, query_budget):
+    # auth 1, membership 1, insert + 2 updates, sender payload 3 (user, roles, plan)
+    with query_budget(8):
+        assert _send(client, chat).status_code == 200
+
+
+def test_send_throughput(client, chat, capsys):
+    count = 300
+    start = time.perf_counter()
+    for i in range(count):
+        assert _send(client, chat, f"bench {i}").status_code == 200
+    rate = count / (time.perf_counter() - start)
+    with capsys.disabled():
+        print(f"\nsend_message: {rate:.0f} messages/sec (one worker, in-process client)")
+    assert rate > 0
@@ -0,0 +1,166 @@
+import time
+from datetime import datetime
+from typing import List
+
+import orjson
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy.orm import joinedload
+
+from conftest import auth_headers, make_user
+
+# Parity between the lean serializers (app/serialization.py) and the response
+# schemas they replace, plus a per-row cost comparison of the two paths.
+
+
+def _schema_json(schema, objects):
+    # What FastAPI produced for response_model=List[schema]
+    adapter = TypeAdapter(List[schema])
+    return orjson.loads(adapter.dump_json(adapter.validate_python(objects, from_attributes=True)))
+
+
+def _sort_answers(questions):
+    for q in questions:
+        q["answers"].sort(key=lambda a: a["id"])
+    return questions
+
+
+@pytest.fixture(scope="module")
+def content(app_db):
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    plan = models.Plan(name="SerPro", price=9.99)
+    role = models.Role(name="ser_moderator")
+    db.add_all([plan, role])
+    db.flush()
+    author = make_user(db, "ser_author", plan_id=plan.id)
+    reader = make_user(db, "ser_reader")
+    db.add(models.UserRole(user_id=author.id, role_id=role.id))
+
+    question = models.Question(user_id=author.id, question_text="How do I say hi?", description="casual")
+    db.add(question)
+    db.flush()
+    db.add_all([
+        models.Answer(question_id=question.id, user_id=reader.id, answer_text="Hey", helpful_count=2, context_tags="Daily"),
+        models.Answer(question_id=question.id, user_id=author.id, answer_text="Hello"),
+    ])
+    db.add(models.Question(user_id=reader.id, question_text="Unanswered"))
+
+    article = models.Article(user_id=author.id, title="Greetings", content="...", language_id="en", like_count=1)
+    db.add(article)
+    db.flush()
+    db.add(models.ArticleLike(article_id=article.id, user_id=reader.id))
+    db.add(models.UserSavedContent(user_id=reader.id, content_type="article", content_id=article.id))
+
+    chat = models.Chat(type="direct")
+    db.add(chat)
+    db.flush()
+    db.add_all([
+        models.ChatParticipant(chat_id=chat.id, user_id=author.id),
+        models.ChatParticipant(chat_id=chat.id, user_id=reader.id),
+    ])
+    # Explicit timestamps so "last message" is unambiguous
+    db.add_all([
+        models.Message(chat_id=chat.id, sender_id=author.id, content="first", created_at=datetime(2026, 1, 1, 9, 0)),
+        models.Message(chat_id=chat.id, sender_id=reader.id, content="second", created_at=datetime(2026, 1, 1, 9, 5)),
+    ])
+    db.add(models.Notification(user_id=reader.id, title="Liked", message="Your answer was liked"))
+    db.commit()
+
+    ids = {"author": author.id, "reader": reader.id, "chat": chat.id, "article": article.id}
+    db.close()
+    return ids
+
+
+def test_questions_parity(client, db, content):
+    from app import models, schemas
+
+    response = client.get("/api/v1/questions/", params={"user_id": content["author"]})
+    expected = db.query(models.Question).filter(models.Question.user_id == content["author"]).options(
+        joinedload(models.Question.user), joinedload(models.Question.answers).joinedload(models.Answer.user)
+    ).order_by(models.Question.created_at.desc()).all()
+
+    body = response.json()
+    assert body[0]["user"]["plan"]["name"] == "SerPro"
+    assert body[0]["user"]["roles"] == [{"role": {"name": "ser_moderator", "id": body[0]["user"]["roles"][0]["role"]["id"]}}]
+    assert _sort_answers(body) == _sort_answers(_schema_json(schemas.QuestionOut, expected))
+
+
+def test_articles_parity(client, db, content):
+    from app import models, schemas
+
+    response = client.get(
+        "/api/v1/articles/", params={"user_id": content["author"], "current_user_id": content["reader"]}
+    )
+    article = db.get(models.Article, content["article"])
+    article.like_count, article.is_liked, article.is_saved = 1, True, True
+    assert response.json() == _schema_json(schemas.ArticleOut, [article])
+
+
+def test_chats_and_messages_parity(client, db, content):
+    from app import models, schemas
+
+    headers = auth_headers("ser_reader")
+    chat = db.get(models.Chat, content["chat"])
+    messages = db.query(models.Message).filter(models.Message.chat_id == chat.id).order_by(models.Message.created_at).all()
+
+    response = client.get(f"/api/v1/chats/{chat.id}/messages", headers=headers)
+    assert response.json() == _schema_json(schemas.MessageOut, messages)
+
+    expected = schemas.ChatOut.model_validate(chat)
+    expected.last_message = schemas.MessageOut.model_validate(messages[-1])
+    expected.unread_count = 1  # "first", from the author
+    body = client.get("/api/v1/chats/", headers=headers).json()
+    expected = orjson.loads(expected.model_dump_json())
+    for chat_json in (body[0], expected):
+        chat_json["participants"].sort(key=lambda p: p["user"]["id"])
+    assert body == [expected]
+    assert body[0]["last_message"]["content"] == "second"
+
+
+def test_notifications_parity(client, db, content):
+    from app import models, schemas
+
+    response = client.get("/api/v1/notifications/", headers=auth_headers("ser_reader"))
+    expected = db.query(models.Notification).filter(models.Notification.user_id == content["reader"]).all()
+    assert response.json() == _schema_json(schemas.NotificationOut, expected)
+
+
+def test_serialization_cost_per_row(db, content, capsys):
+    from app import models, schemas, serialization
+    from sqlalchemy import select
+
+    # Enough rows for stable timings without slowing the suite down
+    db.add_all(
+        models.Question(user_id=content["author"], question_text=f"bench {i}", description="bench")
+        for i in range(500)
+    )
+    db.commit()
+    query = select(*serialization.QUESTION_COLUMNS).where(models.Question.question_text.like("bench %"))
+
+    def schema_path():
+        rows = db.query(models.Question).filter(models.Question.question_text.like("bench %")).options(
+            joinedload(models.Question.user), joinedload(models.Question.answers).joinedload(models.Answer.user)
+        ).all()
+        adapter = TypeAdapter(List[schemas.QuestionOut])
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    def lean_path():
+        return serialization.ORJSONResponse(serialization.question_dicts(db, db.execute(query).all())).body
+
+    def per_row(fn, rounds=5):
+        best = float("inf")
+        for _ in range(rounds):
+            db.expire_all()
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best / 500 * 1e6
+
+    assert orjson.loads(schema_path()) == orjson.loads(lean_path())
+    schema_us, lean_us = per_row(schema_path), per_row(lean_path)
+    with capsys.disabled():
+        print(f"\nquestions list: schema path {schema_us:.1f} us/row, lean path {lean_us:.1f} us/row")
+    assert lean_us < schema_us
@@ -0,0 +1,196 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from conftest import auth_headers, make_user
+
+# Likes, saves and helpful marks: double submits, the unique constraints
+# behind them and unknown targets.
+
+
+@pytest.fixture
+def users(app_db, db):
+    suffix = uuid.uuid4().hex[:8]
+    return make_user(db, f"author_{suffix}"), make_user(db, f"reader_{suffix}")
+
+
+@pytest.fixture
+def article(db, users):
+    from app import models
+
+    article = models.Article(user_id=users[0].id, title="Cases", content="...")
+    db.add(article)
+    db.commit()
+    return article
+
+
+@pytest.fixture
+def answer(db, users):
+    from app import models
+
+    question = models.Question(user_id=users[0].id, question_text="Which case?")
+    db.add(question)
+    db.commit()
+    answer = models.Answer(user_id=users[0].id, question_id=question.id, answer_text="Dative")
+    db.add(answer)
+    db.commit()
+    return answer
+
+
+def test_like_double_submit_toggles_the_counter(client, db, users, article):
+    from app import models
+
+    headers = auth_headers(users[1].username)
+    url = f"/api/v1/articles/{article.id}/like"
+    assert client.post(url, headers=headers).json() == {"status": "liked", "like_count": 1}
+    assert client.post(url, headers=headers).json() == {"status": "unliked", "like_count": 0}
+    assert client.post(url, headers=headers).json() == {"status": "liked", "like_count": 1}
+
+    db.refresh(article)
+    assert article.like_count == 1
+    assert db.query(models.ArticleLike).filter_by(article_id=article.id).count() == 1
+
+
+def test_like_lost_to_a_concurrent_request_is_counted_once(db, users, article, monkeypatch):
+    from app import crud, models
+
+    insert_if_absent = crud._insert_if_absent
+
+    def raced(db, model, index_elements, **values):
+        # The other request's like, and its counter bump, land first
+        assert insert_if_absent(db, model, index_elements, **values)
+        db.query(models.Article).filter_by(id=article.id).update(
+            {"like_count": models.Article.like_count + 1}, synchronize_session=False
+        )
+        return insert_if_absent(db, model, index_elements, **values)
+
+    monkeypatch.setattr(crud, "_insert_if_absent", raced)
+    assert crud.toggle_article_like(db, users[1].id, article.id) == (True, False, 1)
+    db.commit()
+    db.refresh(article)
+    assert article.like_count == 1
+
+
+def test_article_list_serves_the_counter(client, db, users, article, query_budget):
+    from app import models
+
+    db.query(models.Article).filter_by(id=article.id).update({"like_count": 42})
+    db.commit()
+    with query_budget(5) as requests:
+        body = client.get("/api/v1/articles/", params={"user_id": users[0].id}).json()
+    assert [a["like_count"] for a in body] == [42]
+    for _, _, stats in requests:
+        assert not any("article_likes" in sql and "count(" in sql.lower() for sql in stats.shapes), stats.report()
+
+
+def test_writes_that_bypass_the_toggle_resync_the_counter(client, db, admin_headers, users, article):
+    from app import models
+    from app.services import deletion
+
+    def like_count():
+        db.expire_all()
+        return db.get(models.Article, article.id).like_count
+
+    url = "/api/v1/admin/generic/article_likes"
+    like = client.post(url, json={"article_id": article.id, "user_id": users[1].id}, headers=admin_headers).json()
+    assert like_count() == 1
+
+    extra = make_user(db, f"liker_{uuid.uuid4().hex[:8]}")
+    batch = {"ops": [{"op": "create", "data": {"article_id": article.id, "user_id": extra.id}}]}
+    assert client.post(f"{url}/batch", json=batch, headers=admin_headers).status_code == 200
+    assert like_count() == 2
+
+    assert client.delete(f"{url}/{like['id']}", headers=admin_headers).status_code == 200
+    assert like_count() == 1
+
+    # Purging the liker removes their likes from other users' articles
+    deletion.purge(db, models.User, [extra.id])
+    assert like_count() == 0
+
+
+def test_unknown_article_is_404(client, db, users):
+    from app import crud
+
+    response = client.post("/api/v1/articles/missing/like", headers=auth_headers(users[1].username))
+    assert response.status_code == 404
+    assert crud.toggle_article_like(db, users[1].id, "missing") is None
+
+
+def test_helpful_is_idempotent(client, db, users, answer):
+    from app import models
+
+    headers = auth_headers(users[1].username)
+    url = f"/api/v1/features/helpful/{answer.id}"
+    first = client.post(url, headers=headers).json()
+    second = client.post(url, headers=headers).json()
+    assert (first["status"], first["helpful_count"]) == ("success", 1)
+    assert (second["status"], second["helpful_count"]) == ("ignored", 1)
+    assert db.query(models.AnswerHelpful).filter_by(answer_id=answer.id).count() == 1
+    assert client.post("/api/v1/features/helpful/missing", headers=headers).status_code == 404
+
+
+def test_save_double_submit_leaves_no_duplicates(client, db, users, article):
+    from app import models
+
+    headers = auth_headers(users[1].username)
+    url = f"/api/v1/features/save/article/{article.id}"
+    assert [client.post(url, headers=headers).json()["is_saved"] for _ in range(3)] == [True, False, True]
+    assert db.query(models.UserSavedContent).filter_by(user_id=users[1].id).count() == 1
+    assert client.post(f"/api/v1/features/save/video/{article.id}", headers=headers).status_code == 400
+
+
+@pytest.mark.parametrize("kind", ["like", "helpful", "saved"])
+def test_unique_constraints_reject_direct_duplicates(db, users, article, answer, kind):
+    from app import models
+
+    row = {
+        "like": lambda: models.ArticleLike(user_id=users[1].id, article_id=article.id),
+        "helpful": lambda: models.AnswerHelpful(user_id=users[1].id, answer_id=answer.id),
+        "saved": lambda: models.UserSavedContent(user_id=users[1].id, content_type="article", content_id=article.id),
+    }[kind]
+    db.add(row())
+    db.commit()
+    db.add(row())
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+
+def test_like_insert_integrity_error_is_unknown_article(db, users, monkeypatch):
+    from app import crud
+
+    def fk_violation(*args, **kwargs):
+        raise IntegrityError("INSERT", {}, Exception("foreign key"))
+
+    monkeypatch.setattr(crud, "_insert_if_absent", fk_violation)
+    assert crud.toggle_article_like(db, users[1].id, "missing") is None
+    assert crud.mark_answer_helpful(db, users[1].id, "missing") == (False, None)
+
+
+def test_migration_keeps_the_earliest_duplicate():
+    import importlib.util
+    import os
+
+    from alembic.operations import Operations
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import create_engine, text
+
+    path = os.path.join(os.path.dirname(__file__), "..", "backend", "alembic", "versions",
+                        "d4c6b0e8a973_add_unique_constraints_for_toggles.py")
+    spec = importlib.util.spec_from_file_location("d4c6b0e8a973", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE article_likes (id TEXT, article_id TEXT, user_id TEXT, created_at TEXT)"))
+        conn.execute(text(
+            "INSERT INTO article_likes VALUES "
+            "('b', 'a1', 'u1', '2026-01-02'), ('a', 'a1', 'u1', '2026-01-01'), "
+            "('c', 'a1', 'u2', '2026-01-03'), ('d', 'a1', 'u1', '2026-01-01')"
+        ))
+        with Operations.context(MigrationContext.configure(conn)):
+            migration._dedupe("article_likes", "article_id, user_id")
+        rows = conn.execute(text("SELECT id FROM article_likes ORDER BY id")).scalars().all()
+    assert rows == ["a", "c"]
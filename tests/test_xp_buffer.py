@@ -0,0 +1,142 @@
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from conftest import auth_headers, make_user
+
+# XP/streak updates: direct writes, batched flushes and the read-side overlay.
+
+
+@pytest.fixture
+def user(app_db, db):
+    return make_user(db, f"xp_{uuid.uuid4().hex[:8]}")
+
+
+@pytest.fixture
+def accumulator():
+    from app.services import xp_buffer
+
+    # Not started: tests flush explicitly
+    xp_buffer._accumulator = xp_buffer.XPAccumulator()
+    try:
+        yield xp_buffer._accumulator
+    finally:
+        xp_buffer._accumulator = None
+
+
+def test_streaks():
+    from app.services import xp_buffer
+
+    today = date(2026, 3, 10)
+    assert xp_buffer.advance_streak(4, today, today) == (4, today)
+    assert xp_buffer.advance_streak(4, today - timedelta(days=1), today) == (5, today)
+    assert xp_buffer.advance_streak(4, today - timedelta(days=3), today) == (1, today)
+    assert xp_buffer.advance_streak(None, None, today) == (1, today)
+
+
+def test_direct_write_updates_xp_level_and_streak(db, user):
+    from app.services import xp_buffer
+
+    yesterday = date.today() - timedelta(days=1)
+    user.xp, user.streak_days, user.last_activity_date = 95, 3, yesterday
+    db.commit()
+
+    xp_buffer.record(db, user.id, xp=10)
+    xp_buffer.record(db, user.id, xp=0)
+    db.commit()
+    db.refresh(user)
+    assert (user.xp, user.current_level, user.streak_days, user.last_activity_date) == (
+        105, "A1 Elementary", 4, date.today()
+    )
+
+
+def test_accumulator_merges_events_into_one_update_per_user(app_db, db, user, accumulator):
+    from app.services import xp_buffer
+
+    other = make_user(db, f"xp_other_{uuid.uuid4().hex[:8]}")
+    for _ in range(20):
+        xp_buffer.record(db, user.id, xp=5)
+    xp_buffer.record(db, other.id, xp=1)
+    db.commit()
+
+    db.refresh(user)
+    assert (user.xp or 0) == 0
+    assert xp_buffer.progress(db, user).xp == 100
+    assert xp_buffer.progress(db, user).level == "A1 Elementary"
+    assert xp_buffer.progress(db, user).streak_days == 1
+
+    statements = []
+    listener = lambda conn, cursor, statement, params, context, executemany: statements.append((statement, executemany))
+    event.listen(app_db, "before_cursor_execute", listener)
+    try:
+        assert accumulator.flush() == 2
+    finally:
+        event.remove(app_db, "before_cursor_execute", listener)
+    updates = [s for s in statements if s[0].lstrip().upper().startswith("UPDATE USERS")]
+    assert len(updates) == 1 and updates[0][1]
+
+    db.refresh(user)
+    assert (user.xp, user.current_level, user.streak_days) == (100, "A1 Elementary", 1)
+    assert xp_buffer.progress(db, user).xp == 100  # nothing pending any more
+
+
+def test_events_on_consecutive_days_extend_the_streak(db, user, accumulator):
+    from app.services import xp_buffer
+
+    today = date.today()
+    xp_buffer.record(db, user.id, xp=2, day=today - timedelta(days=1))
+    xp_buffer.record(db, user.id, xp=3, day=today)
+    db.commit()
+    assert xp_buffer.progress(db, user).streak_days == 2
+
+    accumulator.flush()
+    db.refresh(user)
+    assert (user.xp, user.streak_days, user.last_activity_date) == (5, 2, today)
+
+
+def test_overview_shows_pending_xp(client, db, user, accumulator):
+    from app.services import xp_buffer
+
+    xp_buffer.record(db, user.id, xp=120)
+    db.commit()
+    body = client.get("/api/v1/stats/overview", headers=auth_headers(user.username)).json()
+    assert body["xp"] == 120 and body["level"] == "A1 Elementary" and body["current_streak"] == 1
+
+
+def test_xp_counts_only_once_the_session_commits(db, user, accumulator):
+    from app.services import xp_buffer
+
+    xp_buffer.record(db, user.id, xp=7)
+    assert accumulator.pending(user.id) == {}
+    db.rollback()
+    db.commit()
+    assert accumulator.pending(user.id) == {}
+
+    xp_buffer.record(db, user.id, xp=5)
+    xp_buffer.record(db, user.id, xp=2)
+    db.commit()
+    assert accumulator.pending(user.id) == {date.today(): 7}
+    assert accumulator.pending("someone-else") == {}
+
+    accumulator.flush()
+    db.refresh(user)
+    assert user.xp == 7 and accumulator.pending(user.id) == {}
+
+
+def test_session_closed_without_commit_awards_no_xp(app_db, user, accumulator):
+    from app.database import SessionLocal
+    from app.services import xp_buffer
+
+    session = SessionLocal()
+    try:
+        # A request that fails after recording XP: get_db closes its session
+        savepoint = session.begin_nested()
+        xp_buffer.record(session, user.id, xp=9)
+        savepoint.commit()
+        assert accumulator.pending(user.id) == {}
+    finally:
+        session.close()
+    assert accumulator.pending(user.id) == {}
+    assert xp_buffer._STAGED not in session.info